@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取基准脚本 - 比较逐模式提取与预编译单次扫描提取的吞吐量（块/秒）
+
+用法:
+    python benchmark_extraction.py [--file SDK2.5开发指南.txt] [--repeat 3] [--workers 0]
+"""
+
+import re
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from document_processor import DocumentProcessor
+from chunk_extractor import ChunkExtractor, KYLIN_KEYWORDS, extract_chunk_info
+
+def legacy_extract(content: str):
+    """
+    优化前的提取方式：每个文档块逐个编译并全文查找各模式
+    """
+    interfaces = {'c_interfaces': [], 'dbus_interfaces': [], 'python_interfaces': [],
+                  'api_calls': [], 'data_structures': []}
+    patterns = [
+        ('c_interfaces', r'extern\s+[\w\s\*]+\s+(\w+)\s*\([^)]*\);', re.MULTILINE),
+        ('c_interfaces', r'[\w\s\*]+\s+(kdk_\w+)\s*\([^)]*\)', re.MULTILINE),
+        ('c_interfaces', r'typedef\s+struct\s+(\w+)', re.MULTILINE),
+        ('c_interfaces', r'#define\s+(\w+)\s+', re.MULTILINE),
+        ('dbus_interfaces', r'(\w+)\s*\([^)]*\)\s*↦\s*\([^)]*\)', re.MULTILINE),
+        ('dbus_interfaces', r'interface\s+([\w\.]+)', re.MULTILINE),
+        ('dbus_interfaces', r'method\s+(\w+)', re.MULTILINE),
+        ('python_interfaces', r'def\s+(\w+)\s*\([^)]*\)', re.MULTILINE),
+        ('python_interfaces', r'class\s+(\w+)', re.MULTILINE),
+        ('python_interfaces', r'import\s+([\w\.]+)', re.MULTILINE),
+        ('api_calls', r'(\w+)\s*\(', 0),
+        ('api_calls', r'\.(\w+)\s*\(', 0),
+        ('data_structures', r'struct\s+(\w+)', 0),
+        ('data_structures', r'enum\s+(\w+)', 0),
+        ('data_structures', r'typedef\s+\w+\s+(\w+)', 0),
+    ]
+    for field, pattern, flags in patterns:
+        interfaces[field].extend(re.findall(pattern, content, flags))
+
+    headings = re.findall(r'^#{1,6}\s+(.+)$', content, re.MULTILINE)
+    headings += [line.strip() for line in re.findall(r'^[A-Z\s]{5,}$', content, re.MULTILINE)
+                 if len(line.strip()) < 50]
+    headings += re.findall(r'^第[一二三四五六七八九十\d]+[章节部分]\s*[：:]\s*(.+)$', content, re.MULTILINE)
+
+    keywords = [keyword for keyword in KYLIN_KEYWORDS if keyword in content]
+    keywords += [term for term in re.findall(r'\b[A-Z]{2,}\b', content) if len(term) <= 10]
+    keywords += [cmd for cmd in re.findall(r'`([^`]+)`', content) if len(cmd) <= 30]
+
+    return {
+        'sdk_interfaces': {field: list(set(names)) for field, names in interfaces.items()},
+        'headings': list(set(headings)),
+        'keywords': list(set(keywords)),
+    }
+
+def canonical(info):
+    """
+    转换为与列表顺序无关的形式，便于比较
+    """
+    return (frozenset((field, frozenset(names)) for field, names in info['sdk_interfaces'].items()),
+            frozenset(info['headings']), frozenset(info['keywords']))
+
+def measure(extract, contents, repeat: int):
+    """
+    返回提取结果和最快一轮的吞吐量（块/秒）
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [extract(content) for content in contents]
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return results, len(contents) / best
+
+def main():
+    parser = argparse.ArgumentParser(description="文档块信息提取吞吐量对比")
+    parser.add_argument('--file', default=os.path.join(os.path.dirname(__file__) or '.', 'SDK2.5开发指南.txt'),
+                        help="用于生成文档块的文档")
+    parser.add_argument('--repeat', type=int, default=3, help="重复轮数（取最快一轮）")
+    parser.add_argument('--workers', type=int, default=0, help="额外测试多进程提取时的进程数")
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    if args.file.lower().endswith('.pdf'):
+        pieces = processor._iter_pdf_pages(args.file)
+    else:
+        pieces = processor._iter_paragraphs(processor._iter_text_blocks(args.file))
+    contents = [chunk['content'] for chunk in processor._iter_chunks(pieces, args.file, '')]
+    print(f"文档 {args.file}，{len(contents)} 个文档块")
+
+    legacy, legacy_rate = measure(legacy_extract, contents, args.repeat)
+    extractor = ChunkExtractor()
+    current, current_rate = measure(extractor.extract, contents, args.repeat)
+
+    mismatches = sum(canonical(a) != canonical(b) for a, b in zip(legacy, current))
+    print(f"{'方式':<20}{'块/秒':>12}")
+    print(f"{'逐模式提取':<20}{legacy_rate:>12.0f}")
+    print(f"{'预编译单次扫描':<20}{current_rate:>12.0f}")
+    print(f"加速比 {current_rate / legacy_rate:.1f}x，结果不一致的块: {mismatches}")
+
+    if args.workers > 0:
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp_context) as executor:
+            list(executor.map(extract_chunk_info, contents[:args.workers], chunksize=1))  # 预热工作进程
+            started = time.perf_counter()
+            list(executor.map(extract_chunk_info, contents, chunksize=64))
+            rate = len(contents) / (time.perf_counter() - started)
+        print(f"{f'{args.workers} 个工作进程':<20}{rate:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索基准脚本 - 比较稠密近似检索与精确TF-IDF检索的召回率和延迟
+
+用法:
+    python benchmark_retrieval.py [--docs 20000] [--queries 200] [--top-k 10]
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from vector_store import VectorStore
+from dense_index import hnswlib
+from config import VECTOR_CONFIG
+
+def synthetic_corpus(n_docs: int, n_queries: int, seed: int = 11):
+    """
+    生成按主题分布的合成语料：每个文档从一个主题的词表中按Zipf分布取词
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"w{i}" for i in range(20000)]
+    topics = [rng.choice(len(vocabulary), 300, replace=False) for _ in range(200)]
+    weights = 1.0 / np.arange(1, 301)
+    weights /= weights.sum()
+
+    def sample(size):
+        topic = topics[rng.integers(len(topics))]
+        return ' '.join(vocabulary[i] for i in rng.choice(topic, size=size, p=weights))
+
+    docs = [{'content': sample(40), 'source_file': 'synthetic.txt', 'chunk_id': i} for i in range(n_docs)]
+    queries = [sample(4) for _ in range(n_queries)]
+    return docs, queries
+
+def run(store: VectorStore, queries, top_k: int):
+    """
+    执行全部查询，返回结果编号和每次查询的耗时（毫秒）
+    """
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = store.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([hit['doc_id'] for hit in hits])
+    return results, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="稠密近似检索与精确TF-IDF检索对比")
+    parser.add_argument('--docs', type=int, default=20000, help="合成文档数")
+    parser.add_argument('--queries', type=int, default=200, help="查询数")
+    parser.add_argument('--top-k', type=int, default=10, help="每个查询返回的结果数")
+    parser.add_argument('--dim', type=int, default=VECTOR_CONFIG.get('dense_dim', 256), help="哈希随机投影维度")
+    args = parser.parse_args()
+
+    docs, queries = synthetic_corpus(args.docs, args.queries)
+    db_path = os.path.join(tempfile.mkdtemp(prefix='kylin_bench_'), 'vectors.pkl')
+
+    settings = [('tfidf (精确)', {'embedding_model': 'tfidf'}),
+                ('dense float32 / exact', {'embedding_model': 'dense', 'dense_quantization': 'float32', 'ann_index': 'exact'}),
+                ('dense int8 / exact', {'embedding_model': 'dense', 'dense_quantization': 'int8', 'ann_index': 'exact'}),
+                ('dense int8 / ivf', {'embedding_model': 'dense', 'dense_quantization': 'int8', 'ann_index': 'ivf'})]
+    if hnswlib is not None:
+        settings.append(('dense float32 / hnsw', {'embedding_model': 'dense', 'dense_quantization': 'float32', 'ann_index': 'hnsw'}))
+
+    original = dict(VECTOR_CONFIG)
+    baseline = None
+    print(f"文档数 {args.docs}，查询数 {args.queries}，top_k={args.top_k}，投影维度 {args.dim}")
+    print(f"{'方式':<24}{'召回率':>8}{'平均(ms)':>10}{'p95(ms)':>10}{'构建(s)':>10}")
+    try:
+        for name, overrides in settings:
+            VECTOR_CONFIG.update(original, dense_dim=args.dim, **overrides)
+            # 稠密索引在导入或加载时构建，计入构建时间
+            started = time.perf_counter()
+            store = VectorStore(db_path)
+            if not store.is_fitted:
+                store.add_documents(docs)
+            build_time = time.perf_counter() - started
+            store.search(queries[0], top_k=args.top_k)  # 预热
+
+            results, latencies = run(store, queries, args.top_k)
+            if baseline is None:
+                baseline = results
+            hits = sum(len(set(r) & set(b)) for r, b in zip(results, baseline))
+            recall = hits / max(sum(len(b) for b in baseline), 1)
+            print(f"{name:<24}{recall:>8.3f}{latencies.mean():>10.2f}"
+                  f"{np.percentile(latencies, 95):>10.2f}{build_time:>10.2f}")
+            if store.dense_index is not None:
+                store.dense_index.clear()
+    finally:
+        VECTOR_CONFIG.clear()
+        VECTOR_CONFIG.update(original)
+
+if __name__ == "__main__":
+    main()
@@ -29,9 +29,12 @@ API_PARAMETERS = {
 
 # 重试机制配置
 RETRY_SETTINGS = {
-    "max_retries": 3,         # 最大重试次数
-    "retry_delay": 3,         # 重试间隔（秒）
-    "timeout": 30             # 请求超时时间（秒）
+    "max_retries": 3,         # 最大尝试次数（仅重试429/5xx/超时）
+    "retry_delay": 3,         # 指数退避基准时间（秒）
+    "max_delay": 20,          # 单次退避上限（秒）
+    "deadline": 60,           # 单次查询的总时限（秒）
+    "connect_timeout": 5,     # 连接超时时间（秒）
+    "timeout": 30             # 请求（读取）超时时间（秒）
 }
 
 # 系统配置
@@ -39,6 +42,7 @@ SYSTEM_SETTINGS = {
     "log_level": "INFO",       # 日志级别
     "cache_enabled": True,     # 是否启用缓存
     "cache_size": 100,         # 缓存大小
+    "cache_ttl": 3600,         # 缓存有效期（秒）
     "max_concurrent_requests": 5  # 最大并发请求
 }
 
@@ -108,7 +112,8 @@ GUI_CONFIG = {
     "theme": "default",
     "font_family": "SimHei",
     "font_size": 12,
-    "icon_path": "./assets/app_icon.png"
+    "icon_path": "./assets/app_icon.png",
+    "stream_answers": True  # 流式显示回答（逐段输出）
 }
 
 # 日志配置
@@ -124,22 +129,63 @@ LOG_CONFIG = {
 VECTOR_CONFIG = {
     "chunk_size": 500,
     "chunk_overlap": 50,
-    "embedding_model": "tfidf",  # 使用TF-IDF替代OpenAI嵌入
+    "embedding_model": "tfidf",  # 打分方式：tfidf（余弦相似度）、bm25 或 dense（实验性，召回率受限，见下）
+    "bm25_k1": 1.5,  # BM25词频饱和参数
+    "bm25_b": 0.75,  # BM25文档长度归一化参数
+    # 稠密检索为实验性功能：哈希随机投影是TF-IDF的有损近似，2万文档时256维召回率约0.55，
+    # 1024维且 dense_rerank_factor=50 时约0.94，但延迟为TF-IDF的数倍；需要高召回时请使用tfidf/bm25
+    "dense_encoder": "hashed",  # 稠密编码：hashed（TF-IDF哈希随机投影）或本地 sentence-transformers 模型路径
+    "dense_dim": 256,  # 哈希随机投影的维度（越大召回率越高，检索越慢）
+    "dense_quantization": "int8",  # 稠密向量存储精度：float32 或 int8
+    "ann_index": "ivf",  # 近似检索索引：ivf、hnsw（需安装hnswlib）或 exact（精确扫描）
+    "ivf_nprobe": 8,  # IVF检索时扫描的簇数
+    "dense_rerank_factor": 10,  # 哈希投影召回 top_k × 该倍数个候选，再按词项权重精确打分
+    "secondary_dense_index": False,  # 在tfidf/bm25之外同时维护稠密索引，作为混合检索的一路
     "similarity_threshold": 0.01,  # 进一步降低阈值以提高召回率
     "max_results": 10,
     "max_features": 5000,  # TF-IDF特征数量
-    "ngram_range": [1, 2]  # N-gram范围
+    "ngram_range": [1, 2],  # N-gram范围
+    "idf_drift_threshold": 0.2,  # 新增文档占比超过该值时重算IDF（0表示每次都重算）
+    "segment_compaction_threshold": 8,  # 追加段数量达到该值时合并为完整快照（快照的倒排表以mmap共享；有未合并的段时倒排表在各进程内存中重建，约占权重矩阵大小）
+    "chunk_cache_size": 256  # 内存中缓存的文档块数量（其余按需从磁盘读取）
 }
 
 # RAG配置
 RAG_CONFIG = {
     "top_k": 5,
     "similarity_threshold": 0.7,
-    "max_context_length": 2000,
+    "max_context_tokens": 1500,  # 上下文token预算（按目标模型估计）
     "temperature": 0.7,
     "max_tokens": 1000
 }
 
+# 混合检索配置
+RETRIEVAL_CONFIG = {
+    "hybrid": True,  # 融合词项检索、关键词匹配和稠密第二索引的结果（关闭时只使用向量存储检索）
+    "rrf_k": 60,  # 倒数排名融合常数，越大各路名次差异的影响越小
+    "candidate_factor": 3,  # 每路检索召回 top_k × 该倍数个候选
+    "source_weights": {"lexical": 1.0, "keyword": 1.0, "dense": 1.0},  # 各路检索的融合权重
+    "min_keyword_length": 2,  # 参与匹配的关键词最短长度
+    "max_workers": 4  # 检索线程数
+}
+
+# 重排序配置
+RERANK_CONFIG = {
+    "enabled": True,  # 是否对检索候选进行二次打分和多样性筛选
+    "candidates": 20,  # 参与重排序的候选数
+    "weights": {  # 各特征的权重
+        "similarity": 1.0,  # 第一阶段检索得分
+        "coverage": 0.6,  # 查询词覆盖率
+        "phrase": 0.4,  # 相邻查询词连续出现
+        "proximity": 0.3,  # 查询词出现位置的紧凑程度
+        "heading": 0.3,  # 查询词出现在标题中
+        "interface": 0.8  # SDK接口名精确匹配
+    },
+    "mmr_lambda": 0.7,  # MMR中相关性所占比重，越小越强调多样性
+    "duplicate_threshold": 0.9,  # 与已选文档的相似度超过该值时视为近似重复并跳过
+    "min_relative_score": 0.2  # 得分低于最高分该比例的候选不放入上下文
+}
+
 # 系统配置
 SYSTEM_CONFIG = {
     "max_file_size": 50 * 1024 * 1024,  # 50MB
@@ -156,13 +202,18 @@ SECURITY_CONFIG = {
 PERFORMANCE_CONFIG = {
     "max_concurrent_processes": 4,
     "cache_size": 100,
-    "batch_size": 32
+    "batch_size": 32,
+    "pdf_pages_per_task": 16,  # 并行提取PDF时每个任务处理的页数
+    "pdf_parallel_min_pages": 64,  # 页数达到该值时才启用多进程提取
+    "text_block_size": 1048576,  # 流式读取文本文件时每次读取的字符数
+    "encoding_sample_size": 65536  # 检测文本编码时读取的字节数
 }
 
 # 开发配置
 DEV_CONFIG = {
     "debug": False,
-    "log_api_calls": False
+    "log_api_calls": False,        # 记录完整的API请求与响应体
+    "api_trace_sample_rate": 0.1   # API调用摘要（编号、大小、耗时）的采样率
 }
 
 # API配置映射 - 扩展多个API提供商
@@ -184,6 +235,24 @@ API_CONFIGS = {
     }
 }
 
+# 多提供商路由配置
+ROUTER_CONFIG = {
+    "enabled": False,              # 是否启用多提供商路由
+    "backends": [                  # 按优先级排列，provider 对应 API_CONFIGS 中的提供商
+        {"provider": "siliconflow", "model": "Qwen/Qwen2.5-72B-Instruct"},
+        {"provider": "siliconflow", "model": "deepseek-ai/DeepSeek-V3"},
+        {"provider": "local_api", "model": "Qwen/Qwen2.5-72B-Instruct"}
+    ],
+    "latency_window": 50,          # 延迟与错误率统计的滚动窗口（请求数）
+    "error_threshold": 0.5,        # 错误率超过该值时暂停使用后端
+    "min_samples": 4,              # 计算错误率所需的最少请求数
+    "max_consecutive_failures": 3, # 连续失败次数上限
+    "cooldown": 30,                # 后端暂停时间（秒）
+    "hedge_requests": False,       # 是否对慢请求发出对冲请求
+    "hedge_delay": None,           # 对冲延迟（秒），None表示使用首选后端的p95延迟
+    "min_hedge_delay": 0.5         # 对冲延迟下限（秒）
+}
+
 # 麒麟系统优化配置
 KYLIN_OPTIMIZATION = {
     "use_hardware_acceleration": False,  # 禁用硬件加速
@@ -3,52 +3,77 @@
 AI模型接口模块 - 硅基流动API集成
 """
 
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from config import SILICONFLOW_API_KEY, SILICONFLOW_API_ENDPOINT, RAG_CONFIG
+from typing import List, Dict, Any, Optional, Iterator
+from config import (SILICONFLOW_API_KEY, SILICONFLOW_API_ENDPOINT, DEFAULT_MODEL, RAG_CONFIG,
+                    RETRY_SETTINGS, SYSTEM_SETTINGS)
 import time
+from retry_policy import RetryPolicy
+from api_trace import ApiTracer
 
-class SiliconFlowAPI:
+# 异步HTTP客户端（可选）
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+class _SiliconFlowBase:
     """
-    硅基流动API接口类
+    硅基流动API公共部分：配置、请求体与消息构建
     """
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, endpoint: Optional[str] = None):
         self.api_key = api_key or SILICONFLOW_API_KEY
-        self.endpoint = SILICONFLOW_API_ENDPOINT
+        self.endpoint = endpoint or SILICONFLOW_API_ENDPOINT
         self.logger = logging.getLogger(__name__)
         
+        # (连接超时, 读取超时)
+        self.timeout = (
+            RETRY_SETTINGS.get('connect_timeout', 5),
+            RETRY_SETTINGS.get('timeout', 30)
+        )
+        
+        self.retry_policy = RetryPolicy()
+        self.tracer = ApiTracer()
+        
+        # 问答使用的模型参数
+        self.generation_params = {
+            'model': DEFAULT_MODEL,
+            'temperature': RAG_CONFIG.get('temperature', 0.7),
+            'max_tokens': 2000  # 使用固定的2000 token限制
+        }
+        
         if not self.api_key or self.api_key == "YOUR_API_KEY_HERE":
             self.logger.warning("硅基流动API密钥未配置")
 
-    def chat_completion(self, messages: List[Dict[str, str]], 
-                       model: str = "Qwen/Qwen2.5-72B-Instruct",
-                       temperature: float = 0.7,
-                       max_tokens: int = 2000,
-                       stream: bool = False,
-                       max_retries: int = 3,
-                       retry_delay: int = 2) -> Dict[str, Any]:
+    def _default_headers(self) -> Dict[str, str]:
         """
-        调用硅基流动聊天完成API
-        
-        Args:
-            messages: 对话消息列表
-            model: 模型名称，默认使用Qwen2.5
-            temperature: 温度参数
-            max_tokens: 最大token数
-            stream: 是否流式输出
-            
-        Returns:
-            API响应结果
+        默认请求头
         """
-        headers = {
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "KylinOS-Assistant/2.6.0",
             "Accept": "application/json"
         }
-        
+
+    @staticmethod
+    def _message_sizes(response) -> tuple:
+        """
+        获取请求体与响应体的字节数（兼容requests与httpx）
+        """
+        request = response.request
+        body = request.body if hasattr(request, 'body') else request.content
+        return len(body or b''), len(response.content)
+
+    def _build_payload(self, messages: List[Dict[str, str]], model: str,
+                       temperature: float, max_tokens: int, stream: bool = False) -> Dict[str, Any]:
+        """
+        构建请求体
+        """
         payload = {
             'model': model,
             'messages': messages,
@@ -60,58 +85,15 @@ class SiliconFlowAPI:
             'stop': None,
             'n': 1
         }
-        
-        for attempt in range(max_retries):
-            try:
-                self.logger.info(f"正在调用API，请求参数: {json.dumps(payload, indent=2, ensure_ascii=False)}")
-                response = requests.post(
-                    self.endpoint,
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
-                
-                if response.status_code != 200:
-                    self.logger.error(f"API返回错误状态码: {response.status_code}")
-                    self.logger.error(f"API响应内容: {response.text}")
-                    if attempt < max_retries - 1:
-                        self.logger.info(f"重试 {attempt + 1}/{max_retries}...")
-                        time.sleep(retry_delay)
-                        continue
-                    return {"error": f"API返回错误状态码: {response.status_code}"}
-                
-                result = response.json()
-                self.logger.info("API调用成功")
-                self.logger.info(f"API响应内容: {json.dumps(result, indent=2, ensure_ascii=False)}")
-                return result
-                
-            except requests.exceptions.RequestException as e:
-                self.logger.error(f"硅基流动API调用失败: {e}")
-                if attempt < max_retries - 1:
-                    self.logger.info(f"重试 {attempt + 1}/{max_retries}...")
-                    time.sleep(retry_delay)
-                    continue
-                return {"error": str(e)}
-            except json.JSONDecodeError as e:
-                self.logger.error(f"解析API响应失败: {e}")
-                if attempt < max_retries - 1:
-                    self.logger.info(f"重试 {attempt + 1}/{max_retries}...")
-                    time.sleep(retry_delay)
-                    continue
-                return {"error": "无法解析API响应"}
-            except Exception as e:
-                self.logger.error(f"API调用过程中出现未知错误: {e}")
-                if attempt < max_retries - 1:
-                    self.logger.info(f"重试 {attempt + 1}/{max_retries}...")
-                    time.sleep(retry_delay)
-                    continue
-                return {"error": str(e)}
+        if stream:
+            payload['stream'] = True
+        return payload
 
-    def generate_answer(self, question: str, context: str = "", 
+    def build_messages(self, question: str, context: str = "",
                        include_system_info: bool = False,
-                       system_info: str = "") -> str:
+                       system_info: str = "") -> List[Dict[str, str]]:
         """
-        生成问答回复
+        构建问答消息
         
         Args:
             question: 用户问题
@@ -120,7 +102,7 @@ class SiliconFlowAPI:
             system_info: 系统信息
             
         Returns:
-            AI生成的回答
+            对话消息列表
         """
         # 构建系统提示词
         system_prompt = """
@@ -139,26 +121,38 @@ class SiliconFlowAPI:
         if include_system_info and system_info:
             user_message += f"\n\n当前系统信息：\n{system_info}"
         
-        messages = [
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
+
+    def _parse_answer(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        从API响应中提取回答
         
-        # 调用API
-        response = self.chat_completion(
-            messages=messages,
-            temperature=RAG_CONFIG.get('temperature', 0.7),
-            max_tokens=2000  # 使用固定的2000 token限制
-        )
-        
+        Returns:
+            包含 answer、success 和 retries（重试次数）的字典
+        """
         if "error" in response:
-            return f"抱歉，生成回答时出现错误：{response['error']}"
+            return {
+                'answer': f"抱歉，生成回答时出现错误：{response['error']}",
+                'success': False,
+                'retries': response.get('retries', 0)
+            }
         
         try:
-            return response['choices'][0]['message']['content']
+            return {
+                'answer': response['choices'][0]['message']['content'],
+                'success': True,
+                'retries': response.get('retries', 0)
+            }
         except (KeyError, IndexError) as e:
             self.logger.error(f"解析API响应失败: {e}")
-            return "抱歉，无法解析AI回答，请稍后重试。"
+            return {
+                'answer': "抱歉，无法解析AI回答，请稍后重试。",
+                'success': False,
+                'retries': response.get('retries', 0)
+            }
 
     def get_available_models(self) -> List[str]:
         """
@@ -173,6 +167,267 @@ class SiliconFlowAPI:
             "Qwen/Qwen2.5-14B-Instruct"
         ]
 
+class SiliconFlowAPI(_SiliconFlowBase):
+    """
+    硅基流动API接口类
+    """
+    def __init__(self, api_key: Optional[str] = None, endpoint: Optional[str] = None):
+        super().__init__(api_key, endpoint)
+        self.session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """
+        创建带连接池的会话，复用TCP/TLS连接（keep-alive）
+        """
+        pool_size = SYSTEM_SETTINGS.get('max_concurrent_requests', 5)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self._default_headers())
+        return session
+
+    def close(self):
+        """
+        关闭连接池
+        """
+        self.session.close()
+
+    def chat_completion(self, messages: List[Dict[str, str]], 
+                       model: str = "Qwen/Qwen2.5-72B-Instruct",
+                       temperature: float = 0.7,
+                       max_tokens: int = 2000,
+                       stream: bool = False,
+                       max_retries: Optional[int] = None,
+                       retry_delay: Optional[float] = None) -> Dict[str, Any]:
+        """
+        调用硅基流动聊天完成API
+        
+        Args:
+            messages: 对话消息列表
+            model: 模型名称，默认使用Qwen2.5
+            temperature: 温度参数
+            max_tokens: 最大token数
+            stream: 是否流式输出（流式接收后拼接为完整结果返回）
+            max_retries: 最大尝试次数，默认使用重试策略的配置
+            retry_delay: 退避基准时间（秒），默认使用重试策略的配置
+            
+        Returns:
+            API响应结果，附带 retries（重试次数）
+        """
+        if stream:
+            retry_stats = {}
+            try:
+                content = "".join(self.stream_chat_completion(
+                    messages, model=model, temperature=temperature, max_tokens=max_tokens,
+                    max_retries=max_retries, retry_delay=retry_delay, retry_stats=retry_stats
+                ))
+            except Exception as e:
+                return {"error": str(e), "retries": retry_stats.get('retries', 0)}
+            return {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "retries": retry_stats.get('retries', 0)
+            }
+        
+        payload = self._build_payload(messages, model, temperature, max_tokens)
+        state = self.retry_policy.with_overrides(max_retries, retry_delay).start()
+        
+        while True:
+            state.attempts += 1
+            retry_after = None
+            trace = self.tracer.start(self.endpoint, payload, state.attempts)
+            try:
+                response = self.session.post(
+                    self.endpoint,
+                    json=payload,
+                    timeout=(self.timeout[0], state.read_timeout(self.timeout[1]))
+                )
+                sizes = self._message_sizes(response)
+                
+                if response.status_code == 200:
+                    # requests 的 JSONDecodeError 同时是 RequestException 的子类，
+                    # 必须在这里单独处理，否则会被当作不可重试的请求错误
+                    try:
+                        result = response.json()
+                    except ValueError as e:
+                        # 响应体被截断或不是JSON，按可重试错误处理
+                        self.logger.error(f"解析API响应失败: {e}")
+                        error = "无法解析API响应"
+                        trace.finish(response.status_code, *sizes, error=error)
+                    else:
+                        trace.finish(response.status_code, *sizes, result=result)
+                        self.logger.info("API调用成功")
+                        result['retries'] = state.retries
+                        return result
+                else:
+                    self.logger.error(f"API返回错误状态码: {response.status_code}")
+                    self.logger.error(f"API响应内容: {response.text}")
+                    error = f"API返回错误状态码: {response.status_code}"
+                    trace.finish(response.status_code, *sizes, error=error)
+                    if not self.retry_policy.is_retryable_status(response.status_code):
+                        return {"error": error, "retries": state.retries}
+                    retry_after = self.retry_policy.parse_retry_after(response.headers.get('Retry-After'))
+                
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self.logger.error(f"硅基流动API调用失败: {e}")
+                error = str(e)
+                trace.finish(error=error)
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"硅基流动API调用失败: {e}")
+                trace.finish(error=str(e))
+                return {"error": str(e), "retries": state.retries}
+            
+            delay = state.next_delay(retry_after)
+            if delay is None:
+                return {"error": error, "retries": state.retries}
+            self.logger.info(f"{delay:.1f} 秒后重试 {state.retries}/{state.policy.max_attempts - 1}...")
+            time.sleep(delay)
+
+    def stream_chat_completion(self, messages: List[Dict[str, str]],
+                               model: str = "Qwen/Qwen2.5-72B-Instruct",
+                               temperature: float = 0.7,
+                               max_tokens: int = 2000,
+                               max_retries: Optional[int] = None,
+                               retry_delay: Optional[float] = None,
+                               retry_stats: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """
+        流式调用聊天完成API，逐段产出回答文本
+        
+        只在收到首个字节之前重试；请求失败时抛出异常。
+        
+        Args:
+            messages: 对话消息列表
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大token数
+            retry_stats: 可选字典，写入本次调用的重试次数（retries）
+            
+        Yields:
+            回答文本片段
+        """
+        payload = self._build_payload(messages, model, temperature, max_tokens, stream=True)
+        state = self.retry_policy.with_overrides(max_retries, retry_delay).start()
+        if retry_stats is None:
+            retry_stats = {}
+        
+        while True:
+            state.attempts += 1
+            retry_after = None
+            trace = self.tracer.start(self.endpoint, payload, state.attempts)
+            try:
+                response = self.session.post(
+                    self.endpoint,
+                    json=payload,
+                    timeout=(self.timeout[0], state.read_timeout(self.timeout[1])),
+                    stream=True,
+                    headers={"Accept": "text/event-stream"}
+                )
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self.logger.error(f"硅基流动API调用失败: {e}")
+                error = e
+                trace.finish(error=str(e))
+            else:
+                if response.status_code == 200:
+                    break
+                
+                self.logger.error(f"API返回错误状态码: {response.status_code}")
+                self.logger.error(f"API响应内容: {response.text}")
+                response.close()
+                error = RuntimeError(f"API返回错误状态码: {response.status_code}")
+                trace.finish(response.status_code, *self._message_sizes(response), error=str(error))
+                if not self.retry_policy.is_retryable_status(response.status_code):
+                    retry_stats['retries'] = state.retries
+                    raise error
+                retry_after = self.retry_policy.parse_retry_after(response.headers.get('Retry-After'))
+            
+            delay = state.next_delay(retry_after)
+            retry_stats['retries'] = state.retries
+            if delay is None:
+                raise error
+            self.logger.info(f"{delay:.1f} 秒后重试 {state.retries}/{state.policy.max_attempts - 1}...")
+            time.sleep(delay)
+        
+        streamed_bytes = 0
+        try:
+            with response:
+                for event in self._iter_sse_events(response):
+                    choices = event.get('choices') or []
+                    if not choices:
+                        continue
+                    content = (choices[0].get('delta') or {}).get('content')
+                    if content:
+                        if trace.sampled:
+                            streamed_bytes += len(content.encode('utf-8'))
+                        yield content
+        finally:
+            request_bytes = len(response.request.body or b'')
+            trace.finish(response.status_code, request_bytes, streamed_bytes)
+
+    @staticmethod
+    def _iter_sse_events(response) -> Iterator[Dict[str, Any]]:
+        """
+        解析SSE（text/event-stream）响应中的data事件
+        """
+        for line in response.iter_lines():
+            if not line:
+                continue
+            line = line.decode('utf-8')
+            if not line.startswith('data:'):
+                continue  # 注释行或其他字段
+            data = line[5:].strip()
+            if data == '[DONE]':
+                return
+            yield json.loads(data)
+
+    def generate_answer_result(self, question: str, context: str = "",
+                               include_system_info: bool = False,
+                               system_info: str = "") -> Dict[str, Any]:
+        """
+        生成问答回复，并返回是否成功
+        
+        Returns:
+            包含 answer 和 success 的字典
+        """
+        messages = self.build_messages(question, context, include_system_info, system_info)
+        
+        # 调用API
+        response = self.chat_completion(messages=messages, **self.generation_params)
+        return self._parse_answer(response)
+
+    def generate_answer_stream(self, question: str, context: str = "",
+                               include_system_info: bool = False,
+                               system_info: str = "") -> Iterator[str]:
+        """
+        流式生成问答回复，出错时产出错误提示
+        
+        Yields:
+            回答文本片段
+        """
+        messages = self.build_messages(question, context, include_system_info, system_info)
+        try:
+            yield from self.stream_chat_completion(messages, **self.generation_params)
+        except Exception as e:
+            self.logger.error(f"流式生成回答失败: {e}")
+            yield f"抱歉，生成回答时出现错误：{e}"
+
+    def generate_answer(self, question: str, context: str = "", 
+                       include_system_info: bool = False,
+                       system_info: str = "") -> str:
+        """
+        生成问答回复
+        
+        Args:
+            question: 用户问题
+            context: 相关文档上下文
+            include_system_info: 是否包含系统信息
+            system_info: 系统信息
+            
+        Returns:
+            AI生成的回答
+        """
+        return self.generate_answer_result(question, context, include_system_info, system_info)['answer']
+
     def test_connection(self) -> bool:
         """
         测试API连接
@@ -191,3 +446,177 @@ class SiliconFlowAPI:
         
         return "error" not in response
 
+
+class AsyncSiliconFlowAPI(_SiliconFlowBase):
+    """
+    硅基流动API异步接口类（基于httpx）
+
+    所有请求共用一个连接池，并由信号量限制同时在途的请求数
+    （SYSTEM_SETTINGS['max_concurrent_requests']），适合用 asyncio.gather
+    批量生成回答。客户端与信号量绑定到首次使用时的事件循环。
+    """
+    def __init__(self, api_key: Optional[str] = None, endpoint: Optional[str] = None,
+                 max_concurrent_requests: Optional[int] = None):
+        if httpx is None:
+            raise ImportError("异步接口需要安装 httpx")
+        
+        super().__init__(api_key, endpoint)
+        self.max_concurrent_requests = max_concurrent_requests or SYSTEM_SETTINGS.get('max_concurrent_requests', 5)
+        self._client = None
+        self._closer = None
+        self._semaphore = None
+        self._loop = None
+
+    def _ensure_client(self):
+        """
+        为当前事件循环创建客户端和信号量
+
+        客户端的生命周期与事件循环绑定：同时启动一个等待中的关闭任务，
+        asyncio.run 结束前取消剩余任务时由它关闭连接池，切换到新的事件循环
+        （如多次调用 asyncio.run）不会遗留旧循环上的连接。
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop:
+            return
+        
+        if self._client is not None and not self._client.is_closed:
+            # 旧循环未经 asyncio.run 结束（关闭任务未执行），其连接无法在新循环中安全关闭
+            self.logger.warning("事件循环已切换，丢弃旧循环上的HTTP客户端")
+        
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        self._client = httpx.AsyncClient(
+            headers=self._default_headers(),
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrent_requests,
+                max_keepalive_connections=self.max_concurrent_requests
+            )
+        )
+        self._closer = loop.create_task(self._close_with_loop(self._client))
+
+    async def _close_with_loop(self, client):
+        """
+        一直等待，直到被取消（事件循环结束或调用 aclose()）时关闭客户端
+        """
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await client.aclose()
+            if self._client is client:
+                self._client = None
+                self._closer = None
+
+    async def aclose(self):
+        """
+        关闭连接池
+        """
+        closer, client = self._closer, self._client
+        self._client = None
+        self._closer = None
+        if closer is not None and not closer.done() and self._loop is asyncio.get_running_loop():
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+        elif client is not None:
+            await client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def chat_completion(self, messages: List[Dict[str, str]],
+                              model: str = "Qwen/Qwen2.5-72B-Instruct",
+                              temperature: float = 0.7,
+                              max_tokens: int = 2000,
+                              max_retries: Optional[int] = None,
+                              retry_delay: Optional[float] = None) -> Dict[str, Any]:
+        """
+        异步调用硅基流动聊天完成API
+        
+        Args:
+            messages: 对话消息列表
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大token数
+            max_retries: 最大尝试次数，默认使用重试策略的配置
+            retry_delay: 退避基准时间（秒），默认使用重试策略的配置
+            
+        Returns:
+            API响应结果，附带 retries（重试次数）
+        """
+        self._ensure_client()
+        payload = self._build_payload(messages, model, temperature, max_tokens)
+        state = self.retry_policy.with_overrides(max_retries, retry_delay).start()
+        
+        while True:
+            state.attempts += 1
+            retry_after = None
+            trace = self.tracer.start(self.endpoint, payload, state.attempts)
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(
+                        self.endpoint,
+                        json=payload,
+                        timeout=httpx.Timeout(state.read_timeout(self.timeout[1]), connect=self.timeout[0])
+                    )
+                sizes = self._message_sizes(response)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    trace.finish(response.status_code, *sizes, result=result)
+                    result['retries'] = state.retries
+                    return result
+                
+                self.logger.error(f"API返回错误状态码: {response.status_code}")
+                self.logger.error(f"API响应内容: {response.text}")
+                error = f"API返回错误状态码: {response.status_code}"
+                trace.finish(response.status_code, *sizes, error=error)
+                if not self.retry_policy.is_retryable_status(response.status_code):
+                    return {"error": error, "retries": state.retries}
+                retry_after = self.retry_policy.parse_retry_after(response.headers.get('Retry-After'))
+                
+            except httpx.TransportError as e:
+                self.logger.error(f"硅基流动API调用失败: {e}")
+                error = str(e) or type(e).__name__
+                trace.finish(error=error)
+            except httpx.HTTPError as e:
+                self.logger.error(f"硅基流动API调用失败: {e}")
+                trace.finish(error=str(e))
+                return {"error": str(e), "retries": state.retries}
+            except ValueError as e:
+                self.logger.error(f"解析API响应失败: {e}")
+                error = "无法解析API响应"
+                trace.finish(response.status_code, *sizes, error=error)
+            
+            delay = state.next_delay(retry_after)
+            if delay is None:
+                return {"error": error, "retries": state.retries}
+            self.logger.info(f"{delay:.1f} 秒后重试 {state.retries}/{state.policy.max_attempts - 1}...")
+            await asyncio.sleep(delay)
+
+    async def generate_answer_result(self, question: str, context: str = "",
+                                     include_system_info: bool = False,
+                                     system_info: str = "") -> Dict[str, Any]:
+        """
+        异步生成问答回复，并返回是否成功
+        
+        Returns:
+            包含 answer 和 success 的字典
+        """
+        messages = self.build_messages(question, context, include_system_info, system_info)
+        response = await self.chat_completion(messages=messages, **self.generation_params)
+        return self._parse_answer(response)
+
+    async def generate_answer(self, question: str, context: str = "",
+                              include_system_info: bool = False,
+                              system_info: str = "") -> str:
+        """
+        异步生成问答回复
+        
+        Returns:
+            AI生成的回答
+        """
+        result = await self.generate_answer_result(question, context, include_system_info, system_info)
+        return result['answer']
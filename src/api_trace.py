@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+API调用追踪模块 - 采样记录请求大小、耗时与编号
+"""
+
+import json
+import time
+import random
+import logging
+import itertools
+from typing import Dict, Any, Optional
+from config import DEV_CONFIG
+
+class _LazyJson:
+    """
+    延迟格式化的JSON，只有日志真正输出时才序列化
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, ensure_ascii=False)
+
+class ApiTracer:
+    """
+    API调用追踪器
+
+    默认按采样率记录每次调用的编号、状态码、请求/响应大小和耗时；
+    DEV_CONFIG['log_api_calls'] 开启时记录全部调用并附带完整请求与响应体。
+    日志参数均为延迟格式化，未输出的记录不会产生序列化开销。
+    """
+
+    def __init__(self, log_bodies: Optional[bool] = None, sample_rate: Optional[float] = None):
+        """
+        Args:
+            log_bodies: 是否记录完整请求与响应体
+            sample_rate: 摘要记录的采样率（0-1）
+        """
+        self.log_bodies = DEV_CONFIG.get('log_api_calls', False) if log_bodies is None else log_bodies
+        self.sample_rate = DEV_CONFIG.get('api_trace_sample_rate', 0.1) if sample_rate is None else sample_rate
+        self.logger = logging.getLogger('api_trace')
+        self._ids = itertools.count(1)
+
+    def start(self, endpoint: str, payload: Dict[str, Any], attempt: int = 1) -> 'ApiCallTrace':
+        """
+        开始追踪一次API请求
+        """
+        sampled = self.log_bodies or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        sampled = sampled and self.logger.isEnabledFor(logging.INFO)
+        trace = ApiCallTrace(self, next(self._ids), endpoint, payload, attempt, sampled)
+        if sampled and self.log_bodies:
+            self.logger.info("API请求 #%d 第%d次 %s 请求体: %s",
+                             trace.call_id, attempt, endpoint, _LazyJson(payload))
+        return trace
+
+class ApiCallTrace:
+    """
+    单次API请求的追踪记录
+    """
+    __slots__ = ('tracer', 'call_id', 'endpoint', 'payload', 'attempt', 'sampled', 'started')
+
+    def __init__(self, tracer: ApiTracer, call_id: int, endpoint: str,
+                 payload: Dict[str, Any], attempt: int, sampled: bool):
+        self.tracer = tracer
+        self.call_id = call_id
+        self.endpoint = endpoint
+        self.payload = payload
+        self.attempt = attempt
+        self.sampled = sampled
+        self.started = time.monotonic()
+
+    def finish(self, status: Optional[int] = None, request_bytes: int = 0, response_bytes: int = 0,
+               result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """
+        记录请求结果
+
+        Args:
+            status: HTTP状态码，连接失败时为None
+            request_bytes: 请求体字节数
+            response_bytes: 响应体字节数
+            result: 解析后的响应（用于提取响应编号和完整响应体）
+            error: 错误信息
+        """
+        if not self.sampled:
+            return
+
+        logger = self.tracer.logger
+        elapsed_ms = (time.monotonic() - self.started) * 1000
+        response_id = (result or {}).get('id', '-')
+        logger.info("API调用 #%d 第%d次 model=%s status=%s id=%s 请求=%dB 响应=%dB 耗时=%.0fms%s",
+                    self.call_id, self.attempt, self.payload.get('model'), status, response_id,
+                    request_bytes, response_bytes, elapsed_ms, f" 错误={error}" if error else "")
+        if self.tracer.log_bodies and result is not None:
+            logger.info("API响应 #%d 响应体: %s", self.call_id, _LazyJson(result))
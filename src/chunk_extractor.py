@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+文档块信息提取模块 - 预编译的SDK接口、标题与关键词提取
+"""
+
+import re
+from typing import List, Dict, Any, Iterable, Optional, Set, FrozenSet
+
+# 麒麟系统相关关键词
+KYLIN_KEYWORDS = (
+    '麒麟', '银河麒麟', 'Kylin', 'KylinOS',
+    '系统安装', '配置', '故障排除', '安全',
+    '驱动', '软件包', '服务', '网络',
+    '用户管理', '权限', '防火墙', '备份'
+)
+
+# (字段, 模式, 触发字面量)：只有文档块中出现触发字面量时模式才可能匹配，
+# 为 None 的模式总是执行
+SDK_PATTERNS = (
+    # C接口
+    ('c_interfaces', re.compile(r'extern\s+[\w\s\*]+\s+(\w+)\s*\([^)]*\);'), 'extern'),  # extern函数声明
+    ('c_interfaces', re.compile(r'(?<=[\w\s*])\s+(kdk_\w+)\s*\([^)]*\)'), 'kdk_'),  # kdk开头的函数
+    ('c_interfaces', re.compile(r'typedef\s+struct\s+(\w+)'), 'typedef'),  # 结构体定义
+    ('c_interfaces', re.compile(r'#define\s+(\w+)\s+'), '#define'),  # 宏定义
+    # DBus接口
+    ('dbus_interfaces', re.compile(r'\b(\w+)\s*\([^)]*\)\s*↦\s*\([^)]*\)'), '↦'),  # DBus方法签名
+    ('dbus_interfaces', re.compile(r'interface\s+([\w\.]+)'), 'interface'),  # 接口名称
+    ('dbus_interfaces', re.compile(r'method\s+(\w+)'), 'method'),  # 方法名称
+    # Python接口
+    ('python_interfaces', re.compile(r'def\s+(\w+)\s*\([^)]*\)'), 'def'),  # 函数定义
+    ('python_interfaces', re.compile(r'class\s+(\w+)'), 'class'),  # 类定义
+    ('python_interfaces', re.compile(r'import\s+([\w\.]+)'), 'import'),  # 导入模块
+    # API调用（方法调用 .name( 的名称同样被函数调用模式匹配）
+    ('api_calls', re.compile(r'\b(\w+)\s*\('), '('),
+    # 数据结构
+    ('data_structures', re.compile(r'struct\s+(\w+)'), 'struct'),  # 结构体
+    ('data_structures', re.compile(r'enum\s+(\w+)'), 'enum'),  # 枚举
+    ('data_structures', re.compile(r'typedef\s+\w+\s+(\w+)'), 'typedef'),  # 类型定义
+)
+
+SDK_FIELDS = ('c_interfaces', 'dbus_interfaces', 'python_interfaces', 'api_calls', 'data_structures')
+
+_MARKDOWN_HEADING = re.compile(r'^#{1,6}\s+(.+)$', re.MULTILINE)
+_UPPERCASE_LINE = re.compile(r'^[A-Z\s]{5,}$', re.MULTILINE)
+_CHINESE_HEADING = re.compile(r'^第[一二三四五六七八九十\d]+[章节部分]\s*[：:]\s*(.+)$', re.MULTILINE)
+_TECH_TERM = re.compile(r'\b[A-Z]{2,}\b')
+_COMMAND = re.compile(r'`([^`]+)`')
+
+class LiteralMatcher:
+    """
+    多模式字面量匹配器：一次扫描找出文本中出现的全部字面量
+
+    按 Aho–Corasick 的思路处理模式之间的重叠：所有字面量按长度降序编译为一个
+    正则交替式，由正则引擎在C层一次扫描；每次命中同时输出该字面量所包含的其他
+    字面量（相当于输出链接）。前缀可能与其他字面量后缀重叠、因而可能横跨一次
+    命中末尾的少数字面量（相当于失败链接的情形），再单独做子串检查。
+    """
+
+    def __init__(self, literals: Iterable[str]):
+        self.literals = tuple(dict.fromkeys(literal for literal in literals if literal))
+        ordered = sorted(self.literals, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(re.escape(literal) for literal in ordered)) if ordered else None
+
+        # 命中某字面量时一并输出其包含的字面量
+        self._outputs: Dict[str, FrozenSet[str]] = {
+            literal: frozenset(other for other in self.literals if other in literal)
+            for literal in self.literals
+        }
+        # 可能从另一字面量的命中内部开始、并延伸到其末尾之后的字面量
+        self._straddling = tuple(
+            other for other in self.literals
+            if any(literal.endswith(other[:i]) for literal in self.literals
+                   for i in range(1, min(len(literal), len(other))))
+        )
+
+    def find(self, text: str) -> Set[str]:
+        """
+        返回 text 中出现的字面量集合
+        """
+        found = set()
+        if self._pattern is None:
+            return found
+        for literal in set(self._pattern.findall(text)):
+            found |= self._outputs[literal]
+        for literal in self._straddling:
+            if literal not in found and literal in text:
+                found.add(literal)
+        return found
+
+class ChunkExtractor:
+    """
+    文档块结构化信息提取器
+
+    先用 LiteralMatcher 对文档块做一次字面量扫描，同时得到命中的关键词和各
+    正则模式的触发字面量，再只执行可能匹配的预编译模式。提取结果与逐个模式
+    全文查找一致。提取器只包含预编译模式，可以序列化后在工作进程中使用。
+    """
+
+    def __init__(self, keywords: Iterable[str] = KYLIN_KEYWORDS):
+        self.keywords = tuple(keywords)
+        triggers = [trigger for _, _, trigger in SDK_PATTERNS if trigger] + ['#', '第', '`']
+        self.matcher = LiteralMatcher(self.keywords + tuple(triggers))
+
+    def extract(self, content: str) -> Dict[str, Any]:
+        """
+        提取SDK接口、标题和关键词
+
+        Returns:
+            包含 sdk_interfaces、headings、keywords 的字典
+        """
+        found = self.matcher.find(content)
+        return {
+            'sdk_interfaces': self.extract_sdk_interfaces(content, found),
+            'headings': self.extract_headings(content, found),
+            'keywords': self.extract_keywords(content, found),
+        }
+
+    def extract_sdk_interfaces(self, content: str, found: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+        """
+        提取SDK接口信息
+        """
+        if found is None:
+            found = self.matcher.find(content)
+        interfaces = {field: set() for field in SDK_FIELDS}
+        for field, pattern, trigger in SDK_PATTERNS:
+            if trigger is None or trigger in found:
+                interfaces[field].update(pattern.findall(content))
+        return {field: list(names) for field, names in interfaces.items()}
+
+    def extract_headings(self, text: str, found: Optional[Set[str]] = None) -> List[str]:
+        """
+        提取文档标题
+        """
+        if found is None:
+            found = self.matcher.find(text)
+        headings = set()
+
+        # Markdown风格标题
+        if '#' in found:
+            headings.update(_MARKDOWN_HEADING.findall(text))
+
+        # 全大写的行（可能是标题）
+        headings.update(line.strip() for line in _UPPERCASE_LINE.findall(text) if len(line.strip()) < 50)
+
+        # 中文标题模式
+        if '第' in found:
+            headings.update(_CHINESE_HEADING.findall(text))
+
+        return list(headings)
+
+    def extract_keywords(self, text: str, found: Optional[Set[str]] = None) -> List[str]:
+        """
+        提取关键词
+        """
+        if found is None:
+            found = self.matcher.find(text)
+        keywords = {keyword for keyword in self.keywords if keyword in found}
+
+        # 技术术语（大写缩写）
+        keywords.update(term for term in _TECH_TERM.findall(text) if len(term) <= 10)
+
+        # 反引号包围的命令和文件路径
+        if '`' in found:
+            keywords.update(cmd for cmd in _COMMAND.findall(text) if len(cmd) <= 30)
+
+        return list(keywords)
+
+_default_extractor: Optional[ChunkExtractor] = None
+
+def extract_chunk_info(content: str) -> Dict[str, Any]:
+    """
+    使用默认提取器提取文档块信息
+
+    定义为模块级函数，便于直接提交到进程池；每个工作进程只编译一次模式。
+    """
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = ChunkExtractor()
+    return _default_extractor.extract(content)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+上下文打包模块 - 按token预算组装检索到的文档
+"""
+
+import re
+import math
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional
+from config import RAG_CONFIG, DEFAULT_MODEL
+
+# 每个汉字的平均token数（按模型系列），未知模型按1个token估计
+CJK_TOKEN_RATIOS = {
+    'qwen': 0.7,
+    'deepseek': 0.6
+}
+
+_TOKEN_PATTERN = re.compile(r'([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([A-Za-z]+)|(\d)|(\S)')
+_SENTENCE_END = re.compile(r'[。！？；!?;\n]')
+
+class ContextPacker:
+    """
+    按token预算打包上下文
+
+    文档按相似度从高到低贪心放入预算，放不下的文档截断到剩余预算（优先在句末截断）；
+    同一源文件中位置重叠的文档块只保留未出现过的部分，内容相同的块只保留一个。
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, model: Optional[str] = None,
+                 min_partial_tokens: int = 64):
+        """
+        Args:
+            max_tokens: 上下文token预算
+            model: 目标模型名称，用于估计token数
+            min_partial_tokens: 剩余预算低于该值时不再截断放入文档
+        """
+        self.max_tokens = max_tokens or RAG_CONFIG.get('max_context_tokens', 1500)
+        self.min_partial_tokens = min_partial_tokens
+        self.logger = logging.getLogger(__name__)
+
+        model = (model or DEFAULT_MODEL).lower()
+        self.cjk_ratio = next((ratio for family, ratio in CJK_TOKEN_RATIOS.items() if family in model), 1.0)
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        估计文本的token数
+
+        汉字按模型系列的平均比例计算，英文单词约4个字母一个token，
+        数字逐位计算（Qwen分词器按位切分数字），其他符号各计一个token。
+        """
+        tokens = 0.0
+        for match in _TOKEN_PATTERN.finditer(text):
+            group = match.lastindex
+            if group == 1:
+                tokens += len(match.group(1)) * self.cjk_ratio
+            elif group == 2:
+                tokens += math.ceil(len(match.group(2)) / 4)
+            else:
+                tokens += 1
+        return math.ceil(tokens)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        截断文本到指定token数以内，尽量在句末截断
+        """
+        if self.estimate_tokens(text) <= max_tokens:
+            return text
+
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.estimate_tokens(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+
+        prefix = text[:low]
+        ends = [m.end() for m in _SENTENCE_END.finditer(prefix)]
+        if ends and ends[-1] >= len(prefix) // 2:
+            prefix = prefix[:ends[-1]]
+        return prefix.rstrip()
+
+    @staticmethod
+    def _remove_overlap(doc: Dict[str, Any], selected: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        去掉与已选文档块（同一源文件）重叠的部分
+
+        Returns:
+            剩余内容，完全被覆盖时返回None
+        """
+        content = doc.get('content', '')
+        start, end = doc.get('start_pos'), doc.get('end_pos')
+        if start is None or end is None or end - start != len(content):
+            return content
+
+        for other in selected:
+            if other.get('source_file') != doc.get('source_file'):
+                continue
+            o_start, o_end = other.get('start_pos'), other.get('end_pos')
+            if o_start is None or o_end is None or o_end <= start or o_start >= end:
+                continue
+            if o_start <= start and o_end >= end:
+                return None
+            if o_start <= start:
+                content, start = content[o_end - start:], o_end
+            elif o_end >= end:
+                content, end = content[:o_start - start], o_start
+        return content
+
+    def pack(self, documents: List[Dict[str, Any]], reserved_tokens: int = 0) -> Dict[str, Any]:
+        """
+        打包相关文档
+
+        Args:
+            documents: 检索到的文档（含 content、similarity，可选 source_file/start_pos/end_pos）
+            reserved_tokens: 已被其他内容（如系统信息）占用的token数
+
+        Returns:
+            包含 text、tokens、documents（放入的文档）、truncated、dropped 的字典
+        """
+        budget = self.max_tokens - reserved_tokens
+        ranked = sorted(documents, key=lambda doc: doc.get('similarity', 0), reverse=True)
+
+        parts = []
+        selected = []
+        seen = set()
+        used = 0
+        truncated = 0
+
+        for doc in ranked:
+            if budget - used < self.min_partial_tokens:
+                break
+
+            content = self._remove_overlap(doc, selected)
+            if not content or not content.strip():
+                continue
+            digest = hashlib.sha1(content.strip().encode('utf-8')).digest()
+            if digest in seen:
+                continue
+
+            header = f"文档{len(selected) + 1} (相似度: {doc.get('similarity', 0):.3f}):\n"
+            cost = self.estimate_tokens(header + content)
+            if used + cost > budget:
+                ellipsis_tokens = self.estimate_tokens("……")
+                content = self.truncate(content, budget - used - self.estimate_tokens(header) - ellipsis_tokens)
+                if not content:
+                    break
+                content += "……"
+                cost = self.estimate_tokens(header + content)
+                truncated += 1
+
+            seen.add(digest)
+            selected.append(doc)
+            parts.append(f"{header}{content}\n")
+            used += cost
+
+        return {
+            'text': "\n".join(parts),
+            'tokens': used,
+            'documents': selected,
+            'truncated': truncated,
+            'dropped': len(documents) - len(selected)
+        }
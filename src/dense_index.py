@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+稠密向量索引模块 - 哈希随机投影编码与近似最近邻检索（纯CPU、离线）
+"""
+
+import os
+import json
+import zlib
+import shutil
+import logging
+import numpy as np
+import scipy.sparse as sp
+from typing import List, Dict, Any, Optional, Tuple
+from index_storage import _atomic_write, _save_array
+
+# 本地嵌入模型（可选）
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# HNSW索引（可选）
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+class HashedProjectionEncoder:
+    """
+    哈希随机投影编码器
+
+    每个词项按哈希映射到 nnz_per_term 个维度并取随机正负号（稀疏随机投影），
+    稀疏TF-IDF向量乘以投影矩阵后得到稠密向量，内积近似保持余弦相似度。
+    投影由词项字符串决定，不需要保存，新增词项也不影响已有向量。
+    （nnz_per_term 个非零元的稀疏投影与 Achlioptas/Li 的稀疏随机投影相同，
+    维度为 dim 时内积误差约为 1/sqrt(dim)。）
+    """
+
+    def __init__(self, dim: int = 256, nnz_per_term: int = 4, seed: int = 0):
+        self.dim = dim
+        self.nnz_per_term = nnz_per_term
+        self.seed = seed
+        self.name = f"hashed-{dim}"
+        self._indices = np.zeros(0, dtype=np.int32)  # 每个词项映射到的维度（按词项编号连续存放）
+        self._signs = np.zeros(0, dtype=np.float32)
+
+    def _project_terms(self, terms: List[str]):
+        """
+        为新增词项计算哈希维度和符号
+        """
+        indices = np.empty(len(terms) * self.nnz_per_term, dtype=np.int32)
+        signs = np.empty(len(terms) * self.nnz_per_term, dtype=np.float32)
+        scale = 1.0 / np.sqrt(self.nnz_per_term)
+        pos = 0
+        for term in terms:
+            data = term.encode('utf-8')
+            for j in range(self.nnz_per_term):
+                h = zlib.crc32(data, self.seed * 131 + j)
+                indices[pos] = h % self.dim
+                signs[pos] = scale if (h >> 31) & 1 else -scale
+                pos += 1
+        self._indices = np.concatenate([self._indices, indices])
+        self._signs = np.concatenate([self._signs, signs])
+
+    def encode(self, weights: sp.csr_matrix, terms: List[str], block_size: int = 4096) -> np.ndarray:
+        """
+        将稀疏权重矩阵（行 x 词项）编码为L2归一化的float32稠密矩阵
+
+        只访问非零权重对应的投影位置，开销与非零元素数成正比，与词表大小无关。
+        """
+        known = len(self._indices) // self.nnz_per_term
+        if weights.shape[1] > known:
+            self._project_terms(terms[known:weights.shape[1]])
+
+        dense = np.zeros((weights.shape[0], self.dim), dtype=np.float32)
+        for start in range(0, weights.shape[0], block_size):
+            block = weights[start:start + block_size]
+            rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+            # 每个非零元素展开为 nnz_per_term 个 (行, 维度, 权重 × 符号)
+            positions = (block.indices[:, None] * self.nnz_per_term + np.arange(self.nnz_per_term)).ravel()
+            flat = np.repeat(rows, self.nnz_per_term) * self.dim + self._indices[positions]
+            values = np.repeat(block.data, self.nnz_per_term) * self._signs[positions]
+            dense[start:start + block.shape[0]] = np.bincount(
+                flat, weights=values, minlength=block.shape[0] * self.dim).reshape(-1, self.dim)
+        return _normalize_rows(dense)
+
+class LocalModelEncoder:
+    """
+    本地 sentence-transformers 模型编码器（仅CPU）
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 32):
+        if SentenceTransformer is None:
+            raise ImportError("本地嵌入模型需要安装 sentence-transformers")
+        self.model = SentenceTransformer(model_path, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_path
+        self.batch_size = batch_size
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                    normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按行对称量化为int8，返回 (int8矩阵, 每行缩放系数)
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+class IVFIndex:
+    """
+    倒排文件（IVF）近似最近邻索引
+
+    用球面k-means把向量划分为 nlist 个簇，检索时只扫描与查询最接近的
+    nprobe 个簇中的向量。
+    """
+
+    def __init__(self, nlist: int, seed: int = 0):
+        self.nlist = nlist
+        self.seed = seed
+        self.centroids = None
+        self.list_ids = []  # 每个簇中的向量编号
+
+    def train(self, vectors: np.ndarray, iterations: int = 10, max_samples: int = 50000):
+        """
+        训练簇中心（样本过多时抽样训练）
+        """
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > max_samples:
+            sample = vectors[rng.choice(len(vectors), max_samples, replace=False)]
+        sample = np.asarray(sample, dtype=np.float32)
+
+        self.nlist = max(1, min(self.nlist, len(sample)))
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=self.nlist)
+            empty = counts == 0
+            if empty.any():
+                # 空簇用随机样本重新初始化
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize_rows(sums)
+        self.centroids = centroids
+        self.list_ids = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+
+    def add(self, vectors: np.ndarray, start_id: int):
+        """
+        将向量分配到最近的簇
+        """
+        assign = np.argmax(np.asarray(vectors, dtype=np.float32) @ self.centroids.T, axis=1)
+        ids = np.arange(start_id, start_id + len(vectors), dtype=np.int64)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        for c in range(self.nlist):
+            if bounds[c] < bounds[c + 1]:
+                self.list_ids[c] = np.concatenate([self.list_ids[c], ids[order[bounds[c]:bounds[c + 1]]]])
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        返回最接近查询的 nprobe 个簇中的全部向量编号
+        """
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.list_ids[c] for c in probes])
+
+    def save(self, path):
+        _save_array(path('centroids.npy'), self.centroids)
+        offsets = np.cumsum([0] + [len(ids) for ids in self.list_ids]).astype(np.int64)
+        _save_array(path('list_offsets.npy'), offsets)
+        _save_array(path('list_ids.npy'), np.concatenate(self.list_ids) if self.list_ids else np.zeros(0, np.int64))
+
+    def load(self, path):
+        self.centroids = np.load(path('centroids.npy'))
+        self.nlist = len(self.centroids)
+        offsets = np.load(path('list_offsets.npy'))
+        ids = np.load(path('list_ids.npy'))
+        self.list_ids = [ids[offsets[c]:offsets[c + 1]] for c in range(self.nlist)]
+
+class DenseIndex:
+    """
+    稠密向量索引
+
+    向量以float32或int8（按行缩放）矩阵保存在独立目录中，加载时以只读
+    内存映射方式打开。近似检索可选IVF、HNSW（需安装hnswlib）或精确扫描。
+
+    目录结构:
+        meta.json                    维度、量化方式、索引类型与对应的文档数
+        vectors.npy / scales.npy     稠密向量（int8时附带每行缩放系数）
+        centroids.npy / list_offsets.npy / list_ids.npy   IVF簇中心与倒排列表
+        hnsw.bin                     HNSW图（使用hnswlib时）
+    """
+
+    def __init__(self, index_dir: str, quantization: str = 'int8', ann: str = 'ivf',
+                 nprobe: int = 8, nlist: Optional[int] = None):
+        self.index_dir = index_dir
+        self.logger = logging.getLogger(__name__)
+        self.quantization = quantization
+        self.nprobe = nprobe
+        self.nlist = nlist
+
+        if ann == 'hnsw' and hnswlib is None:
+            self.logger.warning("未安装hnswlib，近似检索改用IVF")
+            ann = 'ivf'
+        self.ann = ann
+        self._reset()
+
+    def _reset(self):
+        self.vectors = None
+        self.scales = None
+        self.ivf = None
+        self.hnsw = None
+        self.meta = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def _store(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.quantization == 'int8':
+            return quantize_int8(vectors)
+        return np.asarray(vectors, dtype=np.float32), None
+
+    def build(self, vectors: np.ndarray, meta: Dict[str, Any]):
+        """
+        用全部向量重建索引
+        """
+        self._reset()
+        self.vectors, self.scales = self._store(vectors)
+        if self.ann == 'ivf':
+            self.ivf = IVFIndex(self.nlist or max(1, int(np.sqrt(len(vectors)))))
+            self.ivf.train(vectors)
+            self.ivf.add(vectors, 0)
+        elif self.ann == 'hnsw':
+            self.hnsw = hnswlib.Index(space='ip', dim=vectors.shape[1])
+            self.hnsw.init_index(max_elements=max(len(vectors), 1), ef_construction=200, M=16)
+            self.hnsw.add_items(vectors, np.arange(len(vectors)))
+        self.meta = dict(meta)
+
+    def add(self, vectors: np.ndarray, meta: Dict[str, Any]):
+        """
+        追加向量（沿用已训练的簇中心）
+        """
+        if self.vectors is None:
+            self.build(vectors, meta)
+            return
+
+        start = len(self.vectors)
+        stored, scales = self._store(vectors)
+        self.vectors = np.concatenate([self.vectors, stored])
+        if scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        if self.ivf is not None:
+            self.ivf.add(vectors, start)
+        elif self.hnsw is not None:
+            self.hnsw.resize_index(len(self.vectors))
+            self.hnsw.add_items(vectors, np.arange(start, len(self.vectors)))
+        self.meta = dict(meta)
+
+    def _score(self, ids: np.ndarray, query: np.ndarray) -> np.ndarray:
+        scores = np.asarray(self.vectors[ids], dtype=np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[ids]
+        return scores
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        检索与查询向量内积最大的前top_k个向量
+
+        Returns:
+            (向量编号, 相似度)，按相似度降序
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32)
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(top_k * 4, 50))
+            k = min(top_k * 2, len(self))
+            labels, _ = self.hnsw.knn_query(query, k=k)
+            ids = labels[0].astype(np.int64)
+        elif self.ivf is not None:
+            ids = self.ivf.candidates(query, self.nprobe)
+        else:
+            ids = np.arange(len(self), dtype=np.int64)
+
+        # 候选统一用存储的（量化）向量重新打分
+        scores = self._score(ids, query)
+        if len(ids) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return ids[order], scores[order]
+
+    def save(self):
+        """
+        写入索引目录（先写元数据以外的文件，最后原子替换meta.json）
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        _save_array(self._path('vectors.npy'), self.vectors)
+        if self.scales is not None:
+            _save_array(self._path('scales.npy'), self.scales)
+        if self.ivf is not None:
+            self.ivf.save(self._path)
+        if self.hnsw is not None:
+            self.hnsw.save_index(self._path('hnsw.bin'))
+
+        meta = dict(self.meta, quantization=self.quantization, ann=self.ann, count=len(self))
+        data = json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8')
+        _atomic_write(self._path('meta.json'), lambda f: f.write(data))
+
+    def load(self) -> bool:
+        """
+        加载索引，配置不一致或文件缺失时返回False
+        """
+        try:
+            with open(self._path('meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('quantization') != self.quantization or meta.get('ann') != self.ann:
+                return False
+
+            vectors = np.load(self._path('vectors.npy'), mmap_mode='r')
+            scales = np.load(self._path('scales.npy')) if self.quantization == 'int8' else None
+            if len(vectors) != meta['count']:
+                return False
+
+            self._reset()
+            self.vectors, self.scales, self.meta = vectors, scales, meta
+            if self.ann == 'ivf':
+                self.ivf = IVFIndex(0)
+                self.ivf.load(self._path)
+            elif self.ann == 'hnsw':
+                self.hnsw = hnswlib.Index(space='ip', dim=vectors.shape[1])
+                self.hnsw.load_index(self._path('hnsw.bin'), max_elements=len(vectors))
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.debug(f"稠密索引不可用: {e}")
+            self._reset()
+            return False
+
+    def clear(self):
+        """
+        删除索引目录
+        """
+        self._reset()
+        if os.path.exists(self.index_dir):
+            shutil.rmtree(self.index_dir, ignore_errors=True)
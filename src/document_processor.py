@@ -5,8 +5,13 @@
 
 import os
 import re
+import codecs
 import logging
-from typing import List, Dict, Any, Optional
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Union
 from pathlib import Path
 
 # 导入文档处理库
@@ -24,17 +29,84 @@ except ImportError:
     markdown = None
     BeautifulSoup = None
 
-from config import VECTOR_CONFIG, SUPPORTED_DOC_TYPES
+from config import VECTOR_CONFIG, SUPPORTED_DOC_TYPES, PERFORMANCE_CONFIG
+from chunk_extractor import ChunkExtractor, SDK_FIELDS
+
+_PARAGRAPH_BREAK = re.compile(r'\n(?:[^\S\n]*\n)+')  # 空行（不吞掉下一段的行首缩进）
+_TRAILING_SPACE = re.compile(r'[ \t\f\v\u3000]+$', re.MULTILINE)
+_INLINE_SPACE = re.compile(r'(?<=\S)[ \t\f\v\u3000]+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+# 句子结尾：中文句末标点、后接空白的英文句末标点，或换行
+_SENTENCE_END = re.compile(r'(?:[。！？；…]+[”’」』）)"\']*|[.!?]+[)"\']*(?=\s|$))\s*|\n')
+_CLAUSE_END = re.compile(r'[，、,：:]\s*|\s+')
+_HEADING = re.compile(r'(?:#{1,6}\s+|第[一二三四五六七八九十百零\d]+[章节部分篇]|[一二三四五六七八九十]+、|\d+(?:\.\d+)+\s*)\S')
+_CODE_FENCE = re.compile(r'\s*(?:```|~~~)')
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """
+    提取PDF第 [start, end) 页的文本
+
+    定义为模块级函数，便于在进程池的工作进程中调用。优先使用pdfplumber，
+    某一页提取失败时只对该页改用PyPDF2，仍失败则跳过该页。
+    """
+    logger = logging.getLogger(__name__)
+    plumber = None
+    if pdfplumber:
+        try:
+            plumber = pdfplumber.open(file_path)
+        except Exception as e:
+            logger.warning(f"pdfplumber无法打开 {file_path}，改用PyPDF2: {str(e)}")
+    
+    reader = None
+    texts = []
+    try:
+        for index in range(start, end):
+            text = None
+            if plumber is not None:
+                try:
+                    page = plumber.pages[index]
+                    text = page.extract_text() or ""
+                    page.close()  # 释放该页的解析缓存
+                except Exception as e:
+                    logger.warning(f"pdfplumber处理第 {index + 1} 页失败，尝试PyPDF2: {str(e)}")
+            
+            if text is None and PyPDF2:
+                try:
+                    if reader is None:
+                        reader = PyPDF2.PdfReader(file_path)
+                    text = reader.pages[index].extract_text() or ""
+                except Exception as e:
+                    logger.error(f"PyPDF2处理第 {index + 1} 页失败，跳过该页: {str(e)}")
+            
+            texts.append(text or "")
+    finally:
+        if plumber is not None:
+            plumber.close()
+    
+    return texts
 
 class DocumentProcessor:
     """
     文档处理器类
     """
     
-    def __init__(self):
+    # 文本文件依次尝试的编码
+    TEXT_ENCODINGS = ('utf-8', 'gbk', 'gb2312', 'latin-1')
+    
+    def __init__(self, pdf_workers: Optional[int] = None):
+        """
+        Args:
+            pdf_workers: 并行提取PDF页面的进程数，默认取 max_concurrent_processes
+        """
         self.logger = logging.getLogger(__name__)
         self.chunk_size = VECTOR_CONFIG.get('chunk_size', 500)
         self.chunk_overlap = VECTOR_CONFIG.get('chunk_overlap', 50)
+        self.pdf_workers = pdf_workers or PERFORMANCE_CONFIG.get('max_concurrent_processes', 4)
+        self.pdf_pages_per_task = PERFORMANCE_CONFIG.get('pdf_pages_per_task', 16)
+        self.pdf_parallel_min_pages = PERFORMANCE_CONFIG.get('pdf_parallel_min_pages', 64)
+        self.text_block_size = PERFORMANCE_CONFIG.get('text_block_size', 1 << 20)
+        self.encoding_sample_size = PERFORMANCE_CONFIG.get('encoding_sample_size', 1 << 16)
+        self.extractor = ChunkExtractor()
     
     def process_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -47,32 +119,7 @@ class DocumentProcessor:
             文档块列表
         """
         try:
-            file_path = Path(file_path)
-            
-            if not file_path.exists():
-                raise FileNotFoundError(f"文件不存在: {file_path}")
-            
-            file_ext = file_path.suffix.lower()
-            
-            # 根据文件类型选择处理方法
-            if file_ext == '.pdf':
-                content = self._process_pdf(file_path)
-            elif file_ext == '.md':
-                content = self._process_markdown(file_path)
-            elif file_ext in ['.txt', '.rst']:
-                content = self._process_text(file_path)
-            else:
-                raise ValueError(f"不支持的文件类型: {file_ext}")
-            
-            # 分块处理
-            chunks = self._split_into_chunks(content, str(file_path), file_ext)
-            
-            # 提取结构化信息
-            for chunk in chunks:
-                chunk['sdk_interfaces'] = self._extract_sdk_interfaces(chunk['content'])
-                chunk['headings'] = self._extract_headings(chunk['content'])
-                chunk['keywords'] = self._extract_keywords(chunk['content'])
-            
+            chunks = list(self.iter_file_chunks(file_path))
             self.logger.info(f"成功处理文件 {file_path}，生成 {len(chunks)} 个文档块")
             return chunks
             
@@ -80,37 +127,88 @@ class DocumentProcessor:
             self.logger.error(f"处理文件 {file_path} 失败: {str(e)}")
             raise
     
-    def _process_pdf(self, file_path: Path) -> str:
+    def iter_file_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
         """
-        处理PDF文件
+        逐个产出文件的文档块（含提取的结构化信息）
+        
+        PDF逐页、文本文件逐块读取，边读边清理和分块，内存占用与文件大小无关；
+        Markdown需要整体转换为HTML，仍一次读入。
+        
+        Args:
+            file_path: 文件路径
         """
-        content = ""
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        
+        file_ext = file_path.suffix.lower()
         
-        # 优先使用pdfplumber
+        # 根据文件类型选择处理方法
+        if file_ext == '.pdf':
+            pieces = self._iter_pdf_pages(file_path)
+        elif file_ext == '.md':
+            pieces = [self._process_markdown(file_path)]
+        elif file_ext in ['.txt', '.rst']:
+            pieces = self._iter_paragraphs(self._iter_text_blocks(file_path))
+        else:
+            raise ValueError(f"不支持的文件类型: {file_ext}")
+        
+        # 分块处理并提取结构化信息
+        for chunk in self._iter_chunks(pieces, str(file_path), file_ext):
+            try:
+                chunk.update(self.extractor.extract(chunk['content']))
+            except Exception as e:
+                self.logger.error(f"提取文档块信息失败: {str(e)}")
+                chunk.update(sdk_interfaces={field: [] for field in SDK_FIELDS}, headings=[], keywords=[])
+            yield chunk
+    
+    def _pdf_page_count(self, file_path: Path) -> int:
+        """
+        获取PDF页数
+        """
         if pdfplumber:
             try:
                 with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            content += page_text + "\n"
-                return content
+                    return len(pdf.pages)
             except Exception as e:
-                self.logger.warning(f"pdfplumber处理失败，尝试PyPDF2: {str(e)}")
+                self.logger.warning(f"pdfplumber读取页数失败，尝试PyPDF2: {str(e)}")
         
-        # 备用PyPDF2
         if PyPDF2:
-            try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    for page in pdf_reader.pages:
-                        content += page.extract_text() + "\n"
-                return content
-            except Exception as e:
-                self.logger.error(f"PyPDF2处理失败: {str(e)}")
+            return len(PyPDF2.PdfReader(str(file_path)).pages)
         
         raise RuntimeError("无法处理PDF文件，请安装pdfplumber或PyPDF2")
     
+    def _iter_pdf_pages(self, file_path: Path) -> Iterator[str]:
+        """
+        按页序逐页产出PDF文本
+        
+        页数达到 pdf_parallel_min_pages 时，按 pdf_pages_per_task 页一段分发到进程池
+        并行提取；同时在途的页段不超过进程数的两倍，内存占用与总页数无关。
+        """
+        n_pages = self._pdf_page_count(file_path)
+        step = self.pdf_pages_per_task
+        ranges = [(start, min(start + step, n_pages)) for start in range(0, n_pages, step)]
+        
+        workers = min(self.pdf_workers, len(ranges), os.cpu_count() or 1)
+        if workers <= 1 or n_pages < self.pdf_parallel_min_pages:
+            for start, end in ranges:
+                yield from _extract_pdf_pages(str(file_path), start, end)
+            return
+        
+        self.logger.info(f"并行提取PDF {file_path}，共 {n_pages} 页，进程数: {workers}")
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            tasks = iter(ranges)
+            pending = deque(executor.submit(_extract_pdf_pages, str(file_path), start, end)
+                            for start, end in itertools.islice(tasks, 2 * workers))
+            while pending:
+                texts = pending.popleft().result()
+                next_range = next(tasks, None)
+                if next_range is not None:
+                    pending.append(executor.submit(_extract_pdf_pages, str(file_path), *next_range))
+                yield from texts
+    
     def _process_markdown(self, file_path: Path) -> str:
         """
         处理Markdown文件
@@ -138,230 +236,310 @@ class DocumentProcessor:
             self.logger.error(f"处理Markdown文件失败: {str(e)}")
             raise
     
-    def _process_text(self, file_path: Path) -> str:
+    def _detect_encoding(self, file_path: Path) -> str:
+        """
+        根据文件开头的样本检测编码
+        """
+        with open(file_path, 'rb') as file:
+            sample = file.read(self.encoding_sample_size)
+        
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        
+        # 样本末尾可能截断多字节字符，未读到文件末尾时不要求样本完整
+        final = len(sample) < self.encoding_sample_size
+        for encoding in self.TEXT_ENCODINGS:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return self.TEXT_ENCODINGS[-1]
+    
+    def _iter_text_blocks(self, file_path: Path) -> Iterator[str]:
         """
-        处理文本文件
+        按块读取文本文件
+        
+        编码只根据开头样本检测一次，文件只读一遍；样本之后出现的非法字节
+        以替换字符代替，不会中断导入。
         """
         try:
-            # 尝试不同的编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        return file.read()
-                except UnicodeDecodeError:
-                    continue
-            
-            raise UnicodeDecodeError("无法解码文件，尝试了多种编码格式")
+            encoding = self._detect_encoding(file_path)
+            self.logger.debug(f"文件 {file_path} 的编码: {encoding}")
             
+            with open(file_path, 'r', encoding=encoding, errors='replace') as file:
+                while True:
+                    block = file.read(self.text_block_size)
+                    if not block:
+                        break
+                    yield block
+                    
         except Exception as e:
             self.logger.error(f"处理文本文件失败: {str(e)}")
             raise
     
-    def _split_into_chunks(self, content: str, file_path: str, file_type: str) -> List[Dict[str, Any]]:
+    def _iter_paragraphs(self, blocks: Iterable[str]) -> Iterator[Union[str, Tuple[str, str]]]:
         """
-        将内容分割成块
+        将文本块流切分为段落（以空行分隔），段落整体产出，由分块器按句子拆分
+        
+        未结束的段落超过 text_block_size 时，在最后一个句子结尾处切开先产出前半部分，
+        其余部分留到后续读取；续接的片段以 (连接符, 文本) 产出，表示与上一片段属于
+        同一段落，分块时不插入段落分隔。缓冲区最多为 text_block_size 加一个读取块。
+        """
+        limit = max(self.text_block_size, 1)
+        buffer = ""
+        joiner = None  # 下一个产出的片段与上一片段之间的连接符，None 表示段落分隔
+        
+        def piece(text):
+            return text if joiner is None else (joiner, text)
+        
+        for block in blocks:
+            buffer += block
+            start = 0
+            for match in _PARAGRAPH_BREAK.finditer(buffer):
+                yield piece(buffer[start:match.start()])
+                joiner = None
+                start = match.end()
+            buffer = buffer[start:]
+            
+            if len(buffer) > limit:
+                # 在最后一个句子结尾处切开，找不到句子结尾时按 text_block_size 硬切
+                cut = 0
+                for match in _SENTENCE_END.finditer(buffer):
+                    if match.end() < len(buffer):
+                        cut = match.end()
+                cut = cut or limit
+                head = buffer[:cut]
+                yield piece(head)
+                gap = head[len(head.rstrip()):]
+                joiner = "\n" if "\n" in gap else (" " if gap else "")
+                buffer = buffer[cut:]
+        
+        if buffer:
+            yield piece(buffer)
+    
+    def _iter_chunks(self, pieces: Iterable[Union[str, Tuple[str, str]]], file_path: str,
+                     file_type: str) -> Iterator[Dict[str, Any]]:
         """
-        chunks = []
+        将依次到来的文本片段（如PDF的各页）分割成块
+        
+        每个片段单独清理，片段之间视为段落边界。按结构切分：标题行开启新块，
+        围栏代码块尽量完整保留，段落放不进当前块时另起一块，过长的段落按句子
+        拆开。块不超过 chunk_size，新块以上一块末尾不超过 chunk_overlap 的文本
+        开头（新的一节除外）。块装满即产出，只在内存中保留当前未满的块。
         
-        # 清理内容
-        content = self._clean_content(content)
+        start_pos/end_pos 是块在清理后文本中的位置，相邻块的重叠部分位置相同。
+        """
+        size = self.chunk_size
+        overlap = max(min(self.chunk_overlap, size // 2), 0)
+        current = ""
+        chunk_id = 0
+        chunk_start = 0
+        position = 0
+        has_body = False  # 当前块是否包含标题与重叠部分以外的内容
         
-        if len(content) <= self.chunk_size:
-            # 内容较短，不需要分割
-            chunks.append({
-                'content': content,
-                'chunk_id': 0,
+        def make_chunk():
+            return {
+                'content': current,
+                'chunk_id': chunk_id,
                 'source_file': file_path,
                 'file_type': file_type,
-                'start_pos': 0,
-                'end_pos': len(content)
-            })
-        else:
-            # 按段落分割
-            paragraphs = content.split('\n\n')
-            current_chunk = ""
-            chunk_id = 0
-            start_pos = 0
+                'start_pos': chunk_start,
+                'end_pos': chunk_start + len(current)
+            }
+        
+        for sep, text, kind in self._iter_units(pieces, size - overlap):
+            start = position + len(sep) if position else 0
+            position = start + len(text)
             
-            for paragraph in paragraphs:
-                # 检查添加当前段落是否会超过块大小
-                if len(current_chunk) + len(paragraph) + 2 <= self.chunk_size:
-                    if current_chunk:
-                        current_chunk += "\n\n" + paragraph
-                    else:
-                        current_chunk = paragraph
-                else:
-                    # 保存当前块
-                    if current_chunk:
-                        chunks.append({
-                            'content': current_chunk,
-                            'chunk_id': chunk_id,
-                            'source_file': file_path,
-                            'file_type': file_type,
-                            'start_pos': start_pos,
-                            'end_pos': start_pos + len(current_chunk)
-                        })
-                        start_pos += len(current_chunk)
-                        chunk_id += 1
-                    
-                    # 开始新块
-                    current_chunk = paragraph
+            if current and kind == 'heading' and has_body:
+                # 标题开启新的一节，不与上一节重叠
+                yield make_chunk()
+                chunk_id += 1
+                current = ""
+                has_body = False
+            elif current and len(current) + len(sep) + len(text) > size:
+                yield make_chunk()
+                chunk_id += 1
+                tail = self._overlap_tail(current, overlap) if kind != 'heading' else ""
+                if len(tail) + len(sep) + len(text) > size:
+                    tail = ""
+                chunk_start += len(current) - len(tail)
+                current = tail
+                has_body = False
             
-            # 保存最后一个块
-            if current_chunk:
-                chunks.append({
-                    'content': current_chunk,
-                    'chunk_id': chunk_id,
-                    'source_file': file_path,
-                    'file_type': file_type,
-                    'start_pos': start_pos,
-                    'end_pos': start_pos + len(current_chunk)
-                })
-        
-        return chunks
+            if current:
+                current += sep + text
+            else:
+                current, chunk_start = text, start
+            has_body = has_body or kind != 'heading'
+        
+        # 保存最后一个块
+        if current:
+            yield make_chunk()
     
-    def _clean_content(self, content: str) -> str:
+    def _iter_units(self, pieces: Iterable[Union[str, Tuple[str, str]]],
+                    limit: int) -> Iterator[Tuple[str, str, str]]:
         """
-        清理文本内容
+        将文本片段流拆成分块单元 (分隔符, 文本, 类型)
+        
+        片段之间视为段落边界；(连接符, 文本) 形式的片段续接上一片段的段落。
+        类型为 heading（标题行）、code（围栏代码块或其中的行）或 text。不超过
+        limit 的段落是一个单元，更长的段落按句子拆开；单元之间以分隔符连接即为
+        清理后的文本。
         """
-        # 移除多余的空白字符
-        content = re.sub(r'\s+', ' ', content)
+        size = self.chunk_size
+        sep = ""
+        prose = []  # 当前段落中尚未产出的普通文本行
+        code = None  # 正在收集的代码块行，None 表示不在代码块中
         
-        # 移除多余的换行
-        content = re.sub(r'\n\s*\n', '\n\n', content)
+        def flush_prose():
+            units = self._text_units("\n".join(prose), limit) if prose else []
+            prose.clear()
+            return units
         
-        # 移除首尾空白
-        content = content.strip()
+        for piece in pieces:
+            joiner = None
+            if isinstance(piece, tuple):
+                joiner, piece = piece
+            piece = self._clean_content(piece)
+            if not piece:
+                continue
+            
+            for index, paragraph in enumerate(piece.split('\n\n')):
+                if index == 0 and joiner is not None:
+                    # 续接上一片段的同一段落
+                    sep = joiner if code is None else sep
+                elif code is None:
+                    sep = "\n\n"
+                else:
+                    code.append("")
+                
+                for line in paragraph.split('\n'):
+                    units = []
+                    if code is not None:
+                        code.append(line)
+                        if _CODE_FENCE.match(line):
+                            units, code = self._code_units(code), None
+                        elif sum(map(len, code)) + len(code) > size:
+                            # 超长代码块按行产出，不再整体保留
+                            units, code = self._code_units(code), []
+                    elif _CODE_FENCE.match(line):
+                        units, code = flush_prose(), [line]
+                    elif self._is_heading(line):
+                        units = flush_prose() + [(None, line.strip(), 'heading')]
+                    else:
+                        prose.append(line)
+                    
+                    for joiner, text, kind in units:
+                        yield (sep if joiner is None else joiner), text, kind
+                        sep = "\n"
+                
+                for joiner, text, kind in flush_prose():
+                    yield (sep if joiner is None else joiner), text, kind
+                    sep = "\n"
         
-        return content
+        # 未闭合的代码块
+        for joiner, text, kind in self._code_units(code or []):
+            yield (sep if joiner is None else joiner), text, kind
+            sep = "\n"
     
-    def _extract_sdk_interfaces(self, content: str) -> Dict[str, Any]:
+    def _text_units(self, text: str, limit: int) -> List[Tuple[Optional[str], str, str]]:
         """
-        提取SDK接口信息
+        段落不超过 limit 时整体作为一个单元，否则按句末标点和换行拆成句子，
+        超过 chunk_size 的句子按 chunk_size 切开
         """
-        interfaces = {
-            'c_interfaces': [],
-            'dbus_interfaces': [],
-            'python_interfaces': [],
-            'api_calls': [],
-            'data_structures': []
-        }
+        if len(text) <= limit:
+            return [(None, text, 'text')]
         
-        try:
-            # C接口模式
-            c_patterns = [
-                r'extern\s+[\w\s\*]+\s+(\w+)\s*\([^)]*\);',  # extern函数声明
-                r'[\w\s\*]+\s+(kdk_\w+)\s*\([^)]*\)',  # kdk开头的函数
-                r'typedef\s+struct\s+(\w+)',  # 结构体定义
-                r'#define\s+(\w+)\s+',  # 宏定义
-            ]
-            
-            for pattern in c_patterns:
-                matches = re.findall(pattern, content, re.MULTILINE)
-                interfaces['c_interfaces'].extend(matches)
-            
-            # DBus接口模式
-            dbus_patterns = [
-                r'(\w+)\s*\([^)]*\)\s*↦\s*\([^)]*\)',  # DBus方法签名
-                r'interface\s+([\w\.]+)',  # 接口名称
-                r'method\s+(\w+)',  # 方法名称
-            ]
-            
-            for pattern in dbus_patterns:
-                matches = re.findall(pattern, content, re.MULTILINE)
-                interfaces['dbus_interfaces'].extend(matches)
-            
-            # Python接口模式
-            python_patterns = [
-                r'def\s+(\w+)\s*\([^)]*\)',  # 函数定义
-                r'class\s+(\w+)',  # 类定义
-                r'import\s+([\w\.]+)',  # 导入模块
-            ]
-            
-            for pattern in python_patterns:
-                matches = re.findall(pattern, content, re.MULTILINE)
-                interfaces['python_interfaces'].extend(matches)
-            
-            # API调用模式
-            api_patterns = [
-                r'(\w+)\s*\(',  # 函数调用
-                r'\.(\w+)\s*\(',  # 方法调用
-            ]
-            
-            for pattern in api_patterns:
-                matches = re.findall(pattern, content)
-                interfaces['api_calls'].extend(matches)
-            
-            # 数据结构模式
-            struct_patterns = [
-                r'struct\s+(\w+)',  # 结构体
-                r'enum\s+(\w+)',  # 枚举
-                r'typedef\s+\w+\s+(\w+)',  # 类型定义
-            ]
-            
-            for pattern in struct_patterns:
-                matches = re.findall(pattern, content)
-                interfaces['data_structures'].extend(matches)
-            
-            # 去重
-            for key in interfaces:
-                interfaces[key] = list(set(interfaces[key]))
-            
-        except Exception as e:
-            self.logger.error(f"提取SDK接口信息失败: {str(e)}")
+        size = self.chunk_size
+        units = []
+        start = 0
+        gap = None
+        for end in [match.end() for match in _SENTENCE_END.finditer(text)] + [len(text)]:
+            segment = text[start:end]
+            start = end
+            sentence = segment.strip()
+            if not sentence:
+                if gap is not None:
+                    gap += segment
+                continue
+            if gap is not None:
+                gap += segment[:len(segment) - len(segment.lstrip())]
+            for offset in range(0, len(sentence), size):
+                units.append((gap, sentence[offset:offset + size], 'text'))
+                gap = ""
+            gap = segment[len(segment.rstrip()):]
+        return units
+    
+    def _code_units(self, lines: List[str]) -> List[Tuple[Optional[str], str, str]]:
+        """
+        代码块不超过 chunk_size 时整体作为一个单元，否则逐行作为单元（空行并入分隔符）
+        """
+        size = self.chunk_size
+        if len("\n".join(lines).strip('\n')) <= size:
+            # 整体保留，开头的空行并入分隔符
+            leading = next((i for i, line in enumerate(lines) if line), len(lines))
+            code = "\n".join(lines[leading:]).rstrip('\n')
+            return [("\n" * (leading + 1) if leading else None, code, 'code')] if code else []
         
-        return interfaces
-
-    def _extract_headings(self, text: str) -> List[str]:
+        units = []
+        joiner = None
+        for line in lines:
+            if not line:
+                joiner = (joiner or "\n") + "\n"
+                continue
+            for offset in range(0, len(line), size):
+                units.append((joiner, line[offset:offset + size], 'code'))
+                joiner = ""
+            joiner = "\n"
+        return units
+    
+    @staticmethod
+    def _is_heading(line: str) -> bool:
         """
-        提取文档标题
+        判断一行是否为标题（Markdown标题、“第X章”、“一、”或多级编号如“3.1.2”开头的短行）
         """
-        headings = []
-
-        # 提取Markdown风格标题
-        markdown_headings = re.findall(r'^#{1,6}\s+(.+)$', text, re.MULTILINE)
-        headings.extend(markdown_headings)
-
-        # 提取其他可能的标题格式
-        # 全大写的行（可能是标题）
-        uppercase_lines = re.findall(r'^[A-Z\s]{5,}$', text, re.MULTILINE)
-        headings.extend([line.strip() for line in uppercase_lines if len(line.strip()) < 50])
-
-        # 中文标题模式
-        chinese_headings = re.findall(r'^第[一二三四五六七八九十\d]+[章节部分]\s*[：:]\s*(.+)$', text, re.MULTILINE)
-        headings.extend(chinese_headings)
-
-        return list(set(headings))  # 去重
-
-    def _extract_keywords(self, text: str) -> List[str]:
+        line = line.strip()
+        return (0 < len(line) <= 60 and _HEADING.match(line) is not None
+                and line[-1] not in '。！？；，,;:：')
+    
+    @staticmethod
+    def _overlap_tail(content: str, overlap: int) -> str:
         """
-        提取关键词
+        取块末尾不超过 overlap 个字符作为下一块开头的重叠部分，
+        优先从句子边界开始，其次从分句标点或空白处开始
         """
-        keywords = []
-
-        # 麒麟系统相关关键词
-        kylin_keywords = [
-            '麒麟', '银河麒麟', 'Kylin', 'KylinOS',
-            '系统安装', '配置', '故障排除', '安全',
-            '驱动', '软件包', '服务', '网络',
-            '用户管理', '权限', '防火墙', '备份'
-        ]
-
-        for keyword in kylin_keywords:
-            if keyword in text:
-                keywords.append(keyword)
-
-        # 技术术语
-        tech_terms = re.findall(r'\b[A-Z]{2,}\b', text)  # 大写缩写
-        keywords.extend([term for term in tech_terms if len(term) <= 10])
-
-        # 命令和文件路径
-        commands = re.findall(r'`([^`]+)`', text)  # 反引号包围的命令
-        keywords.extend([cmd for cmd in commands if len(cmd) <= 30])
-
-        return list(set(keywords))  # 去重
+        if overlap <= 0:
+            return ""
+        cut = max(len(content) - overlap, 0)
+        for pattern in (_SENTENCE_END, _CLAUSE_END):
+            for match in pattern.finditer(content, cut):
+                if match.end() < len(content):
+                    return content[match.end():].lstrip()
+        return content[cut:]
+    
+    def _clean_content(self, content: str) -> str:
+        """
+        清理文本内容
+        
+        只合并行内多余的空白和连续空行，保留换行、段落和行首缩进，
+        供分块器识别标题、段落和代码块。
+        """
+        # 统一换行符
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+        
+        # 移除行尾空白，合并行内连续空白
+        content = _TRAILING_SPACE.sub('', content)
+        content = _INLINE_SPACE.sub(' ', content)
+        
+        # 连续空行合并为一个段落分隔
+        content = _BLANK_LINES.sub('\n\n', content)
+        
+        # 移除首尾空行，保留第一行的行首缩进（流式读取时片段可能从代码块中间开始）
+        content = content.rstrip().lstrip('\n')
+        
+        return content
     
     def get_supported_formats(self) -> List[str]:
         """
@@ -159,6 +159,11 @@ class RAGApplication:
                                                     height=15)
         self.answer_text.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
         
+        # 配置文本标签样式
+        self.answer_text.tag_config("question", font=(self.font[0], self.font[1], 'bold'))
+        self.answer_text.tag_config("answer", font=self.font)
+        self.answer_text.tag_config("info", font=(self.font[0], self.font[1] - 1), foreground="gray")
+        
         # 状态栏
         status_frame = ttk.Frame(main_frame)
         status_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
@@ -222,6 +227,11 @@ class RAGApplication:
         self.answer_text.insert(tk.END, "正在处理您的问题，请稍候...\n")
         self.root.update()
         
+        if GUI_CONFIG.get('stream_answers', True):
+            include_sysinfo = self.include_sysinfo.get()
+            threading.Thread(target=self._stream_question, args=(question, include_sysinfo), daemon=True).start()
+            return
+        
         def process_question():
             try:
                 result = self.rag_engine.query(question, self.include_sysinfo.get())
@@ -238,6 +248,34 @@ class RAGApplication:
         
         threading.Thread(target=process_question, daemon=True).start()
 
+    def _stream_question(self, question, include_sysinfo):
+        """
+        在后台线程中流式获取回答，通过 root.after 在主线程中逐段插入
+        """
+        started = False
+        try:
+            for event in self.rag_engine.query_stream(question, include_sysinfo):
+                if event['event'] == 'token':
+                    if not started:
+                        started = True
+                        self.root.after(0, self._begin_answer, question)
+                        self.root.after(0, lambda: self.status_label.config(text="正在生成回答..."))
+                    self.root.after(0, self._append_answer_text, event['text'])
+                elif event['event'] == 'done':
+                    result = event['result']
+                    if not started:
+                        self.root.after(0, self._begin_answer, question)
+                        self.root.after(0, self._append_answer_text, result['answer'])
+                    self.root.after(0, self._finish_answer, result)
+            
+            self.root.after(0, lambda: self.status_label.config(text="就绪"))
+            
+        except Exception as e:
+            error_msg = f"处理问题时出错: {str(e)}"
+            self.root.after(0, lambda: self.answer_text.delete(1.0, tk.END))
+            self.root.after(0, lambda: self.answer_text.insert(tk.END, error_msg))
+            self.root.after(0, lambda: self.status_label.config(text="就绪"))
+
     def voice_input(self):
         """
         语音输入功能
@@ -293,13 +331,32 @@ class RAGApplication:
         """
         显示回答结果
         """
+        self._begin_answer(result['question'])
+        self._append_answer_text(result['answer'])
+        self._finish_answer(result)
+    
+    def _begin_answer(self, question):
+        """
+        清空回答区域并显示问题
+        """
         self.answer_text.delete(1.0, tk.END)
         
         # 显示问题
-        self.answer_text.insert(tk.END, f"问题: {result['question']}\n\n", "question")
-        
-        # 显示回答
-        self.answer_text.insert(tk.END, f"回答:\n{result['answer']}\n\n", "answer")
+        self.answer_text.insert(tk.END, f"问题: {question}\n\n", "question")
+        self.answer_text.insert(tk.END, "回答:\n", "answer")
+    
+    def _append_answer_text(self, text):
+        """
+        追加回答片段
+        """
+        self.answer_text.insert(tk.END, text, "answer")
+        self.answer_text.see(tk.END)
+    
+    def _finish_answer(self, result):
+        """
+        回答结束后显示参考文档并播报
+        """
+        self.answer_text.insert(tk.END, "\n\n", "answer")
         
         # 显示相关文档信息
         if result['relevant_docs']:
@@ -308,11 +365,6 @@ class RAGApplication:
                 similarity = doc.get('similarity', 0)
                 source = doc.get('source', '未知')
                 self.answer_text.insert(tk.END, f"{i}. {Path(source).name} (相似度: {similarity:.3f})\n", "info")
-        
-        # 配置文本标签样式
-        self.answer_text.tag_config("question", font=(self.font[0], self.font[1], 'bold'))
-        self.answer_text.tag_config("answer", font=self.font)
-        self.answer_text.tag_config("info", font=(self.font[0], self.font[1] - 1), foreground="gray")
 
         # 语音播报
         if self.enable_voice_output.get() and self.voice_handler.is_available:
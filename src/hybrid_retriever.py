@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+混合检索模块 - 多路检索并行执行，按倒数排名融合（RRF）合并结果
+"""
+
+import re
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+from vector_store import VectorStore, tokenize_chinese
+from config import RETRIEVAL_CONFIG, RAG_CONFIG
+
+_IDENTIFIER_PATTERN = re.compile(r'[a-z_][\w\.]*')
+
+class HybridRetriever:
+    """
+    混合检索器
+
+    各路检索在线程池中并行执行，每路召回 top_k × candidate_factor 个候选，
+    再按倒数排名融合：score(d) = Σ 权重 / (rrf_k + 名次)。内置检索路：
+        lexical  向量存储的词项检索（TF-IDF/BM25，或配置的dense打分）
+        keyword  文档块已提取的关键词与SDK接口名精确匹配（向量存储导入时建立的关键词索引）
+        dense    向量存储的稠密第二索引（启用 secondary_dense_index 时）
+    也可以通过 add_source 注册其他索引。
+    """
+
+    def __init__(self, vector_store: VectorStore, config: Optional[Dict[str, Any]] = None):
+        config = config or RETRIEVAL_CONFIG
+        self.vector_store = vector_store
+        self.logger = logging.getLogger(__name__)
+        self.rrf_k = config.get('rrf_k', 60)
+        self.candidate_factor = config.get('candidate_factor', 3)
+        self.weights = dict(config.get('source_weights', {}))
+        self.min_keyword_length = config.get('min_keyword_length', 2)
+
+        self.sources = {
+            'lexical': self.vector_store.search,
+            'keyword': self._search_keywords
+        }
+        if vector_store.dense_index is not None and vector_store.scorer != 'dense':
+            self.sources['dense'] = self.vector_store.search_dense
+
+        self._executor = ThreadPoolExecutor(max_workers=config.get('max_workers', 4),
+                                            thread_name_prefix='retriever')
+
+    def add_source(self, name: str, search: Callable[[str, int], List[Dict[str, Any]]], weight: float = 1.0):
+        """
+        注册一路检索
+
+        Args:
+            name: 检索路名称
+            search: search(query, top_k)，返回带 doc_id 的检索结果列表（按相关度降序）
+            weight: 融合权重
+        """
+        self.sources[name] = search
+        self.weights[name] = weight
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _query_terms(query: str) -> List[str]:
+        """
+        查询中可能与关键词匹配的词：分词结果、相邻词拼接和标识符
+        """
+        query = query.lower()
+        tokens = tokenize_chinese(query)
+        terms = list(tokens)
+        for n in (2, 3):
+            terms.extend("".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        terms.extend(_IDENTIFIER_PATTERN.findall(query))
+        return terms
+
+    def _search_keywords(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        hits = self.vector_store.keyword_index.search(self._query_terms(query), top_k, self.min_keyword_length)
+        return [self._make_result(doc_id, score) for doc_id, score in hits]
+
+    def _make_result(self, doc_id: int, similarity: float) -> Dict[str, Any]:
+        doc = self.vector_store.get_document(doc_id)
+        result = {key: doc[key] for key in VectorStore.RESULT_FIELDS if key in doc}
+        result['doc_id'] = int(doc_id)
+        result['similarity'] = float(similarity)
+        return result
+
+    def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
+        """
+        并行执行各路检索并融合结果
+
+        Returns:
+            融合后的前top_k个文档。similarity 为归一化的融合得分（各路均排第一时为1），
+            retrieval_ranks 记录文档在各路检索中的名次
+        """
+        top_k = top_k or RAG_CONFIG.get('top_k', 5)
+        n_candidates = top_k * self.candidate_factor
+
+        futures = {name: self._executor.submit(search, query, n_candidates)
+                   for name, search in self.sources.items()}
+        rankings = {}
+        for name, future in futures.items():
+            try:
+                rankings[name] = future.result()
+            except Exception as e:
+                self.logger.warning(f"检索路 {name} 失败，跳过: {str(e)}")
+
+        results = self.fuse(rankings, top_k)
+        self.logger.info(f"混合检索 '{query}': " +
+                         ", ".join(f"{name} {len(hits)}" for name, hits in rankings.items()) +
+                         f"，融合后 {len(results)} 个结果")
+        return results
+
+    def fuse(self, rankings: Dict[str, List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        倒数排名融合
+        """
+        scores = defaultdict(float)
+        ranks = defaultdict(dict)
+        docs = {}
+        for name, results in rankings.items():
+            weight = self.weights.get(name, 1.0)
+            for rank, result in enumerate(results, 1):
+                doc_id = result['doc_id']
+                scores[doc_id] += weight / (self.rrf_k + rank)
+                ranks[doc_id][name] = rank
+                docs.setdefault(doc_id, result)
+
+        best_possible = sum(self.weights.get(name, 1.0) for name in rankings) / (self.rrf_k + 1)
+        fused = []
+        for doc_id in sorted(scores, key=lambda d: (-scores[d], d))[:top_k]:
+            result = dict(docs[doc_id])
+            result['similarity'] = scores[doc_id] / best_possible
+            result['retrieval_ranks'] = ranks[doc_id]
+            fused.append(result)
+        return fused
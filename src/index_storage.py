@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+向量索引存储模块 - 可内存映射的目录格式
+"""
+
+import os
+import json
+import shutil
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse as sp
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# 索引目录格式版本，格式不兼容时递增
+FORMAT_VERSION = 2
+
+MANIFEST_FILE = 'manifest.json'
+
+def _fsync_dir(path: str):
+    """
+    同步目录项，确保重命名已落盘（部分平台不支持打开目录，忽略即可）
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _atomic_write(path: str, write_func):
+    """
+    先写临时文件并落盘，再重命名为目标文件
+
+    重命名是原子操作：进程中途被杀时目标文件要么是旧内容要么是新内容，
+    也不会截断仍被内存映射的旧文件。
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write_func(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _save_array(path: str, array: np.ndarray):
+    """
+    保存numpy数组为.npy文件
+    """
+    _atomic_write(path, lambda f: np.save(f, np.ascontiguousarray(array)))
+
+def encode_strings(strings: List[str]):
+    """
+    将字符串列表编码为UTF-8拼接字节串和偏移数组
+    """
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return b''.join(encoded), offsets
+
+def decode_strings(blob: bytes, offsets: np.ndarray) -> List[str]:
+    """
+    encode_strings 的逆操作
+    """
+    bounds = offsets.tolist()
+    return [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+class ChunkStore:
+    """
+    文档块序列
+
+    已持久化的文档块保存在 chunks.jsonl 中，只在按编号访问时读取对应行并
+    放入LRU缓存；尚未保存的文档块暂存在内存中。支持 len()、下标/切片访问、
+    迭代和 extend()，可替代原来的文档列表。
+    """
+
+    def __init__(self, files: List[Tuple[str, np.ndarray]] = None, cache_size: int = 256):
+        """
+        Args:
+            files: (chunks.jsonl路径, 行偏移数组) 列表，按文档编号顺序排列
+            cache_size: LRU缓存的文档块数量
+        """
+        self._paths = []
+        self._offsets = []
+        self._starts = [0]  # 每个文件第一个文档块的全局编号
+        for path, offsets in files or []:
+            self._paths.append(path)
+            self._offsets.append(offsets)
+            self._starts.append(self._starts[-1] + len(offsets) - 1)
+
+        self._memory = []
+        self._handles = {}
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @property
+    def persisted_count(self) -> int:
+        """
+        已持久化的文档块数量
+        """
+        return self._starts[-1]
+
+    def __len__(self) -> int:
+        return self._starts[-1] + len(self._memory)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("文档编号超出范围")
+
+        if index >= self.persisted_count:
+            return self._memory[index - self.persisted_count]
+
+        with self._lock:
+            doc = self._cache.get(index)
+            if doc is not None:
+                self._cache.move_to_end(index)
+                return doc
+
+            doc = self._read(index)
+            self._cache[index] = doc
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return doc
+
+    def _read(self, index: int) -> Dict[str, Any]:
+        """
+        按偏移读取单个文档块（调用方持有锁）
+        """
+        file_idx = bisect.bisect_right(self._starts, index) - 1
+        offsets = self._offsets[file_idx]
+        row = index - self._starts[file_idx]
+
+        handle = self._handles.get(file_idx)
+        if handle is None:
+            handle = open(self._paths[file_idx], 'rb')
+            self._handles[file_idx] = handle
+
+        start, end = int(offsets[row]), int(offsets[row + 1])
+        handle.seek(start)
+        return json.loads(handle.read(end - start).decode('utf-8'))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # 顺序遍历直接读取文件，不经过LRU缓存
+        for path in self._paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        yield from list(self._memory)
+
+    def extend(self, documents: Iterable[Dict[str, Any]]):
+        self._memory.extend(documents)
+
+    def append(self, document: Dict[str, Any]):
+        self._memory.append(document)
+
+    def close(self):
+        """
+        关闭打开的文件句柄
+        """
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles = {}
+            self._cache.clear()
+
+class IndexStorage:
+    """
+    向量索引目录读写
+
+    目录由一个基础快照和若干追加段组成，manifest.json 记录当前有效的快照
+    与段列表。新增文档只写一个新段；段数达到阈值时合并为新快照。所有文件
+    先写入新目录，最后原子替换清单，未被清单引用的目录在下次写入时清理。
+
+    目录结构（版本2）:
+        manifest.json                         格式版本、快照与段列表、按来源文件的文档块统计
+        base-NNNNNN/                          基础快照
+            indptr.npy / indices.npy / data.npy   TF-IDF矩阵的CSR数组（以mmap方式加载）
+            counts.npy                            与TF-IDF矩阵同构的原始词频
+            postings_indptr.npy / postings_indices.npy / postings_data.npy
+                                                  倒排表（权重矩阵的CSC数组，以mmap方式加载）
+            term_max.npy                          每个词项的最大权重（检索剪枝的得分上界）
+            vocab.bin / vocab_offsets.npy         词表（UTF-8拼接 + 偏移）
+            df.npy / idf.npy                      文档频率与IDF
+            chunks.jsonl / chunk_offsets.npy      文档块内容与元数据（每行一个JSON）
+            keywords.json                         关键词倒排表（关键词 -> 文档编号）
+        segment-NNNNNN/                       追加段：新文档的原始词频、新增词项、文档块和关键词
+            indptr.npy / indices.npy / counts.npy
+            vocab.bin / vocab_offsets.npy
+            chunks.jsonl / chunk_offsets.npy
+            keywords.json                         文档编号相对本段第一个文档块
+
+    keywords.json 缺失（早期版本写入的目录）时 load 返回 None，由调用方重建。
+
+    版本1的目录（快照文件直接位于根目录）可以直接加载。
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.logger = logging.getLogger(__name__)
+        self._manifest = None
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.index_dir, *names)
+
+    def exists(self) -> bool:
+        """
+        索引目录是否存在有效清单
+        """
+        return os.path.exists(self._path(MANIFEST_FILE))
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            with open(self._path(MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            version = manifest.get('format_version')
+            if version == 1:
+                # 版本1：快照位于根目录，没有追加段
+                manifest = {
+                    'format_version': FORMAT_VERSION,
+                    'base': '',
+                    'base_document_count': manifest['document_count'],
+                    'base_term_count': manifest['term_count'],
+                    'idf_doc_count': manifest.get('idf_doc_count', manifest['document_count']),
+                    'segments': [],
+                    'next_generation': 1
+                }
+            elif version != FORMAT_VERSION:
+                raise ValueError(f"不支持的索引格式版本: {version}")
+
+            self._manifest = manifest
+        return self._manifest
+
+    def _commit_manifest(self, manifest: Dict[str, Any]):
+        """
+        原子替换清单并清理不再引用的文件
+        """
+        data = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        _atomic_write(self._path(MANIFEST_FILE), lambda f: f.write(data))
+        _fsync_dir(self.index_dir)
+        self._manifest = manifest
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        """
+        删除清单未引用的快照、段和临时文件（例如写入中途崩溃留下的段）
+        """
+        manifest = self._manifest
+        keep = {MANIFEST_FILE}
+        keep.update(segment['name'] for segment in manifest['segments'])
+        if manifest['base']:
+            keep.add(manifest['base'])
+
+        for name in os.listdir(self.index_dir):
+            if name in keep:
+                continue
+            path = self._path(name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif manifest['base']:
+                # 根目录下的文件只可能是临时文件或已合并的版本1快照
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _new_generation(self, manifest: Dict[str, Any], prefix: str) -> str:
+        generation = manifest.get('next_generation', 1)
+        manifest['next_generation'] = generation + 1
+        name = f"{prefix}-{generation:06d}"
+        path = self._path(name)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        return name
+
+    @property
+    def segment_count(self) -> int:
+        """
+        当前追加段数量
+        """
+        if not self.exists():
+            return 0
+        return len(self._read_manifest()['segments'])
+
+    def save(self, state: Dict[str, Any]):
+        """
+        写入新的基础快照并清空追加段（即合并）
+
+        Args:
+            state: 包含 documents（可迭代对象）, document_count, terms, term_counts, vectors,
+                   doc_freq, idf, idf_doc_count，可选 scorer、avg_doc_length、keywords、
+                   sources（来源文件 -> 文档块数与内容长度）
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        manifest = dict(self._read_manifest()) if self.exists() else {'next_generation': 1}
+        base = self._new_generation(manifest, 'base')
+
+        vectors = state['vectors']
+        term_counts = state['term_counts']
+        n_docs = state['document_count']
+        n_terms = len(state['terms'])
+
+        if vectors is None:
+            vectors = sp.csr_matrix((n_docs, n_terms), dtype=np.float32)
+            term_counts = sp.csr_matrix((n_docs, n_terms), dtype=np.int32)
+
+        # 词频与TF-IDF矩阵稀疏结构相同，共用indices/indptr
+        _save_array(self._path(base, 'indptr.npy'), vectors.indptr.astype(np.int64))
+        _save_array(self._path(base, 'indices.npy'), vectors.indices.astype(np.int32))
+        _save_array(self._path(base, 'data.npy'), vectors.data.astype(np.float32))
+        _save_array(self._path(base, 'counts.npy'), term_counts.data.astype(np.int32))
+        self._write_postings(base, vectors)
+        _save_array(self._path(base, 'df.npy'), state['doc_freq'].astype(np.int64))
+        _save_array(self._path(base, 'idf.npy'), state['idf'].astype(np.float64))
+        self._write_terms(base, state['terms'])
+        self._write_chunks(base, state['documents'])
+        if state.get('keywords') is not None:
+            self._write_keywords(base, state['keywords'])
+        _fsync_dir(self._path(base))
+
+        manifest.update({
+            'format_version': FORMAT_VERSION,
+            'base': base,
+            'base_document_count': n_docs,
+            'base_term_count': n_terms,
+            'idf_doc_count': state['idf_doc_count'],
+            'scorer': state.get('scorer', 'tfidf'),
+            'avg_doc_length': state.get('avg_doc_length', 0.0),
+            'sources': state.get('sources'),
+            'segments': []
+        })
+        self._commit_manifest(manifest)
+
+    def append_segment(self, documents: List[Dict[str, Any]], terms: List[str],
+                       term_counts: sp.csr_matrix, keywords: Dict[str, List[int]] = None,
+                       sources: Dict[str, Dict[str, int]] = None):
+        """
+        追加一个段，只写入新增数据
+
+        Args:
+            documents: 新增文档块
+            terms: 新增词项（编号紧接已有词表）
+            term_counts: 新增文档块的原始词频（使用全局词项编号）
+            keywords: 新增文档块的关键词倒排表（文档编号相对本段）
+            sources: 新增文档块按来源文件的统计，记录在清单中
+        """
+        manifest = dict(self._read_manifest())
+        name = self._new_generation(manifest, 'segment')
+
+        term_counts = term_counts.tocsr()
+        _save_array(self._path(name, 'indptr.npy'), term_counts.indptr.astype(np.int64))
+        _save_array(self._path(name, 'indices.npy'), term_counts.indices.astype(np.int32))
+        _save_array(self._path(name, 'counts.npy'), term_counts.data.astype(np.int32))
+        self._write_terms(name, terms)
+        self._write_chunks(name, documents)
+        if keywords is not None:
+            self._write_keywords(name, keywords)
+        _fsync_dir(self._path(name))
+
+        manifest['segments'] = manifest['segments'] + [{
+            'name': name,
+            'document_count': len(documents),
+            'term_count': len(terms),
+            'sources': sources
+        }]
+        self._commit_manifest(manifest)
+
+    def _write_terms(self, name: str, terms: List[str]):
+        vocab_blob, vocab_offsets = encode_strings(terms)
+        _atomic_write(self._path(name, 'vocab.bin'), lambda f: f.write(vocab_blob))
+        _save_array(self._path(name, 'vocab_offsets.npy'), vocab_offsets)
+
+    def _read_terms(self, name: str) -> List[str]:
+        with open(self._path(name, 'vocab.bin'), 'rb') as f:
+            return decode_strings(f.read(), np.load(self._path(name, 'vocab_offsets.npy')))
+
+    def _write_postings(self, name: str, vectors: sp.csr_matrix):
+        """
+        写入权重矩阵的CSC形式和每列最大权重，加载后检索直接映射使用，不必在每个进程中转置
+        """
+        postings = vectors.tocsc()
+        postings.sort_indices()
+        _save_array(self._path(name, 'postings_indptr.npy'), postings.indptr.astype(np.int64))
+        _save_array(self._path(name, 'postings_indices.npy'), postings.indices.astype(np.int32))
+        _save_array(self._path(name, 'postings_data.npy'), postings.data.astype(np.float32))
+
+        term_max = np.zeros(postings.shape[1], dtype=np.float64)
+        nonempty = np.diff(postings.indptr) > 0
+        if nonempty.any():
+            term_max[nonempty] = np.maximum.reduceat(postings.data, postings.indptr[:-1][nonempty])
+        _save_array(self._path(name, 'term_max.npy'), term_max)
+
+    def _read_postings(self, name: str, shape: Tuple[int, int]) -> Tuple[Optional[sp.csc_matrix], Optional[np.ndarray]]:
+        """
+        以只读内存映射方式打开倒排表（早期版本写入的快照没有倒排表，返回 (None, None)）
+        """
+        if not os.path.exists(self._path(name, 'term_max.npy')):
+            return None, None
+        postings = sp.csc_matrix(
+            (np.load(self._path(name, 'postings_data.npy'), mmap_mode='r'),
+             np.load(self._path(name, 'postings_indices.npy'), mmap_mode='r'),
+             np.load(self._path(name, 'postings_indptr.npy'), mmap_mode='r')),
+            shape=shape, copy=False
+        )
+        postings.has_sorted_indices = True
+        return postings, np.load(self._path(name, 'term_max.npy'))
+
+    def _write_keywords(self, name: str, keywords: Dict[str, List[int]]):
+        data = json.dumps(keywords, ensure_ascii=False).encode('utf-8')
+        _atomic_write(self._path(name, 'keywords.json'), lambda f: f.write(data))
+
+    def _read_keywords(self, name: str) -> Optional[Dict[str, List[int]]]:
+        path = self._path(name, 'keywords.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_chunks(self, name: str, documents: Iterable[Dict[str, Any]]):
+        """
+        逐行写入文档块及每行的字节偏移
+        """
+        offsets = [0]
+
+        def write(f):
+            for doc in documents:
+                line = (json.dumps(doc, ensure_ascii=False) + '\n').encode('utf-8')
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+        _atomic_write(self._path(name, 'chunks.jsonl'), write)
+        _save_array(self._path(name, 'chunk_offsets.npy'), np.asarray(offsets, dtype=np.int64))
+
+    def open_chunks(self, cache_size: int = 256) -> ChunkStore:
+        """
+        按清单打开快照和各追加段的文档块文件（不读取内容）
+        """
+        manifest = self._read_manifest()
+        names = [manifest['base']] + [segment['name'] for segment in manifest['segments']]
+        return ChunkStore(
+            [(self._path(name, 'chunks.jsonl'), np.load(self._path(name, 'chunk_offsets.npy'), mmap_mode='r'))
+             for name in names],
+            cache_size=cache_size
+        )
+
+    def load(self) -> Dict[str, Any]:
+        """
+        加载基础快照（矩阵数组以只读内存映射方式打开）和全部追加段
+
+        文档块内容不在此读取，通过 open_chunks 按需访问。
+        """
+        manifest = self._read_manifest()
+        base = manifest['base']
+        n_docs = manifest['base_document_count']
+        n_terms = manifest['base_term_count']
+
+        indptr = np.load(self._path(base, 'indptr.npy'), mmap_mode='r')
+        indices = np.load(self._path(base, 'indices.npy'), mmap_mode='r')
+        data = np.load(self._path(base, 'data.npy'), mmap_mode='r')
+        counts = np.load(self._path(base, 'counts.npy'), mmap_mode='r')
+
+        segments = []
+        term_start = n_terms
+        for segment in manifest['segments']:
+            name = segment['name']
+            term_end = term_start + segment['term_count']
+            segment_counts = sp.csr_matrix(
+                (np.load(self._path(name, 'counts.npy')),
+                 np.load(self._path(name, 'indices.npy')),
+                 np.load(self._path(name, 'indptr.npy'))),
+                shape=(segment['document_count'], term_end)
+            )
+            segments.append({
+                'document_count': segment['document_count'],
+                'terms': self._read_terms(name),
+                'term_counts': segment_counts,
+                'keywords': self._read_keywords(name),
+                'sources': segment.get('sources')
+            })
+            term_start = term_end
+
+        postings, term_max = self._read_postings(base, (n_docs, n_terms))
+
+        return {
+            'document_count': n_docs,
+            'terms': self._read_terms(base),
+            'term_counts': sp.csr_matrix((counts, indices, indptr), shape=(n_docs, n_terms), copy=False),
+            'vectors': sp.csr_matrix((data, indices, indptr), shape=(n_docs, n_terms), copy=False),
+            'postings': postings,
+            'term_max': term_max,
+            'doc_freq': np.load(self._path(base, 'df.npy')),
+            'idf': np.load(self._path(base, 'idf.npy')),
+            'idf_doc_count': manifest['idf_doc_count'],
+            'scorer': manifest.get('scorer', 'tfidf'),
+            'avg_doc_length': manifest.get('avg_doc_length', 0.0),
+            'keywords': self._read_keywords(base),
+            'sources': manifest.get('sources'),
+            'segments': segments
+        }
+
+    def clear(self):
+        """
+        删除索引目录
+        """
+        self._manifest = None
+        if os.path.isdir(self.index_dir):
+            shutil.rmtree(self.index_dir)
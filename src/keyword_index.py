@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+关键词索引模块 - 以文档块已提取的关键词和SDK接口名为键的倒排索引
+"""
+
+import math
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Set, Tuple
+
+class KeywordIndex:
+    """
+    关键词倒排索引
+
+    以文档块中已提取的 keywords 和 sdk_interfaces（C/DBus/Python接口名、数据结构名）
+    为键，记录包含该键的文档编号。由向量存储在导入文档块时增量更新，倒排表随索引
+    快照和追加段一起保存，检索时不需要读取文档块。
+    """
+
+    # 参与索引的 sdk_interfaces 字段（api_calls 几乎匹配所有函数调用，不参与）
+    INTERFACE_FIELDS = ('c_interfaces', 'dbus_interfaces', 'python_interfaces', 'data_structures')
+
+    def __init__(self):
+        self.postings = defaultdict(list)  # 小写关键词 -> 文档编号列表（升序）
+        self.doc_count = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.postings = defaultdict(list)
+            self.doc_count = 0
+
+    @classmethod
+    def document_keys(cls, doc: Dict[str, Any]) -> Set[str]:
+        """
+        文档块的索引键（小写）
+        """
+        keys = {keyword.lower() for keyword in doc.get('keywords') or []}
+        interfaces = doc.get('sdk_interfaces') or {}
+        for field in cls.INTERFACE_FIELDS:
+            keys.update(name.lower() for name in interfaces.get(field) or [])
+        return keys
+
+    @classmethod
+    def collect(cls, documents: Iterable[Dict[str, Any]]) -> Dict[str, List[int]]:
+        """
+        为一批文档块构建倒排表，文档编号从0开始（相对这一批）
+        """
+        postings = defaultdict(list)
+        for doc_id, doc in enumerate(documents):
+            for key in cls.document_keys(doc):
+                postings[key].append(doc_id)
+        return dict(postings)
+
+    def merge(self, postings: Dict[str, List[int]], start: int, count: int):
+        """
+        合并编号从 start 开始的 count 个文档块的倒排表（collect 的结果或已保存的倒排表）
+        """
+        with self._lock:
+            for key, doc_ids in postings.items():
+                self.postings[key].extend(start + doc_id for doc_id in doc_ids)
+            self.doc_count = max(self.doc_count, start + count)
+
+    def add(self, documents: List[Dict[str, Any]], start: int):
+        """
+        索引编号从 start 开始的新文档块
+        """
+        self.merge(self.collect(documents), start, len(documents))
+
+    def export(self) -> Dict[str, List[int]]:
+        """
+        当前倒排表的副本（用于写入快照）
+        """
+        with self._lock:
+            return {key: list(doc_ids) for key, doc_ids in self.postings.items()}
+
+    def search(self, query_terms: Iterable[str], top_k: int, min_length: int = 1) -> List[Tuple[int, float]]:
+        """
+        按命中关键词的IDF之和为文档打分
+
+        Args:
+            query_terms: 查询词（小写）
+            top_k: 返回结果数
+            min_length: 参与匹配的关键词最短长度
+
+        Returns:
+            [(文档编号, 得分), ...]，按得分降序，同分按编号升序
+        """
+        scores = defaultdict(float)
+        with self._lock:
+            for term in set(query_terms):
+                if len(term) < min_length:
+                    continue
+                doc_ids = self.postings.get(term)
+                if not doc_ids:
+                    continue
+                idf = math.log(1.0 + self.doc_count / len(doc_ids))
+                for doc_id in doc_ids:
+                    scores[doc_id] += idf
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
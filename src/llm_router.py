@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+多提供商路由模块 - 按延迟选择后端并自动故障转移
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Iterator
+
+import numpy as np
+
+from ai_models import SiliconFlowAPI
+from config import API_CONFIGS, ROUTER_CONFIG
+
+class BackendStats:
+    """
+    单个后端的滚动延迟与错误率统计
+    """
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)  # 成功请求的耗时（秒）
+        self.outcomes = deque(maxlen=window)   # 最近请求是否成功
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, success: bool, latency: Optional[float] = None):
+        """
+        记录一次请求结果
+        """
+        with self._lock:
+            self.outcomes.append(success)
+            if success:
+                self.consecutive_failures = 0
+                if latency is not None:
+                    self.latencies.append(latency)
+            else:
+                self.consecutive_failures += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        延迟百分位数（秒），尚无样本时返回None
+        """
+        with self._lock:
+            if not self.latencies:
+                return None
+            return float(np.percentile(self.latencies, q))
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': len(self.outcomes),
+            'error_rate': self.error_rate,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'consecutive_failures': self.consecutive_failures,
+            'cooling_down': time.monotonic() < self.cooldown_until
+        }
+
+class RouterBackend:
+    """
+    路由后端：一个提供商端点上的一个模型
+    """
+
+    def __init__(self, name: str, client: SiliconFlowAPI, model: str, window: int = 50):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.stats = BackendStats(window)
+
+class LLMRouter(SiliconFlowAPI):
+    """
+    多提供商大模型路由器
+
+    维护每个提供商/模型的滚动p50/p95延迟和错误率，每次请求发往最快的健康后端，
+    出错或超时后依次转移到下一个后端。尚无延迟样本的后端优先探测一次；
+    连续失败或错误率过高的后端进入冷却期，冷却期内只作为最后的备选。
+    开启对冲后，首选后端超过对冲延迟仍未返回时，会并行向下一个后端发出请求，
+    采用先成功的结果。
+
+    接口与 SiliconFlowAPI 相同，可直接替换 RAGEngine 中的 ai_model。
+    """
+
+    def __init__(self, backends: Optional[List[Dict[str, Any]]] = None,
+                 hedge_requests: Optional[bool] = None, hedge_delay: Optional[float] = None):
+        """
+        Args:
+            backends: 后端配置列表，每项包含 provider/model，可选 endpoint/api_key/name
+            hedge_requests: 是否对慢请求进行对冲
+            hedge_delay: 对冲延迟（秒），None表示使用首选后端的p95延迟
+        """
+        window = ROUTER_CONFIG.get('latency_window', 50)
+        self.backends = [self._create_backend(spec, window)
+                         for spec in (backends or ROUTER_CONFIG.get('backends', []))]
+        if not self.backends:
+            raise ValueError("路由器至少需要一个后端")
+
+        primary = self.backends[0].client
+        super().__init__(primary.api_key, primary.endpoint)
+        self.generation_params['model'] = self.backends[0].model
+
+        self.error_threshold = ROUTER_CONFIG.get('error_threshold', 0.5)
+        self.min_samples = ROUTER_CONFIG.get('min_samples', 4)
+        self.max_consecutive_failures = ROUTER_CONFIG.get('max_consecutive_failures', 3)
+        self.cooldown = ROUTER_CONFIG.get('cooldown', 30)
+        self.hedge_requests = ROUTER_CONFIG.get('hedge_requests', False) if hedge_requests is None else hedge_requests
+        self.hedge_delay = ROUTER_CONFIG.get('hedge_delay') if hedge_delay is None else hedge_delay
+        self.min_hedge_delay = ROUTER_CONFIG.get('min_hedge_delay', 0.5)
+
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.backends))
+
+    @staticmethod
+    def _create_backend(spec: Dict[str, Any], window: int) -> RouterBackend:
+        """
+        根据配置创建后端，端点与密钥默认取自 API_CONFIGS
+        """
+        provider = spec.get('provider', 'siliconflow')
+        if provider == 'siliconflow':
+            endpoint = API_CONFIGS['siliconflow']['endpoint']
+            api_key = API_CONFIGS['siliconflow']['api_key']
+        else:
+            endpoint = API_CONFIGS.get('backup_apis', {}).get(provider)
+            api_key = ''
+
+        endpoint = spec.get('endpoint', endpoint)
+        if not endpoint:
+            raise ValueError(f"未知的API提供商: {provider}")
+
+        # 空密钥会回退为硅基流动密钥，不能发往其他提供商
+        client = SiliconFlowAPI(api_key=spec.get('api_key', api_key) or 'none', endpoint=endpoint)
+        model = spec['model']
+        name = spec.get('name', f"{provider}/{model}")
+        return RouterBackend(name, client, model, window)
+
+    def close(self):
+        """
+        关闭所有后端的连接池
+        """
+        self._executor.shutdown(wait=False)
+        for backend in self.backends:
+            backend.client.close()
+        super().close()
+
+    def _is_healthy(self, backend: RouterBackend, now: float) -> bool:
+        return now >= backend.stats.cooldown_until
+
+    def _rank_backends(self) -> List[RouterBackend]:
+        """
+        按健康状况和p50延迟排序后端
+        """
+        now = time.monotonic()
+
+        def key(item):
+            index, backend = item
+            p50 = backend.stats.percentile(50)
+            if p50 is None:
+                # 未请求过的后端优先探测，只失败过的后端排在有延迟样本的后端之后
+                p50 = float('inf') if backend.stats.outcomes else -1.0
+            return (not self._is_healthy(backend, now), p50, index)
+
+        return [backend for _, backend in sorted(enumerate(self.backends), key=key)]
+
+    def _record(self, backend: RouterBackend, success: bool, latency: Optional[float] = None):
+        """
+        记录请求结果，必要时让后端进入冷却期
+        """
+        stats = backend.stats
+        stats.record(success, latency)
+        if success:
+            return
+
+        too_many_errors = len(stats.outcomes) >= self.min_samples and stats.error_rate >= self.error_threshold
+        if stats.consecutive_failures >= self.max_consecutive_failures or too_many_errors:
+            stats.cooldown_until = time.monotonic() + self.cooldown
+            self.logger.warning(f"后端 {backend.name} 暂时停用 {self.cooldown} 秒"
+                                f"（错误率 {stats.error_rate:.0%}）")
+
+    def _call(self, backend: RouterBackend, messages: List[Dict[str, str]],
+              temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """
+        向单个后端发出一次请求（不在同一后端上重试）
+        """
+        started = time.monotonic()
+        response = backend.client.chat_completion(
+            messages, model=backend.model, temperature=temperature,
+            max_tokens=max_tokens, max_retries=1
+        )
+        success = "error" not in response
+        self._record(backend, success, time.monotonic() - started if success else None)
+        response['backend'] = backend.name
+        return response
+
+    def _get_hedge_delay(self, backend: RouterBackend) -> float:
+        if self.hedge_delay:
+            return self.hedge_delay
+        p95 = backend.stats.percentile(95)
+        return max(self.min_hedge_delay, p95) if p95 is not None else self.timeout[1]
+
+    def chat_completion(self, messages: List[Dict[str, str]],
+                        model: str = "Qwen/Qwen2.5-72B-Instruct",
+                        temperature: float = 0.7,
+                        max_tokens: int = 2000,
+                        stream: bool = False,
+                        max_retries: Optional[int] = None,
+                        retry_delay: Optional[float] = None) -> Dict[str, Any]:
+        """
+        通过最快的健康后端调用聊天完成API，失败时自动转移
+
+        model 参数被忽略，各后端使用自己配置的模型。
+
+        Returns:
+            API响应结果，附带 backend（实际响应的后端）和 retries（转移次数）
+        """
+        if stream:
+            return super().chat_completion(messages, model, temperature, max_tokens, stream=True)
+
+        ranked = self._rank_backends()
+        if self.hedge_requests and len(ranked) > 1:
+            return self._hedged_completion(ranked, messages, temperature, max_tokens)
+
+        errors = []
+        for attempt, backend in enumerate(ranked):
+            response = self._call(backend, messages, temperature, max_tokens)
+            if "error" not in response:
+                response['retries'] = attempt
+                return response
+            self.logger.warning(f"后端 {backend.name} 调用失败，转移到下一个后端: {response['error']}")
+            errors.append(f"{backend.name}: {response['error']}")
+
+        return {"error": "; ".join(errors), "retries": len(ranked) - 1}
+
+    def _hedged_completion(self, ranked: List[RouterBackend], messages: List[Dict[str, str]],
+                           temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """
+        对冲请求：首选后端超时未返回或失败时并行请求下一个后端，取先成功的结果
+        """
+        remaining = list(ranked)
+        pending = {}
+        errors = []
+
+        def launch():
+            backend = remaining.pop(0)
+            pending[self._executor.submit(self._call, backend, messages, temperature, max_tokens)] = backend
+
+        launch()
+        while pending:
+            delay = self._get_hedge_delay(ranked[0]) if remaining else None
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                self.logger.info(f"后端 {ranked[0].name} 响应缓慢，对冲请求 {remaining[0].name}")
+                launch()
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                response = future.result()
+                if "error" not in response:
+                    response['retries'] = len(ranked) - len(remaining) - 1
+                    return response
+                errors.append(f"{backend.name}: {response['error']}")
+                if remaining:
+                    launch()
+
+        return {"error": "; ".join(errors), "retries": len(ranked) - 1}
+
+    def stream_chat_completion(self, messages: List[Dict[str, str]],
+                               model: str = "Qwen/Qwen2.5-72B-Instruct",
+                               temperature: float = 0.7,
+                               max_tokens: int = 2000,
+                               max_retries: Optional[int] = None,
+                               retry_delay: Optional[float] = None,
+                               retry_stats: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """
+        流式调用，在收到首个片段之前出错时转移到下一个后端
+        """
+        if retry_stats is None:
+            retry_stats = {}
+
+        errors = []
+        for attempt, backend in enumerate(self._rank_backends()):
+            retry_stats['retries'] = attempt
+            stream = backend.client.stream_chat_completion(
+                messages, model=backend.model, temperature=temperature,
+                max_tokens=max_tokens, max_retries=1
+            )
+            try:
+                first = next(stream, None)
+            except Exception as e:
+                self._record(backend, False)
+                self.logger.warning(f"后端 {backend.name} 流式调用失败，转移到下一个后端: {e}")
+                errors.append(f"{backend.name}: {e}")
+                continue
+
+            # 流式请求只统计成功与否，延迟样本只来自完整请求
+            self._record(backend, True)
+            if first is not None:
+                yield first
+                yield from stream
+            return
+
+        raise RuntimeError("; ".join(errors))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各后端的延迟与错误率统计
+        """
+        return {backend.name: backend.stats.to_dict() for backend in self.backends}
@@ -3,13 +3,30 @@
 RAG (检索增强生成) 引擎模块
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from ai_models import SiliconFlowAPI
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator
+from ai_models import SiliconFlowAPI, AsyncSiliconFlowAPI
+from llm_router import LLMRouter
 from vector_store import VectorStore
+from hybrid_retriever import HybridRetriever
+from reranker import Reranker
 from document_processor import DocumentProcessor
 from system_info_helper import KylinSystemInfo
-from config import RAG_CONFIG
+from response_cache import ResponseCache
+from context_packer import ContextPacker
+from config import (RAG_CONFIG, PERFORMANCE_CONFIG, SYSTEM_SETTINGS, KYLIN_OPTIMIZATION, ROUTER_CONFIG,
+                    RETRIEVAL_CONFIG, RERANK_CONFIG)
+
+def _process_file_worker(file_path: str) -> List[Dict[str, Any]]:
+    """
+    工作进程：解析、清理并分块单个文件
+    
+    各文件已在不同进程中并行处理，PDF页面在进程内顺序提取。
+    """
+    return DocumentProcessor(pdf_workers=1).process_file(file_path)
 
 class RAGEngine:
     """
@@ -18,10 +35,29 @@ class RAGEngine:
     
     def __init__(self):
         self.vector_store = VectorStore()
+        self.retriever = HybridRetriever(self.vector_store) if RETRIEVAL_CONFIG.get('hybrid', True) else None
+        self.reranker = Reranker(self.vector_store) if RERANK_CONFIG.get('enabled', True) else None
         self.document_processor = DocumentProcessor()
-        self.ai_model = SiliconFlowAPI()
+        self.ai_model = LLMRouter() if ROUTER_CONFIG.get('enabled', False) else SiliconFlowAPI()
         self.logger = logging.getLogger(__name__)
         
+        # 异步问答接口（需要httpx）
+        try:
+            self.async_ai_model = AsyncSiliconFlowAPI()
+        except ImportError as e:
+            self.logger.warning(f"异步问答接口不可用: {e}")
+            self.async_ai_model = None
+        
+        # 按token预算组装上下文
+        self.context_packer = ContextPacker(model=self.ai_model.generation_params['model'])
+        
+        # 问答结果缓存
+        self.response_cache = ResponseCache(
+            max_size=SYSTEM_SETTINGS.get('cache_size', 100),
+            ttl=SYSTEM_SETTINGS.get('cache_ttl', 3600),
+            enabled=SYSTEM_SETTINGS.get('cache_enabled', True) and KYLIN_OPTIMIZATION.get('cache_responses', True)
+        )
+        
         # 初始化系统信息助手
         try:
             self.system_helper = KylinSystemInfo()
@@ -48,6 +84,7 @@ class RAGEngine:
             if chunks:
                 # 添加到向量存储
                 self.vector_store.add_documents(chunks)
+                self.response_cache.invalidate()
 
                 result = {
                     'success': True,
@@ -85,13 +122,145 @@ class RAGEngine:
         Returns:
             处理结果列表
         """
+        if len(file_paths) <= 1:
+            return [self.add_document(file_path) for file_path in file_paths]
+
+        max_workers = min(PERFORMANCE_CONFIG.get('max_concurrent_processes', 4), len(file_paths))
+        self.logger.info(f"批量处理 {len(file_paths)} 个文档，进程数: {max_workers}")
+
         results = []
-        for file_path in file_paths:
-            result = self.add_document(file_path)
-            results.append(result)
+        all_chunks = []
+
+        # GUI在后台线程中调用本方法，使用spawn避免fork时复制其他线程持有的锁
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+            futures = [executor.submit(_process_file_worker, file_path) for file_path in file_paths]
+
+            for file_path, future in zip(file_paths, futures):
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    self.logger.error(f"添加文档失败: {file_path}: {str(e)}")
+                    results.append({
+                        'success': False,
+                        'file_path': file_path,
+                        'document_count': 0,
+                        'message': f'处理失败: {str(e)}'
+                    })
+                    continue
+
+                if chunks:
+                    all_chunks.extend(chunks)
+                    results.append({
+                        'success': True,
+                        'file_path': file_path,
+                        'document_count': len(chunks),
+                        'message': f'成功添加 {len(chunks)} 个文档块'
+                    })
+                else:
+                    results.append({
+                        'success': False,
+                        'file_path': file_path,
+                        'document_count': 0,
+                        'message': '文档处理失败，未生成有效内容'
+                    })
+
+            # 整批只更新一次索引、保存一次
+            if all_chunks:
+                try:
+                    self.vector_store.add_documents(all_chunks, executor=executor)
+                    self.response_cache.invalidate()
+                    self.logger.info(f"成功添加 {len(all_chunks)} 个文档块到知识库")
+                except Exception as e:
+                    self.logger.error(f"批量写入知识库失败: {str(e)}")
+                    for result in results:
+                        if result['success']:
+                            result.update({
+                                'success': False,
+                                'document_count': 0,
+                                'message': f'处理失败: {str(e)}'
+                            })
 
         return results
     
+    def _prepare_query(self, question: str, include_system_info: bool = False) -> Dict[str, Any]:
+        """
+        检索相关文档、构建上下文并计算缓存键
+        
+        Returns:
+            包含 relevant_docs、context 和 cache_key 的字典
+        """
+        self.logger.info(f"处理查询: {question}")
+        
+        # 检索相关文档（混合检索时并行执行各路检索并融合），再对前N个候选重排序
+        top_k = RAG_CONFIG.get('top_k', 5)
+        search = self.retriever.search if self.retriever else self.vector_store.search
+        if self.reranker:
+            candidates = search(question, top_k=max(self.reranker.candidates, top_k))
+            relevant_docs = self.reranker.rerank(question, candidates, top_k)
+        else:
+            relevant_docs = search(question, top_k=top_k)
+
+        self.logger.info(f"检索到 {len(relevant_docs)} 个相关文档")
+        for i, doc in enumerate(relevant_docs):
+            self.logger.info(f"文档 {i+1}: 相似度 {doc.get('similarity', 0):.4f}, 内容: {doc.get('content', '')[:100]}...")
+
+        # 构建上下文
+        packed = self._build_context(relevant_docs, include_system_info)
+        context = packed['text']
+        self.logger.info(f"构建的上下文: {len(context)} 字符，约 {packed['tokens']} tokens，"
+                         f"截断 {packed['truncated']} 个文档，舍弃 {packed['dropped']} 个文档")
+        if context:
+            self.logger.debug(f"上下文内容: {context[:200]}...")
+        
+        # 系统信息随时变化，包含系统信息的回答不缓存
+        cache_key = None
+        if not include_system_info:
+            cache_key = self.response_cache.make_key(
+                question,
+                [doc.get('doc_id') for doc in relevant_docs],
+                self.ai_model.generation_params
+            )
+        
+        return {
+            'relevant_docs': relevant_docs,
+            'context': context,
+            'context_tokens': packed['tokens'],
+            'cache_key': cache_key
+        }
+    
+    def _build_result(self, question: str, answer: str, prepared: Dict[str, Any],
+                      include_system_info: bool, cached: bool, retries: int = 0) -> Dict[str, Any]:
+        """
+        构建查询结果
+        """
+        return {
+            'question': question,
+            'answer': answer or "抱歉，我无法回答这个问题。请检查API配置或稍后重试。",
+            'relevant_docs': prepared['relevant_docs'],
+            'context_length': len(prepared['context']),
+            'context_tokens': prepared['context_tokens'],
+            'system_info_included': include_system_info,
+            'cached': cached,
+            'retries': retries
+        }
+    
+    @staticmethod
+    def _error_result(question: str, error: Exception) -> Dict[str, Any]:
+        """
+        构建查询失败时的结果
+        """
+        return {
+            'question': question,
+            'answer': f"处理查询时出现错误: {str(error)}",
+            'relevant_docs': [],
+            'context_length': 0,
+            'context_tokens': 0,
+            'system_info_included': False,
+            'cached': False,
+            'retries': 0
+        }
+    
     def query(self, question: str, include_system_info: bool = False) -> Dict[str, Any]:
         """
         处理用户查询
@@ -104,50 +273,139 @@ class RAGEngine:
             查询结果
         """
         try:
-            self.logger.info(f"处理查询: {question}")
+            prepared = self._prepare_query(question, include_system_info)
+            cache_key = prepared['cache_key']
             
-            # 检索相关文档
-            relevant_docs = self.vector_store.search(
-                question,
-                top_k=RAG_CONFIG.get('top_k', 5)
-            )
-
-            self.logger.info(f"检索到 {len(relevant_docs)} 个相关文档")
-            for i, doc in enumerate(relevant_docs):
-                self.logger.info(f"文档 {i+1}: 相似度 {doc.get('similarity', 0):.4f}, 内容: {doc.get('content', '')[:100]}...")
-
-            # 构建上下文
-            context = self._build_context(relevant_docs, include_system_info)
-            self.logger.info(f"构建的上下文长度: {len(context)} 字符")
-            if context:
-                self.logger.debug(f"上下文内容: {context[:200]}...")
-            
-            # 生成回答
-            answer = self.ai_model.generate_answer(question, context)
-            
-            result = {
-                'question': question,
-                'answer': answer or "抱歉，我无法回答这个问题。请检查API配置或稍后重试。",
-                'relevant_docs': relevant_docs,
-                'context_length': len(context),
-                'system_info_included': include_system_info
-            }
+            answer = self.response_cache.get(cache_key) if cache_key else None
+            cached = answer is not None
+            retries = 0
+            
+            if cached:
+                self.logger.info("命中回答缓存")
+            else:
+                # 生成回答
+                generation = self.ai_model.generate_answer_result(question, prepared['context'])
+                answer = generation['answer']
+                retries = generation['retries']
+                if cache_key and generation['success'] and answer:
+                    self.response_cache.put(cache_key, answer)
+            
+            result = self._build_result(question, answer, prepared, include_system_info, cached, retries)
             
-            self.logger.info(f"查询完成，找到 {len(relevant_docs)} 个相关文档")
+            self.logger.info(f"查询完成，找到 {len(prepared['relevant_docs'])} 个相关文档")
             return result
             
         except Exception as e:
             self.logger.error(f"查询处理失败: {str(e)}")
-            return {
-                'question': question,
-                'answer': f"处理查询时出现错误: {str(e)}",
-                'relevant_docs': [],
-                'context_length': 0,
-                'system_info_included': False
-            }
+            return self._error_result(question, e)
+    
+    def query_stream(self, question: str, include_system_info: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        流式处理用户查询
+        
+        Args:
+            question: 用户问题
+            include_system_info: 是否包含系统信息
+            
+        Yields:
+            {'event': 'token', 'text': 回答片段}，最后产出
+            {'event': 'done', 'result': 与 query() 相同格式的完整结果}
+        """
+        try:
+            prepared = self._prepare_query(question, include_system_info)
+            cache_key = prepared['cache_key']
+            
+            answer = self.response_cache.get(cache_key) if cache_key else None
+            cached = answer is not None
+            retries = 0
+            
+            if cached:
+                self.logger.info("命中回答缓存")
+                yield {'event': 'token', 'text': answer}
+            else:
+                messages = self.ai_model.build_messages(question, prepared['context'])
+                parts = []
+                retry_stats = {}
+                try:
+                    for text in self.ai_model.stream_chat_completion(messages, retry_stats=retry_stats,
+                                                                     **self.ai_model.generation_params):
+                        parts.append(text)
+                        yield {'event': 'token', 'text': text}
+                    answer = "".join(parts)
+                    if cache_key and answer:
+                        self.response_cache.put(cache_key, answer)
+                except Exception as e:
+                    self.logger.error(f"流式生成回答失败: {str(e)}")
+                    error_text = f"抱歉，生成回答时出现错误：{str(e)}"
+                    if parts:
+                        error_text = "\n\n" + error_text
+                    parts.append(error_text)
+                    yield {'event': 'token', 'text': error_text}
+                    answer = "".join(parts)
+                retries = retry_stats.get('retries', 0)
+            
+            result = self._build_result(question, answer, prepared, include_system_info, cached, retries)
+            self.logger.info(f"流式查询完成，找到 {len(prepared['relevant_docs'])} 个相关文档")
+            yield {'event': 'done', 'result': result}
+            
+        except Exception as e:
+            self.logger.error(f"查询处理失败: {str(e)}")
+            yield {'event': 'done', 'result': self._error_result(question, e)}
+    
+    async def aquery(self, question: str, include_system_info: bool = False) -> Dict[str, Any]:
+        """
+        异步处理用户查询，可通过 asyncio.gather 同时处理多个问题
+        
+        检索（分词、混合检索与重排序）在线程池中执行，不阻塞事件循环，多个问题的
+        检索可以相互重叠；回答生成走异步接口，同时在途的请求数由 AsyncSiliconFlowAPI
+        的信号量限制。未安装httpx时回退到线程池执行 query()。
+        
+        Args:
+            question: 用户问题
+            include_system_info: 是否包含系统信息
+            
+        Returns:
+            与 query() 相同格式的查询结果
+        """
+        if self.async_ai_model is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.query, question, include_system_info)
+        
+        try:
+            prepared = await asyncio.to_thread(self._prepare_query, question, include_system_info)
+            cache_key = prepared['cache_key']
+            
+            answer = self.response_cache.get(cache_key) if cache_key else None
+            cached = answer is not None
+            retries = 0
+            
+            if cached:
+                self.logger.info("命中回答缓存")
+            else:
+                generation = await self.async_ai_model.generate_answer_result(question, prepared['context'])
+                answer = generation['answer']
+                retries = generation['retries']
+                if cache_key and generation['success'] and answer:
+                    self.response_cache.put(cache_key, answer)
+            
+            result = self._build_result(question, answer, prepared, include_system_info, cached, retries)
+            
+            self.logger.info(f"异步查询完成，找到 {len(prepared['relevant_docs'])} 个相关文档")
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"查询处理失败: {str(e)}")
+            return self._error_result(question, e)
+    
+    async def aclose(self):
+        """
+        关闭异步问答接口的连接池
+        """
+        if self.async_ai_model is not None:
+            await self.async_ai_model.aclose()
     
     def _build_context(self, relevant_docs: List[Dict[str, Any]], 
-                      include_system_info: bool = False) -> str:
+                      include_system_info: bool = False) -> Dict[str, Any]:
         """
         构建上下文信息
         
@@ -156,7 +414,7 @@ class RAGEngine:
             include_system_info: 是否包含系统信息
             
         Returns:
-            上下文字符串
+            包含 text（上下文字符串）、tokens（估计token数）、truncated 和 dropped 的字典
         """
         context_parts = []
         
@@ -173,23 +431,21 @@ class RAGEngine:
         elif include_system_info and not self.system_helper:
             self.logger.warning("系统信息助手未初始化，跳过系统信息获取")
         
-        # 添加相关文档
+        # 添加相关文档，系统信息占用的token计入预算
+        packed = {'tokens': 0, 'truncated': 0, 'dropped': 0}
         if relevant_docs:
             context_parts.append("=== 相关文档内容 ===")
-            
-            max_length = RAG_CONFIG.get('max_context_length', 2000)
-            current_length = len("\n".join(context_parts))
-            
-            for i, doc in enumerate(relevant_docs):
-                doc_text = f"文档{i+1} (相似度: {doc.get('similarity', 0):.3f}):\n{doc['content']}\n"
-                
-                if current_length + len(doc_text) > max_length:
-                    break
-                
-                context_parts.append(doc_text)
-                current_length += len(doc_text)
+        reserved = self.context_packer.estimate_tokens("\n".join(context_parts))
+        if relevant_docs:
+            packed = self.context_packer.pack(relevant_docs, reserved_tokens=reserved)
+            context_parts.append(packed['text'])
         
-        return "\n".join(context_parts)
+        return {
+            'text': "\n".join(context_parts),
+            'tokens': reserved + packed['tokens'],
+            'truncated': packed['truncated'],
+            'dropped': packed['dropped']
+        }
     
     def get_knowledge_base_stats(self) -> Dict[str, Any]:
         """
@@ -197,18 +453,8 @@ class RAGEngine:
         """
         stats = self.vector_store.get_stats()
 
-        # 添加文档详细信息
-        if hasattr(self.vector_store, 'documents') and self.vector_store.documents:
-            stats['documents'] = []
-            for doc in self.vector_store.documents:
-                doc_info = {
-                    'source': doc.get('source', '未知'),
-                    'content_length': len(doc.get('content', '')),
-                    'metadata': doc.get('metadata', {})
-                }
-                stats['documents'].append(doc_info)
-        else:
-            stats['documents'] = []
+        # 按来源文件汇总（来自索引元数据，不逐个读取文档块）
+        stats['documents'] = self.vector_store.get_source_stats()
 
         return stats
     
@@ -217,4 +463,11 @@ class RAGEngine:
         清空知识库
         """
         self.vector_store.clear()
-        self.logger.info("知识库已清空")
\ No newline at end of file
+        self.response_cache.invalidate()
+        self.logger.info("知识库已清空")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取回答缓存统计信息（命中/未命中次数等）
+        """
+        return self.response_cache.get_stats()
\ No newline at end of file
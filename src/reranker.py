@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+重排序模块 - 对检索候选做轻量级二次打分与多样性筛选
+"""
+
+import re
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional
+from sklearn.preprocessing import normalize
+from vector_store import VectorStore, tokenize_chinese
+from keyword_index import KeywordIndex
+from config import RERANK_CONFIG
+
+_WORD_PATTERN = re.compile(r'[^\W_]')
+_IDENTIFIER_PATTERN = re.compile(r'[a-z_][a-z0-9_]{2,}')
+
+class Reranker:
+    """
+    检索结果重排序器（不使用交叉编码模型）
+
+    对前N个候选计算以下特征（按IDF加权的查询词）并加权求和：
+        similarity  第一阶段检索得分（按候选中的最大值归一化）
+        coverage    文档包含的查询词比例
+        phrase      查询中相邻词在文档中相邻出现的比例
+        proximity   包含全部命中查询词的最短窗口的紧凑程度
+        heading     查询词出现在文档块标题（headings）中的比例
+        interface   查询中的标识符与文档块 sdk_interfaces 名称精确匹配的比例
+    然后按最大边际相关（MMR）依次选取文档，与已选文档词项向量过于相似的候选被跳过，
+    避免同一节的近似重复块挤占上下文。
+    """
+
+    FEATURES = ('similarity', 'coverage', 'phrase', 'proximity', 'heading', 'interface')
+
+    def __init__(self, vector_store: VectorStore, config: Optional[Dict[str, Any]] = None):
+        config = config or RERANK_CONFIG
+        self.vector_store = vector_store
+        self.logger = logging.getLogger(__name__)
+        self.candidates = config.get('candidates', 20)
+        weights = config.get('weights', {})
+        self.weights = np.array([weights.get(name, 0.0) for name in self.FEATURES])
+        self.mmr_lambda = config.get('mmr_lambda', 0.7)
+        self.duplicate_threshold = config.get('duplicate_threshold', 0.9)
+        self.min_relative_score = config.get('min_relative_score', 0.0)
+
+    def _query_terms(self, query: str):
+        """
+        查询词及其IDF权重（不在词表中的词取最大IDF）
+        """
+        tokens = [token for token in tokenize_chinese(query) if _WORD_PATTERN.search(token)]
+        terms = list(dict.fromkeys(tokens))
+        store = self.vector_store
+        max_idf = float(store.idf.max()) if len(store.idf) else 1.0
+        idf = []
+        for term in terms:
+            term_id = store.vocabulary.get(term)
+            idf.append(float(store.idf[term_id]) if term_id is not None and term_id < len(store.idf) else max_idf)
+        return tokens, terms, np.array(idf)
+
+    @staticmethod
+    def _min_window(positions: np.ndarray, labels: np.ndarray, n_labels: int) -> int:
+        """
+        覆盖全部 n_labels 个不同查询词的最短窗口长度（词数）
+        """
+        counts = np.zeros(n_labels, dtype=np.int64)
+        covered = 0
+        best = None
+        left = 0
+        for right in range(len(positions)):
+            counts[labels[right]] += 1
+            if counts[labels[right]] == 1:
+                covered += 1
+            while covered == n_labels:
+                span = positions[right] - positions[left] + 1
+                best = span if best is None else min(best, span)
+                counts[labels[left]] -= 1
+                if counts[labels[left]] == 0:
+                    covered -= 1
+                left += 1
+        return best
+
+    def _features(self, query: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        计算 (候选数 x 特征数) 的特征矩阵，各特征取值在 [0, 1]
+        """
+        n = len(candidates)
+        tokens, terms, idf = self._query_terms(query)
+        features = np.zeros((n, len(self.FEATURES)))
+
+        similarity = np.array([doc.get('similarity', 0.0) for doc in candidates])
+        features[:, 0] = similarity / similarity.max() if similarity.max() > 0 else 0.0
+        if not terms:
+            return features
+
+        term_index = {term: i for i, term in enumerate(terms)}
+        k = len(terms)
+        idf_total = idf.sum()
+        # 查询中相邻词对，编码为 a * k + b
+        query_pairs = np.unique([term_index[a] * k + term_index[b] for a, b in zip(tokens, tokens[1:])])
+        identifiers = set(_IDENTIFIER_PATTERN.findall(query.lower()))
+
+        presence = np.zeros((n, k), dtype=bool)
+        heading_hits = np.zeros((n, k), dtype=bool)
+        for i, doc in enumerate(candidates):
+            full = self.vector_store.get_document(doc['doc_id']) if 'doc_id' in doc else doc
+            labels = np.array([term_index.get(token, -1) for token in tokenize_chinese(doc.get('content', ''))],
+                              dtype=np.int64)
+            matched = np.flatnonzero(labels >= 0)
+            presence[i, labels[matched]] = True
+
+            if len(query_pairs) and len(labels) > 1:
+                pairs = labels[:-1] * k + labels[1:]
+                pairs = pairs[(labels[:-1] >= 0) & (labels[1:] >= 0)]
+                features[i, 2] = np.isin(query_pairs, pairs).mean()
+
+            # 命中两个以上不同查询词时，按最短覆盖窗口衡量紧凑程度
+            n_matched = int(presence[i].sum())
+            if n_matched >= 2:
+                compact = np.unique(labels[matched], return_inverse=True)[1]
+                window = self._min_window(matched, compact, n_matched)
+                features[i, 3] = n_matched / window
+
+            headings = " ".join(full.get('headings') or []).lower()
+            if headings:
+                heading_hits[i] = [term in headings for term in terms]
+
+            if identifiers:
+                interfaces = full.get('sdk_interfaces') or {}
+                names = {name.lower() for field in KeywordIndex.INTERFACE_FIELDS
+                         for name in interfaces.get(field) or []}
+                features[i, 5] = len(identifiers & names) / len(identifiers)
+
+        features[:, 1] = presence @ idf / idf_total
+        features[:, 4] = heading_hits @ idf / idf_total
+        return features
+
+    def _redundancy(self, candidates: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        候选之间的余弦相似度矩阵（基于向量存储中的词项权重）
+        """
+        vectors = self.vector_store.vectors
+        doc_ids = [doc.get('doc_id') for doc in candidates]
+        if vectors is None or any(doc_id is None or doc_id >= vectors.shape[0] for doc_id in doc_ids):
+            return None
+        rows = normalize(vectors[doc_ids], norm='l2')
+        return (rows @ rows.T).toarray()
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        重排序候选文档
+
+        Returns:
+            最多top_k个文档，按MMR选取顺序排列。similarity 为重排得分（0~1），
+            retrieval_similarity 保留第一阶段得分
+        """
+        if not candidates:
+            return []
+
+        features = self._features(query, candidates)
+        scores = features @ self.weights / max(self.weights.sum(), 1e-9)
+        redundancy = self._redundancy(candidates)
+
+        threshold = scores.max() * self.min_relative_score
+        remaining = np.argsort(-scores, kind='stable')
+        remaining = remaining[scores[remaining] >= threshold]
+        selected = []
+        skipped = 0
+        while len(remaining) and len(selected) < top_k:
+            if redundancy is None or not selected:
+                best = remaining[0]
+            else:
+                max_sim = redundancy[np.ix_(remaining, selected)].max(axis=1)
+                mmr = self.mmr_lambda * scores[remaining] - (1 - self.mmr_lambda) * max_sim
+                best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            remaining = remaining[remaining != best]
+            if redundancy is not None:
+                # 与刚选中的文档近似重复的候选不再考虑
+                duplicate = redundancy[remaining, best] >= self.duplicate_threshold
+                skipped += int(duplicate.sum())
+                remaining = remaining[~duplicate]
+
+        results = []
+        for i in selected:
+            result = dict(candidates[i])
+            result['retrieval_similarity'] = candidates[i].get('similarity', 0.0)
+            result['similarity'] = float(scores[i])
+            results.append(result)
+
+        self.logger.info(f"重排序 {len(candidates)} 个候选，保留 {len(results)} 个，跳过近似重复 {skipped} 个")
+        return results
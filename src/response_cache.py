@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+回答缓存模块 - LRU + TTL
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+class ResponseCache:
+    """
+    问答结果缓存
+
+    缓存键由规范化后的问题、检索到的文档块编号和模型参数组成，同一问题检索到
+    不同文档时不会命中。条目按最近使用顺序淘汰，并在超过有效期后失效。
+    """
+
+    def __init__(self, max_size: int = 100, ttl: float = 3600, enabled: bool = True):
+        """
+        Args:
+            max_size: 最大缓存条目数
+            ttl: 条目有效期（秒），0表示不过期
+            enabled: 是否启用缓存
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.logger = logging.getLogger(__name__)
+
+        self._entries = OrderedDict()  # 键 -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """
+        规范化问题：全角转半角、小写、合并空白、去除末尾标点
+        """
+        text = unicodedata.normalize('NFKC', question).lower()
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text.rstrip('?？!！。.~～ ')
+
+    def make_key(self, question: str, doc_ids: List[int], params: Dict[str, Any]) -> str:
+        """
+        生成缓存键
+        """
+        raw = json.dumps([self.normalize_question(question), list(doc_ids), params],
+                         ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存，未命中或已过期返回None
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目
+        """
+        if not self.enabled or self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        清空所有缓存条目（知识库变化时调用）
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+        if count:
+            self.logger.info(f"回答缓存已失效，清除 {count} 条")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
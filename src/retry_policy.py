@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+重试策略模块 - 指数退避、随机抖动与总时限
+"""
+
+import time
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+from config import RETRY_SETTINGS
+
+class RetryPolicy:
+    """
+    API调用重试策略
+
+    只重试可能恢复的错误（429、5xx、超时和连接错误），4xx请求错误立即失败。
+    等待时间优先采用服务端的 Retry-After，否则为带随机抖动的指数退避；
+    每次查询的全部尝试都必须在总时限内完成。
+    """
+
+    RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, deadline: Optional[float] = None):
+        """
+        Args:
+            max_attempts: 最大尝试次数（含首次请求）
+            base_delay: 退避基准时间（秒）
+            max_delay: 单次退避上限（秒）
+            deadline: 单次查询的总时限（秒），0表示不限制
+        """
+        self.max_attempts = max(1, max_attempts or RETRY_SETTINGS.get('max_retries', 3))
+        self.base_delay = base_delay if base_delay is not None else RETRY_SETTINGS.get('retry_delay', 3)
+        self.max_delay = max_delay if max_delay is not None else RETRY_SETTINGS.get('max_delay', 20)
+        self.deadline = deadline if deadline is not None else RETRY_SETTINGS.get('deadline', 60)
+
+    def with_overrides(self, max_attempts: Optional[int] = None,
+                       base_delay: Optional[float] = None) -> 'RetryPolicy':
+        """
+        返回覆盖部分参数后的新策略
+        """
+        if max_attempts is None and base_delay is None:
+            return self
+        return RetryPolicy(
+            max_attempts=max_attempts or self.max_attempts,
+            base_delay=base_delay if base_delay is not None else self.base_delay,
+            max_delay=self.max_delay,
+            deadline=self.deadline
+        )
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        """
+        判断状态码是否值得重试
+        """
+        return status_code in self.RETRYABLE_STATUS
+
+    def backoff(self, retry: int) -> float:
+        """
+        第 retry 次重试前的等待时间（full jitter）
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** retry))
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        解析 Retry-After 响应头（秒数或HTTP日期）
+        """
+        if not value:
+            return None
+
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def start(self) -> 'RetryState':
+        """
+        开始一次查询的重试计数
+        """
+        return RetryState(self)
+
+class RetryState:
+    """
+    单次查询的重试状态
+    """
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.started = time.monotonic()
+        self.attempts = 0
+        self.retries = 0
+
+    def remaining(self) -> Optional[float]:
+        """
+        距总时限的剩余时间，不限制时返回None
+        """
+        if not self.policy.deadline:
+            return None
+        return self.policy.deadline - (time.monotonic() - self.started)
+
+    def read_timeout(self, timeout: float) -> float:
+        """
+        将读取超时限制在剩余时间内
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return max(0.1, min(timeout, remaining))
+
+    def next_delay(self, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            retry_after: 服务端要求的等待时间（秒）
+
+        Returns:
+            等待秒数；尝试次数用尽或等待后会超出总时限时返回None
+        """
+        if self.attempts >= self.policy.max_attempts:
+            return None
+
+        delay = retry_after if retry_after is not None else self.policy.backoff(self.retries)
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+
+        self.retries += 1
+        return delay
@@ -5,65 +5,320 @@
 
 import os
 import pickle
+import hashlib
 import logging
+import threading
+from collections import Counter
 import numpy as np
+import scipy.sparse as sp
 from typing import List, Dict, Any, Tuple
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import jieba
-from config import VECTOR_CONFIG, VECTOR_DB_PATH
+from index_storage import IndexStorage, ChunkStore, _atomic_write
+from keyword_index import KeywordIndex
+from dense_index import DenseIndex, HashedProjectionEncoder, LocalModelEncoder
+from config import VECTOR_CONFIG, VECTOR_DB_PATH, PERFORMANCE_CONFIG
+
+def tokenize_chinese(text: str) -> List[str]:
+    """
+    中文分词（小写化并去除空白词）
+
+    定义为模块级函数，便于在进程池的工作进程中调用。
+    """
+    return [token for token in jieba.cut(text.lower()) if token.strip()]
 
 class VectorStore:
     """
     向量存储类
+
+    采用增量索引：每个文档块只分词、计数一次，保存原始词频矩阵和文档频率表。
+    新增文档只追加新的行，IDF权重在检索时按需重算。打分方式由
+    VECTOR_CONFIG['embedding_model'] 选择：tfidf（余弦相似度）、bm25
+    （基于倒排表，只访问查询词项的倒排列表）或 dense（稠密向量近似最近邻，
+    见 dense_index 模块）。
+
+    dense 为实验性功能：默认的哈希随机投影只是TF-IDF的有损近似，召回率受限
+    （合成语料2万文档时，256维约0.55；1024维、dense_rerank_factor=50 时约0.94，
+    但延迟是TF-IDF的数倍），且不比精确TF-IDF检索更快。稠密索引在导入和加载时
+    构建，检索时不会触发编码。
     """
     
+    SCORERS = ('tfidf', 'bm25', 'dense')
+
+    # 检索结果中携带的文档字段，其余元数据可通过 get_document 按需获取
+    RESULT_FIELDS = ('content', 'source_file', 'file_type', 'chunk_id', 'start_pos', 'end_pos')
+
     def __init__(self, db_path: str = None):
         self.db_path = db_path or VECTOR_DB_PATH
         self.logger = logging.getLogger(__name__)
         
-        # 初始化TF-IDF向量化器
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words=None,
-            ngram_range=(1, 2),
-            tokenizer=self._tokenize_chinese
-        )
+        # 索引目录与旧版pickle文件同名（如 vectors.pkl -> vectors.index/）
+        self.index_dir = os.path.splitext(self.db_path)[0] + '.index'
+        self.storage = IndexStorage(self.index_dir)
         
-        self.documents = []
-        self.vectors = None
-        self.is_fitted = False
+        # 索引参数
+        self.scorer = VECTOR_CONFIG.get('embedding_model', 'tfidf')
+        if self.scorer not in self.SCORERS:
+            self.logger.warning(f"不支持的打分方式 {self.scorer}，使用 tfidf")
+            self.scorer = 'tfidf'
+        self.bm25_k1 = VECTOR_CONFIG.get('bm25_k1', 1.5)
+        self.bm25_b = VECTOR_CONFIG.get('bm25_b', 0.75)
+        self.ngram_range = tuple(VECTOR_CONFIG.get('ngram_range', (1, 2)))
+        self.idf_drift_threshold = VECTOR_CONFIG.get('idf_drift_threshold', 0.2)
+        self.compaction_threshold = VECTOR_CONFIG.get('segment_compaction_threshold', 8)
+        self.chunk_cache_size = VECTOR_CONFIG.get('chunk_cache_size', 256)
         
-        # 创建存储目录
+        self._reset_index()
+        
+        # 索引在首次检索时合并，多个检索线程共用同一个向量存储时需要加锁
+        self._index_lock = threading.RLock()
+        
+        # 稠密向量索引（dense打分方式，或作为混合检索的第二路索引），
+        # 放在索引目录之外，不受索引目录垃圾回收影响
+        self.dense_encoder = None
+        self.dense_index = None
+        if self.scorer == 'dense' or VECTOR_CONFIG.get('secondary_dense_index', False):
+            self._init_dense()
+        
+        # 分词缓存：内容哈希 -> 词序列，每次保存只把新增条目写成一个文件，
+        # 放在索引目录之外，清空索引后重新导入相同文档时仍可复用
         db_dir = os.path.dirname(self.db_path)
+        self.token_cache_dir = os.path.splitext(self.db_path)[0] + '.tokens'
+        self.legacy_token_cache_path = os.path.join(db_dir, 'token_cache.pkl')
+        self.token_cache = {}
+        self._new_tokens = {}  # 上次保存之后新增的缓存条目
+        self._token_generation = 1
+        
+        # 创建存储目录
         if db_dir:  # 确保目录路径不为空
             os.makedirs(db_dir, exist_ok=True)
         
         # 尝试加载已有数据
+        self._load_token_cache()
         self.load()
     
+    def _init_dense(self):
+        """
+        创建稠密编码器和稠密索引
+        """
+        encoder = VECTOR_CONFIG.get('dense_encoder', 'hashed')
+        if encoder != 'hashed':
+            try:
+                self.dense_encoder = LocalModelEncoder(encoder)
+            except Exception as e:
+                self.logger.warning(f"加载本地嵌入模型 {encoder} 失败，改用哈希随机投影: {str(e)}")
+        if self.dense_encoder is None:
+            self.dense_encoder = HashedProjectionEncoder(VECTOR_CONFIG.get('dense_dim', 256))
+        
+        self.dense_rerank_factor = VECTOR_CONFIG.get('dense_rerank_factor', 10)
+        self.dense_index = DenseIndex(
+            os.path.splitext(self.db_path)[0] + '.dense',
+            quantization=VECTOR_CONFIG.get('dense_quantization', 'int8'),
+            ann=VECTOR_CONFIG.get('ann_index', 'ivf'),
+            nprobe=VECTOR_CONFIG.get('ivf_nprobe', 8)
+        )
+        self.dense_index.load()
+    
+    def _reset_index(self):
+        """
+        重置内存中的文档和索引
+        """
+        self.documents = ChunkStore(cache_size=self.chunk_cache_size)  # 文档块按需从磁盘读取
+        self.keyword_index = KeywordIndex()  # 关键词倒排表，导入时更新，供混合检索使用
+        self.source_stats = {}  # 来源文件 -> 文档块数与内容长度，随索引保存，统计时不读取文档块
+        self.terms = []  # 列号 -> 词项
+        self.vocabulary = {}  # 词项 -> 列号
+        self.term_counts = None  # 原始词频矩阵 (文档数 x 词项数)
+        self.doc_freq = np.zeros(0, dtype=np.int64)  # 每个词项的文档频率
+        self.idf = np.zeros(0, dtype=np.float64)
+        self.vectors = None  # 权重矩阵：L2归一化的TF-IDF，或BM25词项得分
+        self.postings = None  # 倒排表（权重矩阵的CSC形式，按需构建）
+        self._term_max = None  # 每个词项在倒排表中的最大权重（得分上界）
+        self.is_fitted = False
+        
+        self._pending_counts = []  # 尚未合并进索引的词频块
+        self._idf_doc_count = 0  # 上次计算IDF时的文档数
+        self._avg_doc_len = 0.0  # 上次计算IDF时的平均文档长度（BM25）
+        
+        # 持久化状态：已写盘的文档数/词项数，以及尚未写盘的词频块
+        self._saved_doc_count = 0
+        self._saved_term_count = 0
+        self._unsaved_counts = []
+        self._needs_snapshot = True
+    
     def _tokenize_chinese(self, text: str) -> List[str]:
         """
         中文分词
         """
-        return list(jieba.cut(text))
+        return tokenize_chinese(text)
+    
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        """
+        计算文本内容哈希，作为分词缓存的键
+        """
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def _tokenize_documents(self, documents: List[Dict[str, Any]], executor=None) -> List[List[str]]:
+        """
+        带缓存的文档块分词，相同内容只分词一次
+        
+        Args:
+            documents: 文档列表
+            executor: 可选的进程池，未命中缓存的文档块将并行分词
+        """
+        texts = [doc['content'] for doc in documents]
+        keys = [self._content_hash(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self.token_cache]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if executor is not None and len(missing) > 1:
+                chunksize = PERFORMANCE_CONFIG.get('batch_size', 32)
+                token_streams = executor.map(tokenize_chinese, missing_texts, chunksize=chunksize)
+            else:
+                token_streams = map(self._tokenize_chinese, missing_texts)
+            
+            for i, tokens in zip(missing, token_streams):
+                self.token_cache[keys[i]] = tokens
+                self._new_tokens[keys[i]] = tokens
+        
+        return [self.token_cache[key] for key in keys]
+    
+    def _analyze(self, tokens: List[str]) -> List[str]:
+        """
+        将词序列转换为词项序列（N-gram）
+        """
+        min_n, max_n = self.ngram_range
+        terms = []
+        for n in range(min_n, max_n + 1):
+            if n == 1:
+                terms.extend(tokens)
+            else:
+                terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+    
+    def _count_terms(self, token_streams: List[List[str]], grow_vocabulary: bool) -> sp.csr_matrix:
+        """
+        统计词频，返回CSR格式的词频块
+        
+        Args:
+            token_streams: 每个文本的分词结果
+            grow_vocabulary: 是否将未见过的词项加入词表
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        
+        for tokens in token_streams:
+            term_ids = Counter()
+            for term in self._analyze(tokens):
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    if not grow_vocabulary:
+                        continue
+                    term_id = len(self.terms)
+                    self.vocabulary[term] = term_id
+                    self.terms.append(term)
+                term_ids[term_id] += 1
+            
+            indices.extend(term_ids.keys())
+            data.extend(term_ids.values())
+            indptr.append(len(indices))
+        
+        return sp.csr_matrix(
+            (np.asarray(data, dtype=np.float64),
+             np.asarray(indices, dtype=np.int32),
+             np.asarray(indptr, dtype=np.int32)),
+            shape=(len(token_streams), len(self.vocabulary))
+        )
+    
+    def _compute_idf(self, doc_freq: np.ndarray, n_docs: int) -> np.ndarray:
+        """
+        计算IDF：TF-IDF使用平滑IDF（与scikit-learn的smooth_idf一致），
+        BM25使用 log(1 + (N - df + 0.5) / (df + 0.5))
+        """
+        if self.scorer == 'bm25':
+            return np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        return np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+    
+    def _weight(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        """
+        计算文档权重：TF-IDF为词频 × IDF 并做L2归一化，
+        BM25为按文档长度归一化的饱和词频 × IDF
+        """
+        if self.scorer == 'bm25':
+            counts = counts.tocsr()
+            tf = np.asarray(counts.data, dtype=np.float64)
+            doc_len = np.asarray(counts.sum(axis=1), dtype=np.float64).ravel()
+            length_norm = self.bm25_k1 * (1.0 - self.bm25_b + self.bm25_b * doc_len / max(self._avg_doc_len, 1e-9))
+            length_norm = np.repeat(length_norm, np.diff(counts.indptr))
+            data = tf * (self.bm25_k1 + 1.0) / (tf + length_norm) * self.idf[counts.indices]
+            return sp.csr_matrix((data, np.array(counts.indices), np.array(counts.indptr)), shape=counts.shape)
+        
+        weighted = counts.multiply(self.idf[:counts.shape[1]].reshape(1, -1)).tocsr()
+        return normalize(weighted, norm='l2', copy=False)
+    
+    def _ensure_index(self):
+        """
+        合并待处理的词频块，并在文档数漂移超过阈值时重算IDF
+        """
+        with self._index_lock:
+            if not self._pending_counts and (self.vectors is not None or self.term_counts is None):
+                return
+        
+            n_terms = len(self.vocabulary)
+            n_docs = len(self.documents)
+            new_counts = self._pending_counts
+            self._pending_counts = []
+            self.postings = None
+        
+            if new_counts:
+                for block in new_counts:
+                    block.resize((block.shape[0], n_terms))
+                new_counts = sp.vstack(new_counts, format='csr')
+            
+                if self.term_counts is not None:
+                    self.term_counts.resize((self.term_counts.shape[0], n_terms))
+                    self.term_counts = sp.vstack([self.term_counts, new_counts], format='csr')
+                else:
+                    self.term_counts = new_counts
+        
+            drift = (n_docs - self._idf_doc_count) / max(self._idf_doc_count, 1)
+            if self.vectors is None or drift > self.idf_drift_threshold:
+                # 全量重算IDF：只对已有词频矩阵做稀疏运算，不需要重新分词
+                self.idf = self._compute_idf(self.doc_freq, n_docs)
+                self._idf_doc_count = n_docs
+                self._avg_doc_len = float(self.term_counts.sum()) / max(n_docs, 1)
+                self.vectors = self._weight(self.term_counts)
+                self.logger.debug(f"IDF已重算，文档数 {n_docs}，词项数 {n_terms}")
+            else:
+                # 沿用已有IDF，仅为新词项补充权重
+                new_idf = self._compute_idf(self.doc_freq[len(self.idf):], n_docs)
+                self.idf = np.concatenate([self.idf, new_idf])
+                self.vectors.resize((self.vectors.shape[0], n_terms))
+                self.vectors = sp.vstack([self.vectors, self._weight(new_counts)], format='csr')
     
-    def add_documents(self, documents: List[Dict[str, Any]]):
+    def add_documents(self, documents: List[Dict[str, Any]], executor=None):
         """
         添加文档到向量存储
         
         Args:
             documents: 文档列表
+            executor: 可选的进程池，用于并行分词
         """
         try:
-            self.documents.extend(documents)
+            # 只统计新文档的词频；分词不涉及索引状态，在锁外进行
+            token_streams = self._tokenize_documents(documents, executor)
             
-            # 提取文档内容
-            texts = [doc['content'] for doc in self.documents]
-            
-            # 重新训练向量化器
-            self.vectors = self.vectorizer.fit_transform(texts)
-            self.is_fitted = True
+            # 词表、文档和词频块必须一起更新，避免并发检索在 _ensure_index 中合并到一半的状态
+            with self._index_lock:
+                counts = self._count_terms(token_streams, grow_vocabulary=True)
+                self.keyword_index.add(documents, len(self.documents))
+                self._summarize_sources(documents, self.source_stats)
+                self.documents.extend(documents)
+                self._append_counts(counts)
+                self._unsaved_counts.append(counts)
             
             self.logger.info(f"添加了 {len(documents)} 个文档，总计 {len(self.documents)} 个文档")
             
@@ -74,6 +329,32 @@ class VectorStore:
             self.logger.error(f"添加文档失败: {str(e)}")
             raise
     
+    def _append_counts(self, counts: sp.csr_matrix):
+        """
+        追加新文档的词频块，更新文档频率表（与检索并发时调用方需持有 _index_lock）
+        """
+        doc_freq = np.zeros(len(self.terms), dtype=np.int64)
+        doc_freq[:len(self.doc_freq)] = self.doc_freq
+        doc_freq += np.bincount(counts.indices, minlength=len(self.terms))
+        self.doc_freq = doc_freq
+        
+        self._pending_counts.append(counts)
+        self.is_fitted = len(self.documents) > 0
+    
+    def rebuild(self):
+        """
+        基于已有文档全量重建索引
+        """
+        documents = list(self.documents)
+        self._reset_index()
+        
+        if documents:
+            self.add_documents(documents)
+        else:
+            self.save()
+        self._save_token_cache({self._content_hash(doc['content']) for doc in documents})
+        self.logger.info(f"索引已重建，共 {len(self.documents)} 个文档")
+    
     def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
         """
         搜索相关文档
@@ -90,35 +371,22 @@ class VectorStore:
             return []
         
         try:
+            self._ensure_index()
+            
             top_k = top_k or VECTOR_CONFIG.get('max_results', 10)
             threshold = VECTOR_CONFIG.get('similarity_threshold', 0.1)
 
             self.logger.debug(f"搜索参数: top_k={top_k}, threshold={threshold}")
-            self.logger.debug(f"文档数量: {len(self.documents)}, 向量形状: {self.vectors.shape if self.vectors is not None else None}")
-
-            # 向量化查询
-            query_vector = self.vectorizer.transform([query])
-            self.logger.debug(f"查询向量形状: {query_vector.shape}")
 
-            # 计算相似度
-            similarities = cosine_similarity(query_vector, self.vectors).flatten()
-            self.logger.debug(f"相似度分数: {similarities}")
+            query_counts = self._count_terms([self._tokenize_chinese(query)], grow_vocabulary=False)
+            if self.scorer == 'dense':
+                doc_ids, similarities = self._search_dense(query, query_counts, top_k, threshold)
+            else:
+                term_ids, weights = self._query_weights(query_counts)
+                doc_ids, similarities = self._search_postings(term_ids, weights, top_k, threshold)
 
-            # 获取最相似的文档索引
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            self.logger.debug(f"Top {top_k} 索引: {top_indices}")
-
-            results = []
-            for idx in top_indices:
-                similarity = similarities[idx]
-                self.logger.debug(f"文档 {idx}: 相似度 {similarity:.4f}, 阈值 {threshold}")
-                if similarity >= threshold:
-                    doc = self.documents[idx].copy()
-                    doc['similarity'] = float(similarity)
-                    results.append(doc)
-                    self.logger.debug(f"添加文档 {idx} 到结果: {doc.get('content', '')[:100]}...")
-                else:
-                    self.logger.debug(f"文档 {idx} 相似度 {similarity:.4f} 低于阈值 {threshold}")
+            results = [self._make_result(doc_id, similarity)
+                       for doc_id, similarity in zip(doc_ids, similarities)]
 
             self.logger.info(f"查询 '{query}' 返回 {len(results)} 个结果")
             return results
@@ -127,41 +395,510 @@ class VectorStore:
             self.logger.error(f"搜索失败: {str(e)}")
             return []
     
-    def save(self):
+    def search_batch(self, queries: List[str], top_k: int = None) -> List[List[Dict[str, Any]]]:
         """
-        保存向量存储到磁盘
+        批量搜索相关文档
+        
+        所有查询一次向量化，与文档矩阵做一次稀疏矩阵乘法。相似度为0的文档
+        不会出现在结果中。
+        
+        Args:
+            queries: 查询文本列表
+            top_k: 每个查询返回结果数量
+            
+        Returns:
+            与queries一一对应的相关文档列表
         """
+        if not self.is_fitted or len(self.documents) == 0:
+            self.logger.warning("向量存储为空或未训练")
+            return [[] for _ in queries]
+        
         try:
-            data = {
-                'documents': self.documents,
-                'vectorizer': self.vectorizer,
-                'vectors': self.vectors,
-                'is_fitted': self.is_fitted
+            self._ensure_index()
+            
+            top_k = top_k or VECTOR_CONFIG.get('max_results', 10)
+            threshold = VECTOR_CONFIG.get('similarity_threshold', 0.1)
+            
+            token_streams = [self._tokenize_chinese(query) for query in queries]
+            query_counts = self._count_terms(token_streams, grow_vocabulary=False)
+            
+            if self.scorer == 'bm25':
+                ranked = (self._search_postings(*self._query_weights(query_counts[i]), top_k, threshold)
+                          for i in range(len(queries)))
+            elif self.scorer == 'dense':
+                ranked = (self._search_dense(queries[i], query_counts[i], top_k, threshold)
+                          for i in range(len(queries)))
+            else:
+                # (查询数 x 文档数) 的稀疏相似度矩阵，每行只包含有共同词项的文档
+                similarities = (self._weight(query_counts) @ self.vectors.T).tocsr()
+                similarities.sort_indices()
+                ranked = []
+                for i in range(len(queries)):
+                    doc_ids = similarities.indices[similarities.indptr[i]:similarities.indptr[i + 1]]
+                    scores = similarities.data[similarities.indptr[i]:similarities.indptr[i + 1]]
+                    selected = self._select_top_k(scores, top_k, threshold)
+                    ranked.append((doc_ids[selected], scores[selected]))
+            
+            results = []
+            for doc_ids, scores in ranked:
+                results.append([self._make_result(doc_id, score) for doc_id, score in zip(doc_ids, scores)])
+            
+            self.logger.info(f"批量查询 {len(queries)} 个问题完成")
+            return results
+            
+        except Exception as e:
+            self.logger.error(f"批量搜索失败: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _get_postings(self) -> sp.csc_matrix:
+        """
+        获取倒排表：词项 -> (文档编号, 权重) 的压缩数组
+        
+        加载的快照自带倒排表（内存映射）；合并追加段或重算IDF后，在首次检索时
+        由权重矩阵转置得到，占用进程私有内存。
+        """
+        with self._index_lock:
+            if self.postings is None:
+                postings = self.vectors.tocsc()
+                postings.sort_indices()
+                self._term_max = np.asarray(postings.max(axis=0).todense()).ravel()
+                self.postings = postings
+            return self.postings
+    
+    def _query_weights(self, query_counts: sp.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算查询词项的权重，使 Σ 权重 × 文档权重 即为相似度
+        
+        TF-IDF为L2归一化的查询向量（得分即余弦相似度）；BM25为查询词频除以
+        得分上限 Σ idf × (k1 + 1)，使得分落在 [0, 1) 内。
+        """
+        if self.scorer == 'bm25':
+            term_ids = query_counts.indices
+            query_tf = np.asarray(query_counts.data, dtype=np.float64)
+            max_score = float(np.dot(query_tf, self.idf[term_ids])) * (self.bm25_k1 + 1.0)
+            return term_ids, (query_tf / max_score if len(term_ids) else query_tf)
+        
+        query_vector = self._weight(query_counts)
+        return query_vector.indices, np.asarray(query_vector.data, dtype=np.float64)
+    
+    @staticmethod
+    def _kth_score(scores: np.ndarray, top_k: int, threshold: float) -> float:
+        """
+        当前候选中第top_k高的分数（不足top_k个时为阈值），即进入结果所需的最低分
+        """
+        if len(scores) < top_k:
+            return threshold
+        return max(threshold, float(np.partition(scores, len(scores) - top_k)[len(scores) - top_k]))
+    
+    def _search_postings(self, term_ids: np.ndarray, weights: np.ndarray,
+                         top_k: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        基于倒排表的前top_k检索（逐词项累加，MaxScore剪枝）
+        
+        只有与查询共享词项的文档会被打分。词项按得分上界从高到低处理，
+        当剩余词项的上界之和已不足以让新文档进入前top_k时，后续词项只更新
+        已有候选；无法再进入前top_k的候选随时剔除。结果与全量打分一致。
+        
+        Returns:
+            (文档编号, 相似度)，按相似度降序，同分按编号升序
+        """
+        if len(term_ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        
+        postings = self._get_postings()
+        upper = weights * self._term_max[term_ids]
+        order = np.argsort(-upper, kind='stable')
+        term_ids, weights, upper = term_ids[order], weights[order], upper[order]
+        # remaining[i]: 第i个词项之后所有词项的得分上界之和
+        remaining = np.append(np.cumsum(upper[::-1])[::-1][1:], 0.0)
+        
+        cand_ids = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0)
+        for i, (term_id, weight) in enumerate(zip(term_ids, weights)):
+            start, end = postings.indptr[term_id], postings.indptr[term_id + 1]
+            if start == end:
+                continue
+            ids = postings.indices[start:end]
+            contributions = postings.data[start:end] * weight
+            
+            if upper[i] + remaining[i] < self._kth_score(cand_scores, top_k, threshold):
+                # 未出现过的文档已不可能进入前top_k，只累加到已有候选
+                pos = np.minimum(np.searchsorted(ids, cand_ids), len(ids) - 1)
+                hit = ids[pos] == cand_ids
+                cand_scores[hit] += contributions[pos[hit]]
+            else:
+                all_ids = np.concatenate([cand_ids, ids])
+                cand_ids, inverse = np.unique(all_ids, return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, contributions]),
+                                          minlength=len(cand_ids))
+            
+            # 剔除加上剩余上界仍达不到门槛的候选
+            keep = cand_scores + remaining[i] >= self._kth_score(cand_scores, top_k, threshold)
+            if not keep.all():
+                cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+        
+        selected = self._select_top_k(cand_scores, top_k, threshold)
+        return cand_ids[selected], cand_scores[selected]
+    
+    def _encode_documents(self, start: int, end: int) -> np.ndarray:
+        """
+        计算文档块 [start, end) 的稠密向量
+        """
+        if isinstance(self.dense_encoder, HashedProjectionEncoder):
+            return self.dense_encoder.encode(self.vectors[start:end], self.terms)
+        return self.dense_encoder.encode_texts([self.documents[i]['content'] for i in range(start, end)])
+    
+    def _ensure_dense(self):
+        """
+        使稠密索引与当前文档一致
+        
+        哈希投影依赖词项权重，IDF重算后需要全量重建；否则只编码新增的文档块。
+        """
+        with self._index_lock:
+            self._ensure_index()
+            dense = self.dense_index
+            n_docs = len(self.documents)
+            hashed = isinstance(self.dense_encoder, HashedProjectionEncoder)
+            meta = {
+                'encoder': self.dense_encoder.name,
+                'scorer': self.scorer if hashed else None,
+                'idf_doc_count': self._idf_doc_count if hashed else None
             }
             
-            with open(self.db_path, 'wb') as f:
-                pickle.dump(data, f)
+            stale = any(dense.meta.get(key) != value for key, value in meta.items()) or len(dense) > n_docs
+            if stale:
+                self.logger.info(f"重建稠密索引，文档数 {n_docs}")
+                dense.build(self._encode_documents(0, n_docs), meta)
+            elif len(dense) < n_docs:
+                dense.add(self._encode_documents(len(dense), n_docs), meta)
+            else:
+                return
+            dense.save()
+    
+    def _sync_dense(self):
+        """
+        导入或加载时同步稠密索引（未启用稠密索引时不做任何事）
+        """
+        if self.dense_index is None or not self.is_fitted:
+            return
+        try:
+            self._ensure_dense()
+        except Exception as e:
+            self.logger.warning(f"更新稠密索引失败: {str(e)}")
+    
+    def _search_dense(self, query: str, query_counts: sp.csr_matrix,
+                      top_k: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        稠密向量近似最近邻检索
+        
+        稠密索引在导入和加载时已同步（见 _sync_dense），这里只做检索。
+        
+        Returns:
+            (文档编号, 相似度)，按相似度降序
+        """
+        if not isinstance(self.dense_encoder, HashedProjectionEncoder):
+            doc_ids, scores = self.dense_index.search(self.dense_encoder.encode_texts([query])[0], top_k)
+            keep = scores >= threshold
+            return doc_ids[keep], scores[keep]
+        
+        # 哈希投影只用于召回候选，候选按精确的词项打分（TF-IDF或BM25）重新排序
+        term_ids, weights = self._query_weights(query_counts)
+        query_weights = sp.csr_matrix((weights, term_ids, [0, len(term_ids)]), shape=(1, len(self.terms)))
+        query_vector = self.dense_encoder.encode(query_weights, self.terms)[0]
+        candidates, _ = self.dense_index.search(query_vector, top_k * self.dense_rerank_factor)
+        scores = (self.vectors[candidates] @ query_weights.T).toarray().ravel()
+        selected = self._select_top_k(scores, top_k, threshold)
+        return candidates[selected], scores[selected]
+    
+    def search_dense(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
+        """
+        只使用稠密向量索引检索（需启用 dense 打分方式或 secondary_dense_index）
+        """
+        if self.dense_index is None or not self.is_fitted or len(self.documents) == 0:
+            return []
+        
+        try:
+            self._ensure_index()
+            top_k = top_k or VECTOR_CONFIG.get('max_results', 10)
+            threshold = VECTOR_CONFIG.get('similarity_threshold', 0.1)
+            query_counts = self._count_terms([self._tokenize_chinese(query)], grow_vocabulary=False)
+            doc_ids, similarities = self._search_dense(query, query_counts, top_k, threshold)
+            return [self._make_result(doc_id, similarity) for doc_id, similarity in zip(doc_ids, similarities)]
+        except Exception as e:
+            self.logger.error(f"稠密检索失败: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _select_top_k(scores: np.ndarray, top_k: int, threshold: float) -> np.ndarray:
+        """
+        选出不低于阈值的前top_k个下标（按分数降序，同分按下标升序）
+        """
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > top_k:
+            # argpartition为O(n)求出第top_k大的分数，只对不低于它的结果排序
+            kth_score = -np.partition(-scores[candidates], top_k - 1)[top_k - 1]
+            candidates = candidates[scores[candidates] >= kth_score]
+        # 分数相同时按下标升序，保证结果稳定
+        return candidates[np.lexsort((candidates, -scores[candidates]))][:top_k]
+    
+    def _make_result(self, doc_id: int, similarity: float) -> Dict[str, Any]:
+        """
+        构造检索结果，只复制常用字段
+        """
+        doc = self.documents[doc_id]
+        result = {key: doc[key] for key in self.RESULT_FIELDS if key in doc}
+        result['doc_id'] = int(doc_id)
+        result['similarity'] = float(similarity)
+        return result
+    
+    def get_document(self, doc_id: int) -> Dict[str, Any]:
+        """
+        按编号获取完整文档（包括提取的结构化信息）
+        """
+        return self.documents[doc_id]
+    
+    def save(self, compact: bool = False):
+        """
+        保存向量存储到磁盘（索引目录格式）
+        
+        默认只把上次保存之后新增的文档写成一个追加段；首次保存、重建索引后
+        或段数达到 segment_compaction_threshold 时写入完整快照。
+        
+        Args:
+            compact: 是否强制合并为完整快照
+        """
+        referenced = None
+        try:
+            compact = (compact or self._needs_snapshot or not self.storage.exists()
+                       or self.storage.segment_count >= self.compaction_threshold)
+            
+            if compact:
+                self._ensure_index()
+                # 合并已保存的索引时清理分词缓存；清空或重建后的第一个快照不清理，
+                # 以便分批重新导入的后续批次仍能命中缓存（重建由 rebuild 自行清理）
+                if self._saved_doc_count > 0:
+                    referenced = set()
+                self.storage.save({
+                    'documents': iter(self.documents) if referenced is None else self._hash_documents(referenced),
+                    'document_count': len(self.documents),
+                    'terms': self.terms,
+                    'term_counts': self.term_counts,
+                    'vectors': self.vectors,
+                    'doc_freq': self.doc_freq,
+                    'idf': self.idf,
+                    'idf_doc_count': self._idf_doc_count,
+                    'scorer': self.scorer,
+                    'avg_doc_length': self._avg_doc_len,
+                    'keywords': self.keyword_index.export(),
+                    'sources': {source: dict(entry) for source, entry in self.source_stats.items()}
+                })
+                self.logger.info(f"向量存储快照已保存到 {self.index_dir}")
+            
+            elif len(self.documents) > self._saved_doc_count:
+                n_terms = len(self.terms)
+                for block in self._unsaved_counts:
+                    block.resize((block.shape[0], n_terms))
+                
+                new_documents = self.documents[self._saved_doc_count:]
+                self.storage.append_segment(
+                    new_documents,
+                    self.terms[self._saved_term_count:],
+                    sp.vstack(self._unsaved_counts, format='csr'),
+                    KeywordIndex.collect(new_documents),
+                    self._summarize_sources(new_documents)
+                )
+                self.logger.info(f"向量存储追加了 {len(self.documents) - self._saved_doc_count} 个文档到 {self.index_dir}")
+            
+            self._saved_doc_count = len(self.documents)
+            self._saved_term_count = len(self.terms)
+            self._unsaved_counts = []
+            self._needs_snapshot = False
             
-            self.logger.info(f"向量存储已保存到 {self.db_path}")
+            # 稠密索引随导入一起编码和保存，检索时不再构建
+            self._sync_dense()
+            
+            # 已写盘的文档块改为从磁盘按需读取
+            self.documents = self.storage.open_chunks(self.chunk_cache_size)
             
         except Exception as e:
             self.logger.error(f"保存向量存储失败: {str(e)}")
+            referenced = None
+        
+        self._save_token_cache(referenced)
+    
+    @staticmethod
+    def _summarize_sources(documents, sources: Dict[str, Dict[str, int]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        按来源文件累计文档块数和内容长度
+        
+        Args:
+            documents: 文档块（可迭代对象）
+            sources: 累加到的统计表，为空时新建
+        """
+        sources = {} if sources is None else sources
+        for doc in documents:
+            entry = sources.setdefault(doc.get('source_file', '未知'), {'chunk_count': 0, 'content_length': 0})
+            entry['chunk_count'] += 1
+            entry['content_length'] += len(doc.get('content', ''))
+        return sources
+    
+    def _hash_documents(self, referenced: set):
+        """
+        遍历文档块，同时收集内容哈希（写快照时顺带得到仍被引用的分词缓存键）
+        """
+        for doc in self.documents:
+            referenced.add(self._content_hash(doc['content']))
+            yield doc
+    
+    def _token_cache_files(self) -> List[str]:
+        """
+        按写入顺序列出分词缓存文件
+        """
+        if not os.path.isdir(self.token_cache_dir):
+            return []
+        return sorted(name for name in os.listdir(self.token_cache_dir)
+                      if name.startswith('tokens-') and name.endswith('.pkl'))
+    
+    def _write_token_file(self, entries: Dict[str, List[str]]) -> str:
+        """
+        原子写入一个新的分词缓存文件，返回文件名
+        """
+        os.makedirs(self.token_cache_dir, exist_ok=True)
+        name = f"tokens-{self._token_generation:06d}.pkl"
+        _atomic_write(os.path.join(self.token_cache_dir, name),
+                      lambda f: pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL))
+        self._token_generation += 1
+        return name
+    
+    def _save_token_cache(self, referenced: set = None):
+        """
+        保存分词缓存
+        
+        平时只把新增条目写成一个新文件；合并已有索引或重建索引时，丢弃不再
+        被任何文档块引用的条目，并把剩余条目合并为一个文件。
+        
+        Args:
+            referenced: 当前文档块的内容哈希集合，仅在需要清理时传入
+        """
+        try:
+            if referenced is not None:
+                self.token_cache = {key: self.token_cache[key] for key in referenced if key in self.token_cache}
+                name = self._write_token_file(self.token_cache)
+                # 新文件落盘后再删除旧文件（包括写入中途崩溃留下的临时文件）
+                for old_name in os.listdir(self.token_cache_dir):
+                    if old_name != name:
+                        os.remove(os.path.join(self.token_cache_dir, old_name))
+                if os.path.exists(self.legacy_token_cache_path):
+                    os.remove(self.legacy_token_cache_path)
+                self.logger.debug(f"分词缓存已合并: {len(self.token_cache)} 条")
+            elif self._new_tokens:
+                self._write_token_file(self._new_tokens)
+                self.logger.debug(f"分词缓存追加了 {len(self._new_tokens)} 条")
+            self._new_tokens = {}
+        except Exception as e:
+            self.logger.warning(f"保存分词缓存失败: {str(e)}")
+    
+    def _load_token_cache(self):
+        """
+        加载分词缓存（依次合并各缓存文件，兼容旧版单文件缓存）
+        """
+        try:
+            files = self._token_cache_files()
+            paths = [os.path.join(self.token_cache_dir, name) for name in files]
+            if os.path.exists(self.legacy_token_cache_path):
+                paths.insert(0, self.legacy_token_cache_path)
+            
+            for path in paths:
+                with open(path, 'rb') as f:
+                    self.token_cache.update(pickle.load(f))
+            if files:
+                self._token_generation = int(files[-1][len('tokens-'):-len('.pkl')]) + 1
+            if paths:
+                self.logger.debug(f"加载了 {len(self.token_cache)} 条分词缓存")
+        except Exception as e:
+            self.logger.warning(f"加载分词缓存失败: {str(e)}")
+            self.token_cache = {}
     
     def load(self):
         """
         从磁盘加载向量存储
         """
         try:
-            if os.path.exists(self.db_path):
+            if self.storage.exists():
+                state = self.storage.load()
+                
+                self.documents = self.storage.open_chunks(self.chunk_cache_size)
+                self.terms = state['terms']
+                self.vocabulary = {term: term_id for term_id, term in enumerate(self.terms)}
+                self.term_counts = state['term_counts']
+                self.vectors = state['vectors']
+                self.doc_freq = state['doc_freq']
+                self.idf = state['idf']
+                self._idf_doc_count = state['idf_doc_count']
+                self._avg_doc_len = state['avg_doc_length']
+                self.is_fitted = len(self.documents) > 0
+                
+                # 打分方式改变时，按已保存的词频重算权重并写入新快照
+                rescore = state['scorer'] != self.scorer
+                if rescore:
+                    self.logger.info(f"打分方式由 {state['scorer']} 改为 {self.scorer}，重算索引权重")
+                    self.vectors = None
+                else:
+                    # 快照中的倒排表以内存映射方式共享；有追加段时合并后在内存中重建
+                    self.postings = state['postings']
+                    self._term_max = state['term_max']
+                
+                # 重放追加段，合并与IDF更新在首次检索时进行
+                keyword_parts = [(state['keywords'], 0, state['document_count'])]
+                source_parts = [state['sources']]
+                for segment in state['segments']:
+                    for term in segment['terms']:
+                        self.vocabulary[term] = len(self.terms)
+                        self.terms.append(term)
+                    self._append_counts(segment['term_counts'])
+                    start = keyword_parts[-1][1] + keyword_parts[-1][2]
+                    keyword_parts.append((segment['keywords'], start, segment['document_count']))
+                    source_parts.append(segment['sources'])
+                
+                # 早期版本没有保存关键词倒排表或来源统计：顺序读取一遍文档块重建，并在下次保存时写入快照
+                rebuild = (any(postings is None for postings, _, _ in keyword_parts)
+                           or any(sources is None for sources in source_parts))
+                if rebuild:
+                    self.logger.info("索引目录中没有关键词倒排表或来源统计，正在重建")
+                    
+                    def tally(documents):
+                        for doc in documents:
+                            self._summarize_sources([doc], self.source_stats)
+                            yield doc
+                    
+                    self.keyword_index.merge(KeywordIndex.collect(tally(self.documents)), 0, len(self.documents))
+                else:
+                    for postings, start, count in keyword_parts:
+                        self.keyword_index.merge(postings, start, count)
+                    for sources in source_parts:
+                        for source, entry in sources.items():
+                            total = self.source_stats.setdefault(source, {'chunk_count': 0, 'content_length': 0})
+                            total['chunk_count'] += entry['chunk_count']
+                            total['content_length'] += entry['content_length']
+                
+                self._saved_doc_count = len(self.documents)
+                self._saved_term_count = len(self.terms)
+                self._needs_snapshot = rescore or rebuild
+                
+                self.logger.info(f"从 {self.index_dir} 加载了 {len(self.documents)} 个文档")
+                if rescore:
+                    self.save()
+                else:
+                    self._sync_dense()
+            
+            elif os.path.exists(self.db_path):
+                # 旧版pickle存储，基于其中的文档重建索引并迁移到索引目录格式
                 with open(self.db_path, 'rb') as f:
                     data = pickle.load(f)
                 
-                self.documents = data.get('documents', [])
-                self.vectorizer = data.get('vectorizer', self.vectorizer)
-                self.vectors = data.get('vectors')
-                self.is_fitted = data.get('is_fitted', False)
-                
-                self.logger.info(f"从 {self.db_path} 加载了 {len(self.documents)} 个文档")
+                self.logger.info(f"检测到旧版向量存储 {self.db_path}，正在迁移到 {self.index_dir}")
+                self.documents.extend(data.get('documents', []))
+                self.rebuild()
             
         except Exception as e:
             self.logger.warning(f"加载向量存储失败: {str(e)}")
@@ -169,10 +906,15 @@ class VectorStore:
     def clear(self):
         """
         清空向量存储
+        
+        分词缓存按内容哈希索引，清空后重新导入相同文档时仍可复用，因此保留；
+        之后未重新导入的条目在下次合并或重建索引时清理。
         """
-        self.documents = []
-        self.vectors = None
-        self.is_fitted = False
+        self.documents.close()
+        self._reset_index()
+        self.storage.clear()
+        if self.dense_index is not None:
+            self.dense_index.clear()
         
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
@@ -183,9 +925,21 @@ class VectorStore:
         """
         获取存储统计信息
         """
+        self._ensure_index()
         return {
             'document_count': len(self.documents),
             'is_fitted': self.is_fitted,
             'db_path': self.db_path,
-            'vector_shape': self.vectors.shape if self.vectors is not None else None
-        }
\ No newline at end of file
+            'index_dir': self.index_dir,
+            'scorer': self.scorer,
+            'vector_shape': self.vectors.shape if self.vectors is not None else None,
+            'dense_vectors': len(self.dense_index) if self.dense_index is not None else None,
+            'vocabulary_size': len(self.vocabulary)
+        }
+    
+    def get_source_stats(self) -> List[Dict[str, Any]]:
+        """
+        按来源文件统计文档块数和内容长度（来自索引元数据，不读取文档块）
+        """
+        return [{'source': source, 'chunk_count': entry['chunk_count'], 'content_length': entry['content_length']}
+                for source, entry in self.source_stats.items()]
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI模型接口测试脚本 - 使用本地桩服务器，不访问外网
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from ai_models import SiliconFlowAPI, AsyncSiliconFlowAPI, httpx
+from retry_policy import RetryPolicy
+from api_trace import ApiTracer
+
+def completion_body(content: str) -> dict:
+    """
+    构造OpenAI兼容的聊天完成响应
+    """
+    return {
+        'id': 'chatcmpl-test',
+        'object': 'chat.completion',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}
+    }
+
+class StubServer:
+    """
+    本地桩HTTP服务器
+
+    handler(request) 返回 (状态码, 响应头字典, 响应体)，request 包含
+    path、headers、json 和 client（客户端地址）。响应体为字节时整体返回，
+    为字节片段列表时按分块传输编码逐段发送。
+    """
+
+    def __init__(self, handler=None):
+        self.requests = []
+        self.handler = handler or (lambda request: (200, {}, json.dumps(completion_body('你好')).encode('utf-8')))
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = {
+                    'path': self.path,
+                    'headers': dict(self.headers),
+                    'json': json.loads(self.rfile.read(length) or b'{}'),
+                    'client': self.client_address
+                }
+                stub.requests.append(request)
+                status, headers, body = stub.handler(request)
+
+                self.send_response(status)
+                headers = dict({'Content-Type': 'application/json'}, **headers)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+
+                if isinstance(body, bytes):
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for part in body:
+                    self.wfile.write(f"{len(part):X}\r\n".encode('ascii') + part + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def test_connection_reuse():
+    """
+    测试连接池复用同一TCP连接
+    """
+    print("🔌 测试连接复用...")
+
+    server = StubServer()
+    api = SiliconFlowAPI(api_key='test-key', endpoint=server.url)
+    try:
+        for _ in range(3):
+            assert api.generate_answer('你好') == '你好'
+
+        assert len(server.requests) == 3
+        assert len({request['client'] for request in server.requests}) == 1
+        assert server.requests[0]['headers']['Authorization'] == 'Bearer test-key'
+        print("✅ 多次请求复用了同一个连接")
+    finally:
+        api.close()
+        server.close()
+
+def test_retry_policy():
+    """
+    测试重试分类、Retry-After 与总时限
+    """
+    print("\n🔁 测试重试策略...")
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.05, deadline=5)
+    assert policy.parse_retry_after('2') == 2.0
+    assert policy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert policy.parse_retry_after('soon') is None
+    assert all(0 <= policy.backoff(retry) <= 0.05 for retry in range(10))
+
+    statuses = [503, 200]
+    server = StubServer(lambda request: (
+        statuses.pop(0), {'Retry-After': '0'}, json.dumps(completion_body('恢复了')).encode('utf-8')
+    ))
+    api = SiliconFlowAPI(api_key='test-key', endpoint=server.url)
+    api.retry_policy = policy
+    try:
+        # 503 按 Retry-After 重试后成功
+        result = api.generate_answer_result('你好')
+        assert result == {'answer': '恢复了', 'success': True, 'retries': 1}
+
+        # 400 不会重试
+        server.handler = lambda request: (400, {}, b'{"error": "bad request"}')
+        result = api.generate_answer_result('你好')
+        assert not result['success'] and result['retries'] == 0
+        assert len(server.requests) == 3
+
+        # Retry-After 超出总时限时立即放弃
+        server.handler = lambda request: (429, {'Retry-After': '30'}, b'{}')
+        started = time.monotonic()
+        result = api.generate_answer_result('你好')
+        assert not result['success'] and result['retries'] == 0
+        assert time.monotonic() - started < 1
+        assert len(server.requests) == 4
+
+        # 200 但响应体不是合法JSON时重试
+        bodies = [b'{"choices": [', json.dumps(completion_body('恢复了')).encode('utf-8')]
+        server.handler = lambda request: (200, {}, bodies.pop(0))
+        result = api.generate_answer_result('你好')
+        assert result == {'answer': '恢复了', 'success': True, 'retries': 1}
+        print("✅ 只重试可恢复错误，并遵守Retry-After与总时限")
+    finally:
+        api.close()
+        server.close()
+
+class RecordingHandler(logging.Handler):
+    """
+    收集日志记录的处理器
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_api_trace():
+    """
+    测试API调用追踪的采样与完整请求体记录
+    """
+    print("\n📝 测试API调用追踪...")
+
+    handler = RecordingHandler()
+    trace_logger = logging.getLogger('api_trace')
+    trace_logger.addHandler(handler)
+    trace_logger.setLevel(logging.INFO)
+
+    server = StubServer()
+    api = SiliconFlowAPI(api_key='test-key', endpoint=server.url)
+    try:
+        # 未采样时不记录
+        api.tracer = ApiTracer(log_bodies=False, sample_rate=0)
+        api.generate_answer('你好')
+        assert handler.records == []
+
+        # 摘要只包含编号、大小和耗时
+        api.tracer = ApiTracer(log_bodies=False, sample_rate=1)
+        api.generate_answer('你好')
+        assert len(handler.records) == 1
+        summary = handler.records[0].getMessage()
+        assert 'status=200' in summary and 'id=chatcmpl-test' in summary
+        assert '你好' not in summary
+
+        # 开启完整记录后附带请求体与响应体
+        handler.records.clear()
+        api.tracer = ApiTracer(log_bodies=True)
+        api.generate_answer('你好')
+        messages = [record.getMessage() for record in handler.records]
+        assert len(messages) == 3
+        assert '问题：你好' in messages[0] and 'chat.completion' in messages[2]
+        print("✅ 追踪按配置采样并延迟格式化")
+    finally:
+        trace_logger.removeHandler(handler)
+        api.close()
+        server.close()
+
+def sse_body(pieces) -> list:
+    """
+    构造流式响应的SSE事件片段
+    """
+    events = []
+    for piece in pieces:
+        chunk = {'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+def test_stream_answer():
+    """
+    测试流式回答逐段返回
+    """
+    print("\n🌊 测试流式回答...")
+
+    pieces = ['麒麟', '系统', '版本为V10']
+    server = StubServer(lambda request: (200, {'Content-Type': 'text/event-stream'}, sse_body(pieces)))
+    api = SiliconFlowAPI(api_key='test-key', endpoint=server.url)
+    try:
+        assert list(api.generate_answer_stream('系统版本是什么？')) == pieces
+        assert server.requests[0]['json']['stream'] is True
+
+        response = api.chat_completion([{'role': 'user', 'content': '你好'}], stream=True)
+        assert response['choices'][0]['message']['content'] == ''.join(pieces)
+        print("✅ 流式片段按顺序返回")
+    finally:
+        api.close()
+        server.close()
+
+def test_async_bounded_concurrency():
+    """
+    测试异步接口并发请求数受信号量限制
+    """
+    print("\n⚡ 测试异步并发...")
+
+    if httpx is None:
+        print("⚠️ 未安装httpx，跳过")
+        return
+
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0}
+
+    def handler(request):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.1)
+        with lock:
+            state['active'] -= 1
+        answer = request['json']['messages'][-1]['content']
+        return 200, {}, json.dumps(completion_body(answer)).encode('utf-8')
+
+    server = StubServer(handler)
+
+    async def run():
+        async with AsyncSiliconFlowAPI(api_key='test-key', endpoint=server.url,
+                                       max_concurrent_requests=2) as api:
+            questions = [f"问题{i}" for i in range(6)]
+            answers = await asyncio.gather(*(api.generate_answer(q) for q in questions))
+            return questions, answers
+
+    try:
+        questions, answers = asyncio.run(run())
+        assert answers == [f"问题：{q}" for q in questions]
+        assert state['peak'] == 2
+        print("✅ 同时在途的请求不超过上限")
+    finally:
+        server.close()
+
+def test_async_client_per_loop():
+    """
+    测试每次 asyncio.run 结束时关闭该事件循环上的连接池
+    """
+    print("\n🔒 测试异步客户端生命周期...")
+
+    if httpx is None:
+        print("⚠️ 未安装httpx，跳过")
+        return
+
+    server = StubServer()
+    api = AsyncSiliconFlowAPI(api_key='test-key', endpoint=server.url)
+    clients = []
+
+    async def ask():
+        answer = await api.generate_answer('你好')
+        clients.append(api._client)
+        return answer
+
+    try:
+        assert asyncio.run(ask()) == '你好'
+        assert asyncio.run(ask()) == '你好'
+        assert clients[0] is not clients[1]
+        assert all(client.is_closed for client in clients) and api._client is None
+        print("✅ 旧事件循环上的客户端已关闭")
+    finally:
+        server.close()
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 AI模型接口测试")
+    print("=" * 50)
+
+    test_connection_reuse()
+    test_retry_policy()
+    test_api_trace()
+    test_stream_answer()
+    test_async_bounded_concurrency()
+    test_async_client_per_loop()
+
+    print("\n🎉 AI模型接口测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档块信息提取测试脚本
+"""
+
+import sys
+import os
+import pickle
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from chunk_extractor import LiteralMatcher, ChunkExtractor, extract_chunk_info
+
+SDK_SNIPPET = """# 第一章：系统信息接口
+第二节：版本
+extern char* kdk_system_get_version(void);
+int  kdk_system_get_architecture(char *buf);
+typedef struct kdk_cpu_info KCpuInfo;
+#define KDK_MAX_LEN 256
+GetVersion(s) ↦ (s)
+interface com.kylin.SystemInfo
+obj.refresh() 之后调用 printf("done");
+在银河麒麟上使用 `apt install libkysdk-system` 配置 SDK"""
+
+def test_literal_matcher():
+    """
+    测试重叠、包含与横跨命中末尾的字面量均被找到
+    """
+    print("🔎 测试多模式字面量匹配...")
+
+    matcher = LiteralMatcher(['麒麟', '银河麒麟', 'Kylin', 'KylinOS', 'interface', 'enum', 'typedef', 'def'])
+    assert matcher.find('银河麒麟 KylinOS') == {'麒麟', '银河麒麟', 'Kylin', 'KylinOS'}
+    assert matcher.find('interfacenum') == {'interface', 'enum'}  # enum 从 interface 的命中内部开始
+    assert matcher.find('typedef') == {'typedef', 'def'}
+    assert matcher.find('nothing here') == set()
+    assert LiteralMatcher([]).find('text') == set()
+    print("✅ 一次扫描找出全部字面量")
+
+def test_extract_sdk_snippet():
+    """
+    测试从SDK文档块中提取接口、标题和关键词
+    """
+    print("\n🧰 测试结构化信息提取...")
+
+    info = ChunkExtractor().extract(SDK_SNIPPET)
+    interfaces = info['sdk_interfaces']
+    assert set(interfaces['c_interfaces']) == {'kdk_system_get_version', 'kdk_system_get_architecture',
+                                               'kdk_cpu_info', 'KDK_MAX_LEN'}
+    assert set(interfaces['dbus_interfaces']) == {'GetVersion', 'com.kylin.SystemInfo'}
+    assert {'refresh', 'printf', 'kdk_system_get_version'} <= set(interfaces['api_calls'])
+    assert set(interfaces['data_structures']) == {'kdk_cpu_info'}
+    assert interfaces['python_interfaces'] == []
+
+    assert set(info['headings']) == {'第一章：系统信息接口', '版本'}
+    assert set(info['keywords']) == {'麒麟', '银河麒麟', '配置', 'SDK', 'apt install libkysdk-system'}
+    print("✅ 提取结果符合预期")
+
+def test_worker_ready():
+    """
+    测试提取器可序列化，模块级函数可直接提交到进程池
+    """
+    print("\n📦 测试工作进程使用...")
+
+    extractor = pickle.loads(pickle.dumps(ChunkExtractor()))
+    expected = extractor.extract(SDK_SNIPPET)
+    assert set(extract_chunk_info(SDK_SNIPPET)['headings']) == set(expected['headings'])
+    print("✅ 提取器可在工作进程中使用")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 文档块信息提取测试")
+    print("=" * 50)
+
+    test_literal_matcher()
+    test_extract_sdk_snippet()
+    test_worker_ready()
+
+    print("\n🎉 文档块信息提取测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上下文打包测试脚本
+"""
+
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from context_packer import ContextPacker
+
+def chunk(content, similarity, source='guide.md', start=None):
+    """
+    构造检索结果
+    """
+    doc = {'content': content, 'similarity': similarity, 'source_file': source}
+    if start is not None:
+        doc.update(start_pos=start, end_pos=start + len(content))
+    return doc
+
+def test_estimate_tokens():
+    """
+    测试token估计
+    """
+    print("🧪 测试token估计...")
+
+    packer = ContextPacker(model='Qwen/Qwen2.5-72B-Instruct')
+    assert packer.estimate_tokens('') == 0
+    assert packer.estimate_tokens('麒麟系统') == 3        # 4个汉字 × 0.7
+    assert packer.estimate_tokens('kylin') == 2           # 约4个字母一个token
+    assert packer.estimate_tokens('V10') == 3             # 数字逐位计算
+    assert ContextPacker(model='unknown').estimate_tokens('麒麟系统') == 4
+    print("✅ token估计符合预期")
+
+def test_budget_and_truncation():
+    """
+    测试按相似度贪心填充预算并截断最后一个文档
+    """
+    print("\n📦 测试预算填充...")
+
+    packer = ContextPacker(max_tokens=120, min_partial_tokens=10)
+    docs = [
+        chunk('低分文档。' * 40, 0.2, source='b.md'),
+        chunk('高分文档内容。' * 10, 0.9, source='a.md'),
+        chunk('中分文档内容，包含更多说明。' * 20, 0.5, source='c.md'),
+    ]
+    packed = packer.pack(docs)
+
+    assert packed['tokens'] <= 120
+    assert packed['documents'][0]['similarity'] == 0.9
+    assert packed['truncated'] == 1 and packed['dropped'] == 1
+    assert packed['text'].startswith('文档1 (相似度: 0.900)')
+    assert packed['text'].rstrip().endswith('。……')  # 在句末截断
+    assert packer.estimate_tokens(packed['text']) <= 120
+    print("✅ 预算内按相似度放入文档")
+
+def test_deduplication():
+    """
+    测试同一文件重叠块与重复内容去重
+    """
+    print("\n🧹 测试去重...")
+
+    packer = ContextPacker(max_tokens=1000)
+    text = '第一段说明。第二段说明。第三段说明。'
+    docs = [
+        chunk(text[:12], 0.9, start=0),
+        chunk(text[6:18], 0.8, start=6),       # 与上一块重叠一半
+        chunk(text[0:6], 0.7, start=0),        # 被完全覆盖
+        chunk(text[:12], 0.6, source='copy.md'),  # 其他文件中的相同内容
+    ]
+    packed = packer.pack(docs)
+
+    assert len(packed['documents']) == 2
+    assert packed['dropped'] == 2
+    assert '文档2 (相似度: 0.800):\n第三段说明。' in packed['text']
+    print("✅ 重叠与重复内容只保留一次")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 上下文打包测试")
+    print("=" * 50)
+
+    test_estimate_tokens()
+    test_budget_and_truncation()
+    test_deduplication()
+
+    print("\n🎉 上下文打包测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+稠密向量索引测试脚本
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from dense_index import DenseIndex, HashedProjectionEncoder, quantize_int8
+from vector_store import VectorStore
+from config import VECTOR_CONFIG
+from test_vector_store import SAMPLE_DOCS
+
+def clustered_vectors(n=3000, dim=64, clusters=30, seed=3):
+    """
+    生成带簇结构的单位向量
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def test_ivf_recall_and_quantization():
+    """
+    测试IVF检索召回率、int8量化误差以及保存后重新加载
+    """
+    print("🧭 测试IVF近似检索...")
+
+    vectors = clustered_vectors()
+    quantized, scales = quantize_int8(vectors)
+    assert np.abs(quantized * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+    index_dir = os.path.join(tempfile.mkdtemp(prefix='kylin_dense_'), 'vectors.dense')
+    index = DenseIndex(index_dir, quantization='int8', ann='ivf', nprobe=8)
+    index.build(vectors[:2500], {'encoder': 'test'})
+    index.add(vectors[2500:], {'encoder': 'test'})
+    index.save()
+
+    reloaded = DenseIndex(index_dir, quantization='int8', ann='ivf', nprobe=8)
+    assert reloaded.load() and len(reloaded) == len(vectors)
+    assert isinstance(reloaded.vectors, np.memmap)
+
+    queries = vectors[::100] + 0.05
+    hits = 0
+    for query in queries:
+        exact = np.argsort(-(vectors @ query), kind='stable')[:10]
+        ids, scores = reloaded.search(query, 10)
+        assert np.all(np.diff(scores) <= 0)
+        hits += len(set(ids) & set(exact))
+    recall = hits / (10 * len(queries))
+    assert recall >= 0.9, recall
+
+    # 配置改变时不加载旧索引
+    assert not DenseIndex(index_dir, quantization='float32', ann='ivf').load()
+    print(f"✅ IVF召回率 {recall:.2f}")
+
+def test_hashed_projection():
+    """
+    测试哈希随机投影近似保持余弦相似度，新增词项不影响已有投影
+    """
+    print("\n#️⃣ 测试哈希随机投影...")
+
+    rng = np.random.default_rng(5)
+    terms = [f"t{i}" for i in range(2000)]
+    weights = sp.random(200, len(terms), density=0.02, random_state=5, format='csr', dtype=np.float64)
+    weights.data = rng.random(weights.nnz)
+
+    encoder = HashedProjectionEncoder(dim=512)
+    dense = encoder.encode(weights, terms)
+    exact = weights @ weights.T
+    norms = np.sqrt(exact.diagonal())
+    cosine = exact.toarray() / np.outer(norms, norms)
+    error = dense @ dense.T - cosine
+    assert abs(error.mean()) < 0.01 and np.abs(error).mean() < 0.08
+
+    grown = HashedProjectionEncoder(dim=512).encode(
+        sp.hstack([weights, sp.csr_matrix((200, 10))], format='csr'), terms + [f"new{i}" for i in range(10)])
+    assert np.allclose(grown, dense, atol=1e-6)
+    print("✅ 投影后的内积接近余弦相似度")
+
+def test_dense_vector_store():
+    """
+    测试 dense 打分方式的检索、增量追加与持久化
+    """
+    print("\n🧱 测试稠密检索...")
+
+    VECTOR_CONFIG['embedding_model'] = 'dense'
+    try:
+        store = VectorStore(os.path.join(tempfile.mkdtemp(prefix='kylin_vs_'), 'vectors.pkl'))
+        store.add_documents(SAMPLE_DOCS[:3])
+        assert len(store.dense_index) == 3  # 导入时即编码，不等到首次检索
+        store.add_documents(SAMPLE_DOCS[3:])
+        assert len(store.dense_index) == len(SAMPLE_DOCS)
+
+        def no_build():
+            raise AssertionError("检索时不应构建稠密索引")
+
+        store._ensure_dense = no_build
+        results = store.search('kdk_system 系统版本', top_k=3)
+        assert results[0]['source_file'] == 'sdk.txt'
+        assert len(store.dense_index) == len(SAMPLE_DOCS)
+        assert os.path.isdir(store.dense_index.index_dir)
+
+        batch = store.search_batch(['kdk_system 系统版本'], top_k=3)
+        assert [r['doc_id'] for r in batch[0]] == [r['doc_id'] for r in results]
+
+        reloaded = VectorStore(store.db_path)
+        assert len(reloaded.dense_index) == len(SAMPLE_DOCS)
+        reloaded._ensure_dense = no_build
+        assert [r['doc_id'] for r in reloaded.search('kdk_system 系统版本', top_k=3)] == [r['doc_id'] for r in results]
+
+        reloaded.clear()
+        assert not os.path.exists(reloaded.dense_index.index_dir)
+    finally:
+        VECTOR_CONFIG['embedding_model'] = 'tfidf'
+    print("✅ 稠密索引随文档增量更新并可重新加载")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 稠密向量索引测试")
+    print("=" * 50)
+
+    test_ivf_recall_and_quantization()
+    test_hashed_projection()
+    test_dense_vector_store()
+
+    print("\n🎉 稠密向量索引测试通过")
+
+if __name__ == "__main__":
+    main()
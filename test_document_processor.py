@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档处理测试脚本
+"""
+
+import sys
+import os
+import codecs
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import document_processor
+from document_processor import DocumentProcessor
+
+def make_pdf(pages) -> str:
+    """
+    生成每页一行ASCII文本的最小PDF文件，返回文件路径
+    """
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] "
+           f"/Count {len(pages)} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects[4 + 2 * i] = ("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                              f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects[5 + 2 * i] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number in sorted(objects):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode('latin-1')
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+
+    fd, path = tempfile.mkstemp(prefix='kylin_doc_', suffix='.pdf')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+PAGES = [f"Page {i} kdk_system_get_version returns the version string" for i in range(7)]
+
+def test_pdf_pages_in_order():
+    """
+    测试顺序与多进程提取得到相同的逐页文本
+    """
+    print("📄 测试PDF逐页提取...")
+
+    path = make_pdf(PAGES)
+    sequential = list(DocumentProcessor(pdf_workers=1)._iter_pdf_pages(path))
+    assert [text.strip() for text in sequential] == PAGES
+
+    processor = DocumentProcessor(pdf_workers=2)
+    processor.pdf_pages_per_task = 2
+    processor.pdf_parallel_min_pages = 1
+    cpu_count = os.cpu_count
+    os.cpu_count = lambda: 2  # 单核机器上也走多进程路径
+    try:
+        assert list(processor._iter_pdf_pages(path)) == sequential
+    finally:
+        os.cpu_count = cpu_count
+
+    processor.chunk_size = 120
+    processor.chunk_overlap = 0
+    chunks = processor.process_file(path)
+    assert len(chunks) == 4  # 每块放得下两页
+    assert chunks[0]['content'].startswith('Page 0') and 'Page 1' in chunks[0]['content']
+    assert chunks[-1]['content'].startswith('Page 6')
+    print("✅ 多进程提取结果与顺序提取一致")
+
+def test_per_page_fallback():
+    """
+    测试pdfplumber单页失败时只对该页改用PyPDF2
+    """
+    print("\n🩹 测试单页回退...")
+
+    path = make_pdf(PAGES[:3])
+    real_plumber = document_processor.pdfplumber
+
+    class BrokenPage:
+        def extract_text(self):
+            raise ValueError("broken page")
+
+    class FlakyPdf:
+        def __init__(self, pdf):
+            self.pdf = pdf
+            self.pages = [BrokenPage() if i == 1 else page for i, page in enumerate(pdf.pages)]
+
+        def close(self):
+            self.pdf.close()
+
+    class FlakyPlumber:
+        @staticmethod
+        def open(file_path):
+            return FlakyPdf(real_plumber.open(file_path))
+
+    document_processor.pdfplumber = FlakyPlumber
+    try:
+        texts = document_processor._extract_pdf_pages(path, 0, 3)
+    finally:
+        document_processor.pdfplumber = real_plumber
+    assert [text.strip() for text in texts] == PAGES[:3]
+    print("✅ 失败页由PyPDF2补充，其余页仍使用pdfplumber")
+
+def test_incremental_chunking():
+    """
+    测试分块器边读边产出文档块
+    """
+    print("\n🧩 测试增量分块...")
+
+    processor = DocumentProcessor()
+    processor.chunk_size = 20
+    processor.chunk_overlap = 0
+    consumed = []
+
+    def pages():
+        for text in ['第一页的内容比较长，需要单独成块。', '第二页。', '第三页。']:
+            consumed.append(text)
+            yield text
+
+    chunks = processor._iter_chunks(pages(), 'book.pdf', '.pdf')
+    first = next(chunks)
+    assert first['content'] == '第一页的内容比较长，需要单独成块。' and len(consumed) == 2
+    rest = list(chunks)
+    assert [chunk['content'] for chunk in rest] == ['第二页。\n\n第三页。']
+    assert rest[0]['start_pos'] == first['end_pos'] + 2 and rest[0]['chunk_id'] == 1  # 页间以空行分隔
+    print("✅ 块装满即产出，无需先读完全部页面")
+
+STRUCTURED = """# 第一章：安装
+
+麒麟系统的安装步骤如下。首先下载镜像文件，然后制作启动盘。接着重启计算机并从U盘启动。\r
+安装程序会引导你完成分区设置。   最后设置用户名和密码即可。
+
+
+
+```
+int main() {
+
+    return kdk_system_get_version();
+}
+```
+
+## 1.2 配置网络
+网络配置使用 nmcli 命令。"""
+
+def test_structure_aware_chunking():
+    """
+    测试按标题、段落、句子和代码块分块，并保留块间重叠
+    """
+    print("\n🏗️ 测试结构感知分块...")
+
+    processor = DocumentProcessor()
+    assert processor._clean_content("第一段\r\n  缩进行   多余空白 \r\n\r\n\r\n第二段") == \
+        "第一段\n  缩进行 多余空白\n\n第二段"
+
+    processor.chunk_size = 80
+    processor.chunk_overlap = 20
+    chunks = processor.process_file(write_text(STRUCTURED.encode('utf-8')))
+    contents = [chunk['content'] for chunk in chunks]
+    assert all(len(content) <= processor.chunk_size for content in contents)
+    assert all(chunk['end_pos'] - chunk['start_pos'] == len(chunk['content']) for chunk in chunks)
+
+    # 长段落在句末切开，下一块以上一块末尾的完整句子开头
+    assert contents[0].startswith('# 第一章：安装\n\n') and contents[0].endswith('分区设置。')
+    assert contents[1] == '安装程序会引导你完成分区设置。 最后设置用户名和密码即可。'
+    assert chunks[1]['start_pos'] < chunks[0]['end_pos']
+
+    # 代码块完整保留，新的一节从标题开始且不与上一节重叠
+    assert any('int main() {\n\n    return kdk_system_get_version();\n}\n```' in content for content in contents)
+    assert contents[-1] == '## 1.2 配置网络\n网络配置使用 nmcli 命令。'
+    assert chunks[-1]['start_pos'] > chunks[-2]['end_pos']
+
+    # 连续的标题（目录式的 3.1 -> 3.1.1 -> 正文）与其后的正文放在同一块
+    toc = "3 系统接口\n说明。\n\n3.1 系统信息\n\n3.1.1 系统时钟\n获取系统时钟的接口说明。\n\n3.1.2 系统版本\n获取版本号。"
+    contents = [chunk['content'] for chunk in processor.process_file(write_text(toc.encode('utf-8')))]
+    assert contents == ['3 系统接口\n说明。', '3.1 系统信息\n\n3.1.1 系统时钟\n获取系统时钟的接口说明。',
+                        '3.1.2 系统版本\n获取版本号。']
+    print("✅ 块不超过 chunk_size，重叠从句子边界开始")
+
+def write_text(data: bytes) -> str:
+    """
+    写入临时文本文件，返回文件路径
+    """
+    fd, path = tempfile.mkstemp(prefix='kylin_doc_', suffix='.txt')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+def test_encoding_detection():
+    """
+    测试根据开头样本检测编码
+    """
+    print("\n🔤 测试编码检测...")
+
+    processor = DocumentProcessor()
+    processor.encoding_sample_size = 7  # 样本在多字节汉字中间截断
+    text = '麒麟系统开发指南\n\n第二段'
+    assert processor._detect_encoding(write_text(text.encode('utf-8'))) == 'utf-8'
+    assert processor._detect_encoding(write_text(text.encode('gbk'))) == 'gbk'
+
+    bom_path = write_text(codecs.BOM_UTF8 + text.encode('utf-8'))
+    assert [chunk['content'] for chunk in processor.process_file(bom_path)] == [text]
+    print("✅ UTF-8、GBK与带BOM的文件均正确识别")
+
+def test_streaming_text_chunks():
+    """
+    测试大文本按块读取、按段落和块大小流式分块
+    """
+    print("\n🌊 测试流式文本分块...")
+
+    processor = DocumentProcessor()
+    processor.chunk_size = 100
+    processor.text_block_size = 64
+
+    processor.chunk_overlap = 0
+
+    # 段落边界落在读取块之间；超长段落在读取时切开，但不插入段落分隔
+    paragraphs = ['短段落一。', '短段落二。', '长' * 250, '结尾段落。']
+    path = write_text('\r\n\r\n'.join(paragraphs).encode('gbk'))
+    chunks = processor.process_file(path)
+    contents = [chunk['content'] for chunk in chunks]
+    assert contents[0].startswith('短段落一。\n\n短段落二。\n\n长') and contents[-1].endswith('长\n\n结尾段落。')
+    assert "".join(contents).count('长') == 250 and not any('长\n' in content.replace('\n\n结尾段落。', '') for content in contents)
+    assert all(len(content) <= processor.chunk_size for content in contents)
+    assert 'keywords' in chunks[0]
+
+    # 空行之后的代码行保留行首缩进
+    code = '```\nint main() {\n\n    return 0;\n}\n```'
+    contents = [chunk['content'] for chunk in processor.process_file(write_text(code.encode('utf-8')))]
+    assert contents == [code]
+
+    # 缓冲区不随段落长度增长：读入的块数只比产出的片段多常数个
+    consumed = []
+
+    def blocks():
+        for _ in range(1000):
+            consumed.append(1)
+            yield 'x' * 64
+
+    pieces = processor._iter_paragraphs(blocks())
+    for _ in range(10):
+        assert len(next(pieces)[-1]) <= 2 * processor.text_block_size
+    assert len(consumed) <= 12
+    print("✅ 边读边分块，每块不超过 chunk_size")
+
+def test_long_paragraph_text():
+    """
+    测试长段落文本文件按句子分块，不在句子中间插入段落分隔
+    """
+    print("\n📜 测试长段落文本分块...")
+
+    paragraph = "".join(f"第{i}条说明：银河麒麟系统提供了丰富的开发接口，便于应用调用。" for i in range(30))
+    path = write_text((paragraph + '\r\n').encode('utf-8'))
+
+    processor = DocumentProcessor()
+    processor.chunk_size = 200
+    expected = [chunk['content'] for chunk in processor._iter_chunks([paragraph], path, '.txt')]
+    chunks = processor.process_file(path)
+    assert [chunk['content'] for chunk in chunks] == expected and len(expected) > 1
+    assert all('\n' not in chunk['content'] and chunk['content'].endswith('。') for chunk in chunks)
+
+    # 段落超过读取缓冲上限时在句末切开，续接部分不插入分隔
+    processor.text_block_size = 64
+    processor.chunk_overlap = 0
+    contents = [chunk['content'] for chunk in processor.process_file(path)]
+    assert "".join(contents) == paragraph
+    assert all('\n' not in content and content.endswith('。') for content in contents)
+    print("✅ 长段落只在句末切分")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 文档处理测试")
+    print("=" * 50)
+
+    test_pdf_pages_in_order()
+    test_per_page_fallback()
+    test_incremental_chunking()
+    test_structure_aware_chunking()
+    test_encoding_detection()
+    test_streaming_text_chunks()
+    test_long_paragraph_text()
+
+    print("\n🎉 文档处理测试通过")
+
+if __name__ == "__main__":
+    main()
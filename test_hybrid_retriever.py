@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+混合检索测试脚本
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from vector_store import VectorStore
+from hybrid_retriever import HybridRetriever
+
+def sdk_doc(content, source, chunk_id, keywords=(), functions=()):
+    """
+    构造带已提取结构化信息的文档块
+    """
+    return {
+        'content': content, 'source_file': source, 'chunk_id': chunk_id,
+        'keywords': list(keywords),
+        'sdk_interfaces': {'c_interfaces': list(functions), 'api_calls': ['printf']}
+    }
+
+DOCS = [
+    sdk_doc('获取系统版本号的接口说明，返回值需要调用者释放', 'sdk.txt', 0,
+            functions=['kdk_system_get_version']),
+    sdk_doc('系统版本号与发行版信息的概述', 'overview.md', 0, keywords=['配置']),
+    sdk_doc('防火墙规则设置说明，使用 ufw 命令', 'network.md', 0, keywords=['防火墙', '网络']),
+    sdk_doc('用户管理：添加用户、修改权限', 'users.md', 0, keywords=['用户管理', '权限']),
+]
+
+def _new_retriever():
+    """
+    在临时目录中创建向量存储与混合检索器
+    """
+    store = VectorStore(os.path.join(tempfile.mkdtemp(prefix='kylin_vs_'), 'vectors.pkl'))
+    store.add_documents(DOCS)
+    return store, HybridRetriever(store)
+
+def test_fusion_ranking():
+    """
+    测试关键词命中与词项检索结果融合
+    """
+    print("🔗 测试倒数排名融合...")
+
+    store, retriever = _new_retriever()
+    try:
+        # 接口名只在已提取的sdk_interfaces中，分词后无法与正文匹配
+        results = retriever.search('kdk_system_get_version 系统版本号', top_k=2)
+        assert results[0]['source_file'] == 'sdk.txt'
+        assert set(results[0]['retrieval_ranks']) == {'lexical', 'keyword'}
+        assert 0 < results[1]['similarity'] < results[0]['similarity'] <= 1
+
+        # 多字关键词由相邻分词拼接匹配
+        assert retriever.search('用户管理怎么做', top_k=1)[0]['source_file'] == 'users.md'
+
+        # 新增文档块后关键词索引增量更新
+        store.add_documents([sdk_doc('获取系统架构', 'sdk.txt', 1, functions=['kdk_system_get_architecture'])])
+        results = retriever.search('kdk_system_get_architecture', top_k=1)
+        assert results[0]['doc_id'] == len(DOCS)
+        print("✅ 两路都命中的文档排在最前")
+    finally:
+        retriever.close()
+
+def test_persisted_keyword_index():
+    """
+    测试关键词倒排表随索引保存，重新加载后检索不需要扫描文档块
+    """
+    print("\n💾 测试关键词索引持久化...")
+
+    store, retriever = _new_retriever()
+    retriever.close()
+    store.add_documents([sdk_doc('获取系统架构', 'sdk.txt', 1, functions=['kdk_system_get_architecture'])])
+    assert store.storage.segment_count == 1
+    expected = store.keyword_index.export()
+
+    reloaded = VectorStore(store.db_path)
+    assert reloaded.keyword_index.export() == expected
+    assert reloaded.keyword_index.doc_count == len(DOCS) + 1
+
+    def no_scan(*args):
+        raise AssertionError("检索时不应遍历文档块")
+
+    reloaded.documents.__class__ = type('NoScanStore', (type(reloaded.documents),), {'__iter__': no_scan})
+    retriever = HybridRetriever(reloaded)
+    try:
+        results = retriever.search('kdk_system_get_architecture', top_k=1)
+        assert results[0]['doc_id'] == len(DOCS) and 'keyword' in results[0]['retrieval_ranks']
+    finally:
+        retriever.close()
+
+    # 早期版本的索引目录没有关键词倒排表：加载时重建，下次保存写入快照
+    for name in os.listdir(store.index_dir):
+        path = os.path.join(store.index_dir, name, 'keywords.json')
+        if os.path.exists(path):
+            os.remove(path)
+    legacy = VectorStore(store.db_path)
+    assert legacy.keyword_index.export() == expected
+    legacy.add_documents([sdk_doc('网络状态查询', 'sdk.txt', 2, functions=['kdk_net_get_state'])])
+    assert legacy.storage.segment_count == 0
+    assert VectorStore(store.db_path).keyword_index.postings['kdk_net_get_state'] == [len(DOCS) + 1]
+    print("✅ 关键词索引在导入时建立并随索引加载")
+
+def test_parallel_sources():
+    """
+    测试各路检索并行执行，失败的检索路被跳过
+    """
+    print("\n⚡ 测试并行检索...")
+
+    store, retriever = _new_retriever()
+    try:
+        def slow_source(query, top_k):
+            time.sleep(0.3)
+            return [{'doc_id': 2, 'similarity': 1.0, 'content': DOCS[2]['content']}]
+
+        def broken_source(query, top_k):
+            raise RuntimeError("index offline")
+
+        retriever.add_source('slow', slow_source, weight=2.0)
+        retriever.add_source('slow_mirror', slow_source)
+        retriever.add_source('broken', broken_source)
+
+        started = time.monotonic()
+        results = retriever.search('防火墙', top_k=3)
+        assert time.monotonic() - started < 0.55  # 两个慢检索路同时执行
+        assert results[0]['doc_id'] == 2
+        assert 'broken' not in results[0]['retrieval_ranks']
+        print("✅ 检索路并行执行，故障检索路不影响结果")
+    finally:
+        retriever.close()
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 混合检索测试")
+    print("=" * 50)
+
+    test_fusion_ranking()
+    test_persisted_keyword_index()
+    test_parallel_sources()
+
+    print("\n🎉 混合检索测试通过")
+
+if __name__ == "__main__":
+    main()
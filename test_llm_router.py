@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多提供商路由测试脚本 - 使用本地桩服务器，不访问外网
+"""
+
+import sys
+import os
+import json
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from llm_router import LLMRouter
+from test_ai_models import StubServer, completion_body, sse_body
+
+def reply(content: str, delay: float = 0, status: int = 200):
+    """
+    构造固定延迟、固定回答的桩处理函数
+    """
+    def handler(request):
+        time.sleep(delay)
+        if status != 200:
+            return status, {}, b'{"error": "unavailable"}'
+        return 200, {}, json.dumps(completion_body(content)).encode('utf-8')
+    return handler
+
+def make_router(servers, **kwargs) -> LLMRouter:
+    """
+    为每个桩服务器创建一个后端
+    """
+    backends = [{'name': name, 'endpoint': server.url, 'api_key': 'test-key', 'model': 'Qwen/Qwen2.5-72B-Instruct'}
+                for name, server in servers]
+    return LLMRouter(backends=backends, **kwargs)
+
+def test_failover_and_cooldown():
+    """
+    测试出错后转移到下一个后端，连续失败的后端进入冷却期
+    """
+    print("🔀 测试故障转移...")
+
+    broken = StubServer(reply('', status=503))
+    healthy = StubServer(reply('备用回答'))
+    router = make_router([('broken', broken), ('healthy', healthy)])
+    try:
+        result = router.generate_answer_result('你好')
+        assert result == {'answer': '备用回答', 'success': True, 'retries': 1}
+
+        for _ in range(3):
+            router.generate_answer('你好')
+        assert router.get_stats()['broken']['error_rate'] == 1.0
+        assert len(broken.requests) == 1  # 只失败过的后端排在健康后端之后
+    finally:
+        router.close()
+        healthy.close()
+
+    router = make_router([('broken', broken)])
+    try:
+        for _ in range(3):
+            assert not router.generate_answer_result('你好')['success']
+        assert router.get_stats()['broken']['cooling_down']
+        print("✅ 失败后端被跳过，请求转移成功")
+    finally:
+        router.close()
+        broken.close()
+
+def test_latency_ranking():
+    """
+    测试探测各后端后按p50延迟选择最快的后端
+    """
+    print("\n⏱️ 测试延迟排序...")
+
+    slow = StubServer(reply('慢', delay=0.2))
+    fast = StubServer(reply('快'))
+    router = make_router([('slow', slow), ('fast', fast)])
+    try:
+        answers = [router.generate_answer('你好') for _ in range(4)]
+        assert answers == ['慢', '快', '快', '快']
+        stats = router.get_stats()
+        assert stats['fast']['p50'] < stats['slow']['p50']
+        print("✅ 请求发往延迟最低的后端")
+    finally:
+        router.close()
+        slow.close()
+        fast.close()
+
+def test_hedging():
+    """
+    测试首选后端响应缓慢时发出对冲请求
+    """
+    print("\n🛡️ 测试对冲请求...")
+
+    slow = StubServer(reply('慢', delay=1.0))
+    fast = StubServer(reply('快', delay=0.05))
+    router = make_router([('slow', slow), ('fast', fast)], hedge_requests=True, hedge_delay=0.1)
+    try:
+        started = time.monotonic()
+        response = router.chat_completion([{'role': 'user', 'content': '你好'}])
+        assert response['backend'] == 'fast'
+        assert time.monotonic() - started < 0.8
+        assert len(slow.requests) == 1 and len(fast.requests) == 1
+        print("✅ 对冲请求先于慢请求返回")
+    finally:
+        router.close()
+        slow.close()
+        fast.close()
+
+def test_stream_failover():
+    """
+    测试流式请求在首个片段前出错时转移
+    """
+    print("\n🌊 测试流式故障转移...")
+
+    broken = StubServer(reply('', status=500))
+    healthy = StubServer(lambda request: (200, {'Content-Type': 'text/event-stream'}, sse_body(['备用', '回答'])))
+    router = make_router([('broken', broken), ('healthy', healthy)])
+    try:
+        retry_stats = {}
+        pieces = list(router.stream_chat_completion([{'role': 'user', 'content': '你好'}], retry_stats=retry_stats))
+        assert pieces == ['备用', '回答']
+        assert retry_stats['retries'] == 1
+        print("✅ 流式请求转移成功")
+    finally:
+        router.close()
+        broken.close()
+        healthy.close()
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 多提供商路由测试")
+    print("=" * 50)
+
+    test_failover_and_cooldown()
+    test_latency_ranking()
+    test_hedging()
+    test_stream_failover()
+
+    print("\n🎉 多提供商路由测试通过")
+
+if __name__ == "__main__":
+    main()
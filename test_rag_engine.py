@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG引擎测试脚本
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import vector_store
+from rag_engine import RAGEngine
+
+DOCS = [
+    {'content': '防火墙规则使用 ufw 命令配置，启用后默认拒绝入站连接。', 'source_file': 'network.md', 'chunk_id': 0},
+    {'content': '用户管理：使用 useradd 添加用户，使用 usermod 修改权限。', 'source_file': 'users.md', 'chunk_id': 0},
+]
+
+class StubModel:
+    """
+    同步问答接口桩：流式逐段返回固定回答，可在指定片段后失败
+    """
+
+    generation_params = {'model': 'stub-model', 'temperature': 0.7, 'max_tokens': 100}
+
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def build_messages(self, question, context=""):
+        return [{'role': 'user', 'content': f"{context}\n{question}"}]
+
+    def stream_chat_completion(self, messages, retry_stats=None, **params):
+        self.calls += 1
+        for i, piece in enumerate(self.pieces):
+            if i == self.fail_after:
+                raise RuntimeError("连接中断")
+            yield piece
+
+class StubAsyncModel:
+    """
+    异步问答接口桩
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_answer_result(self, question, context=""):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {'answer': f"回答：{question}", 'success': True, 'retries': 0}
+
+def _new_engine():
+    """
+    在临时目录中创建RAG引擎，问答接口替换为桩
+    """
+    vector_store.VECTOR_DB_PATH = os.path.join(tempfile.mkdtemp(prefix='kylin_rag_'), 'vectors.pkl')
+    engine = RAGEngine()
+    engine.vector_store.add_documents([dict(doc) for doc in DOCS])
+    engine.ai_model = StubModel(['使用', ' ufw ', '命令。'])
+    engine.async_ai_model = StubAsyncModel()
+    return engine
+
+def test_add_documents_batch():
+    """
+    测试多进程批量导入：逐文件返回结果，失败文件不影响整批，整批只写入并保存一次
+    """
+    print("📥 测试批量导入...")
+
+    engine = _new_engine()
+    folder = tempfile.mkdtemp(prefix='kylin_docs_')
+    paths = []
+    for name, text in [('a.txt', '打印机管理：添加打印机并设置默认打印机。'),
+                       ('b.txt', '电池信息：获取电池电量与充电状态。\n\n第二段内容。'),
+                       ('c.xyz', '不支持的格式'),
+                       ('empty.txt', '')]:
+        paths.append(os.path.join(folder, name))
+        with open(paths[-1], 'w', encoding='utf-8') as f:
+            f.write(text)
+    paths.append(os.path.join(folder, 'missing.txt'))
+
+    calls = {'add_documents': 0, 'save': 0}
+    store = engine.vector_store
+    add_documents, save = store.add_documents, store.save
+
+    def counting_add(documents, executor=None):
+        calls['add_documents'] += 1
+        return add_documents(documents, executor=executor)
+
+    def counting_save(*args, **kwargs):
+        calls['save'] += 1
+        return save(*args, **kwargs)
+
+    store.add_documents, store.save = counting_add, counting_save
+    results = engine.add_documents(paths)
+
+    assert [result['file_path'] for result in results] == paths
+    assert [result['success'] for result in results] == [True, True, False, False, False]
+    assert results[0]['document_count'] == 1 and results[1]['document_count'] == 1
+    assert '不支持的文件类型' in results[2]['message'] and '文件不存在' in results[4]['message']
+    assert calls == {'add_documents': 1, 'save': 1}
+    assert len(store.documents) == len(DOCS) + 2
+    assert store.search('电池电量', top_k=1)[0]['source_file'] == paths[1]
+    stats = engine.get_knowledge_base_stats()
+    assert [doc['source'] for doc in stats['documents']] == ['network.md', 'users.md'] + paths[:2]
+    assert sum(doc['chunk_count'] for doc in stats['documents']) == stats['document_count']
+    print("✅ 逐文件报告结果，整批写入一次")
+
+def test_query_stream():
+    """
+    测试流式查询逐段产出、完整结果格式与回答缓存
+    """
+    print("\n🌊 测试流式查询...")
+
+    engine = _new_engine()
+    events = list(engine.query_stream('防火墙怎么配置'))
+    assert [event['event'] for event in events] == ['token', 'token', 'token', 'done']
+    result = events[-1]['result']
+    assert result['answer'] == '使用 ufw 命令。' and not result['cached']
+    assert result['relevant_docs'][0]['source_file'] == 'network.md'
+
+    # 相同问题命中缓存，整段回答一次产出
+    events = list(engine.query_stream('防火墙怎么配置'))
+    assert events[0] == {'event': 'token', 'text': '使用 ufw 命令。'} and events[-1]['result']['cached']
+    assert engine.ai_model.calls == 1
+
+    # 生成中途失败：保留已产出的片段并追加错误说明，不写入缓存
+    engine.ai_model = StubModel(['部分回答', '不会产出'], fail_after=1)
+    result = list(engine.query_stream('用户管理'))[-1]['result']
+    assert result['answer'].startswith('部分回答\n\n抱歉') and not result['cached']
+    assert list(engine.query_stream('用户管理'))[-1]['result']['cached'] is False
+
+    # 检索失败时的结果与正常结果字段一致
+    engine.retriever = None
+    engine.vector_store.search = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("索引损坏"))
+    error = list(engine.query_stream('防火墙怎么配置'))[-1]['result']
+    assert set(error) == set(result) and error['cached'] is False and error['retries'] == 0
+    print("✅ 流式事件顺序、缓存与错误结果符合预期")
+
+def test_aquery_concurrent_retrieval():
+    """
+    测试 aquery 在线程中执行检索，多个问题的检索相互重叠
+    """
+    print("\n⚡ 测试异步查询...")
+
+    engine = _new_engine()
+    search = engine.retriever.search
+
+    def slow_search(query, top_k):
+        time.sleep(0.2)  # 模拟耗时的分词与检索
+        return search(query, top_k)
+
+    engine.retriever.search = slow_search
+    questions = ['防火墙怎么配置', '如何添加用户', '如何修改权限']
+
+    async def run():
+        return await asyncio.gather(*(engine.aquery(question) for question in questions))
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    assert time.monotonic() - started < 0.45  # 三次检索没有在事件循环中依次执行
+    assert [result['answer'] for result in results] == [f"回答：{question}" for question in questions]
+    assert results[0]['relevant_docs'][0]['source_file'] == 'network.md'
+    assert all(result['cached'] is False and result['retries'] == 0 for result in results)
+
+    # 再次查询命中缓存，不调用问答接口
+    assert asyncio.run(engine.aquery(questions[0]))['cached']
+    assert engine.async_ai_model.calls == 3
+    print("✅ 检索不阻塞事件循环")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 RAG引擎测试")
+    print("=" * 50)
+
+    test_add_documents_batch()
+    test_query_stream()
+    test_aquery_concurrent_retrieval()
+
+    print("\n🎉 RAG引擎测试通过")
+
+if __name__ == "__main__":
+    main()
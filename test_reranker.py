@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重排序测试脚本
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from vector_store import VectorStore
+from reranker import Reranker
+
+SECTION = ('获取系统版本号需要调用接口并检查返回值，返回的字符串需要调用者释放。'
+           '如果接口返回空指针，说明系统信息服务未启动，需要先启动相关服务再重试。')
+
+DOCS = [
+    {'content': SECTION + '示例一。', 'source_file': 'guide.md', 'chunk_id': 0,
+     'headings': ['系统信息']},
+    {'content': SECTION + '示例二。', 'source_file': 'guide.md', 'chunk_id': 1,
+     'headings': ['系统信息']},
+    {'content': 'kdk_system_get_version 接口说明：获取版本号', 'source_file': 'sdk.txt', 'chunk_id': 0,
+     'headings': ['版本接口'],
+     'sdk_interfaces': {'c_interfaces': ['kdk_system_get_version'], 'api_calls': []}},
+    {'content': '防火墙规则的配置方法', 'source_file': 'network.md', 'chunk_id': 0},
+    {'content': '防火墙的说明，以及其他与网络有关的各种配置项的规则', 'source_file': 'network.md', 'chunk_id': 1},
+]
+
+def _new_store():
+    """
+    在临时目录中创建向量存储
+    """
+    store = VectorStore(os.path.join(tempfile.mkdtemp(prefix='kylin_vs_'), 'vectors.pkl'))
+    store.add_documents(DOCS)
+    return store
+
+def test_near_duplicates_and_interfaces():
+    """
+    测试近似重复块只保留一个，SDK接口名精确命中的文档排在最前
+    """
+    print("🧹 测试重排序去重...")
+
+    store = _new_store()
+    reranker = Reranker(store)
+    question = 'kdk_system_get_version 返回值需要调用者释放吗'
+    candidates = store.search(question, top_k=5)
+    assert {doc['chunk_id'] for doc in candidates if doc['source_file'] == 'guide.md'} == {0, 1}
+
+    results = reranker.rerank(question, candidates, top_k=3)
+    assert results[0]['source_file'] == 'sdk.txt'
+    assert sum(doc['source_file'] == 'guide.md' for doc in results) == 1
+    assert all(0 <= doc['similarity'] <= 1 and 'retrieval_similarity' in doc for doc in results)
+    print("✅ 近似重复块被跳过")
+
+def test_phrase_and_proximity():
+    """
+    测试相邻出现的查询词得到更高的短语与紧凑度得分
+    """
+    print("\n🔍 测试短语与邻近度特征...")
+
+    store = _new_store()
+    reranker = Reranker(store)
+    candidates = [dict(store._make_result(3, 0.5)), dict(store._make_result(4, 0.5))]
+    features = reranker._features('防火墙规则', candidates)
+    phrase, proximity = Reranker.FEATURES.index('phrase'), Reranker.FEATURES.index('proximity')
+    assert features[0, phrase] == 1.0 and features[1, phrase] == 0.0
+    assert features[0, proximity] > features[1, proximity] > 0
+
+    heading = Reranker.FEATURES.index('heading')
+    features = reranker._features('版本接口', [store._make_result(2, 0.5), store._make_result(0, 0.5)])
+    assert features[0, heading] > features[1, heading]
+    print("✅ 短语、邻近度和标题特征符合预期")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 重排序测试")
+    print("=" * 50)
+
+    test_near_duplicates_and_interfaces()
+    test_phrase_and_proximity()
+
+    print("\n🎉 重排序测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回答缓存测试脚本
+"""
+
+import sys
+import os
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from response_cache import ResponseCache
+
+PARAMS = {'model': 'Qwen/Qwen2.5-72B-Instruct', 'temperature': 0.7, 'max_tokens': 2000}
+
+def test_key_normalization():
+    """
+    测试问题规范化与缓存键
+    """
+    print("🧪 测试缓存键...")
+
+    cache = ResponseCache()
+    key = cache.make_key('如何获取系统版本？', [1, 2], PARAMS)
+    assert cache.make_key('  如何获取系统版本 ?', [1, 2], PARAMS) == key
+    assert cache.make_key('如何获取系统版本', [2, 1], PARAMS) != key
+    assert cache.make_key('如何获取系统版本', [1, 2], dict(PARAMS, temperature=0.1)) != key
+    print("✅ 相同问题与文档生成相同的键")
+
+def test_lru_and_ttl():
+    """
+    测试LRU淘汰、过期与统计
+    """
+    print("\n⏱️ 测试LRU与过期...")
+
+    cache = ResponseCache(max_size=2, ttl=0.05)
+    cache.put('a', '回答A')
+    cache.put('b', '回答B')
+    assert cache.get('a') == '回答A'
+    cache.put('c', '回答C')  # 淘汰最久未使用的b
+    assert cache.get('b') is None
+    assert cache.get('c') == '回答C'
+
+    time.sleep(0.06)
+    assert cache.get('a') is None
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2
+    assert stats['evictions'] == 1 and stats['expirations'] == 1
+
+    cache.put('d', '回答D')
+    cache.invalidate()
+    assert cache.get('d') is None
+    print("✅ LRU淘汰、过期与失效正常")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 回答缓存测试")
+    print("=" * 50)
+
+    test_key_normalization()
+    test_lru_and_ttl()
+
+    print("\n🎉 回答缓存测试通过")
+
+if __name__ == "__main__":
+    main()
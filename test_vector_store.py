@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量存储测试脚本
+"""
+
+import sys
+import os
+import mmap
+import pickle
+import tempfile
+import time
+import threading
+import numpy as np
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from vector_store import VectorStore
+from config import VECTOR_CONFIG
+
+SAMPLE_DOCS = [
+    {'content': '银河麒麟系统安装指南，包括驱动安装和软件包配置', 'source_file': 'install.md', 'chunk_id': 0},
+    {'content': 'kdk_system_get_version 接口用于获取系统版本号', 'source_file': 'sdk.txt', 'chunk_id': 0},
+    {'content': '网络配置与防火墙规则设置说明', 'source_file': 'network.md', 'chunk_id': 0},
+    {'content': '用户管理：添加用户、修改权限、备份用户数据', 'source_file': 'users.md', 'chunk_id': 0},
+    {'content': 'kdk_system_get_architecture 接口返回系统架构信息', 'source_file': 'sdk.txt', 'chunk_id': 1},
+]
+
+def _new_store():
+    """
+    在临时目录中创建向量存储
+    """
+    db_dir = tempfile.mkdtemp(prefix='kylin_vs_')
+    return VectorStore(os.path.join(db_dir, 'vectors.pkl'))
+
+def test_incremental_matches_rebuild():
+    """
+    测试增量索引与全量重建结果一致
+    """
+    print("🧪 测试增量索引...")
+
+    store = _new_store()
+    store.idf_drift_threshold = 0
+    store.add_documents(SAMPLE_DOCS[:2])
+    store.add_documents(SAMPLE_DOCS[2:])
+    incremental = [(r['content'], round(r['similarity'], 6)) for r in store.search('系统版本', top_k=3)]
+
+    store.rebuild()
+    rebuilt = [(r['content'], round(r['similarity'], 6)) for r in store.search('系统版本', top_k=3)]
+
+    assert incremental == rebuilt
+    assert store.get_stats()['document_count'] == len(SAMPLE_DOCS)
+    print("✅ 增量索引结果与全量重建一致")
+
+def _is_mapped(array) -> bool:
+    """
+    数组是否直接引用内存映射的文件
+    """
+    while array is not None and not isinstance(array, mmap.mmap):
+        array = getattr(array, 'base', None)
+    return array is not None
+
+def test_persistence():
+    """
+    测试保存与重新加载
+    """
+    print("\n💾 测试持久化...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS)
+    expected = [r['content'] for r in store.search('防火墙', top_k=2)]
+
+    reloaded = VectorStore(store.db_path)
+    assert [r['content'] for r in reloaded.search('防火墙', top_k=2)] == expected
+
+    # 快照中的倒排表以内存映射方式加载，与内存中转置得到的一致
+    postings = reloaded._get_postings()
+    assert _is_mapped(postings.data) and _is_mapped(postings.indices)
+    in_memory = reloaded.vectors.tocsc()
+    in_memory.sort_indices()
+    assert np.array_equal(postings.indptr, in_memory.indptr) and np.array_equal(postings.indices, in_memory.indices)
+    assert np.allclose(reloaded._term_max, in_memory.max(axis=0).toarray().ravel())
+    print("✅ 重新加载后检索结果一致")
+
+def test_lazy_documents():
+    """
+    测试文档块按需读取与LRU缓存
+    """
+    print("\n📄 测试文档块按需读取...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS[:3])
+    store.add_documents(SAMPLE_DOCS[3:])
+
+    reloaded = VectorStore(store.db_path)
+    reloaded.chunk_cache_size = 2
+    reloaded.documents = reloaded.storage.open_chunks(cache_size=2)
+    assert len(reloaded.documents) == len(SAMPLE_DOCS)
+    assert len(reloaded.documents._cache) == 0
+
+    for doc_id in (4, 0, 2, 4):
+        assert reloaded.get_document(doc_id) == SAMPLE_DOCS[doc_id]
+    assert len(reloaded.documents._cache) == 2
+    assert list(reloaded.documents) == SAMPLE_DOCS
+    print("✅ 文档块按需读取正常")
+
+def test_source_stats():
+    """
+    测试按来源文件的统计随快照与追加段保存，加载后不需要读取文档块
+    """
+    print("\n📊 测试来源统计...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS[:3])
+    store.add_documents(SAMPLE_DOCS[3:])
+    expected = {}
+    for doc in SAMPLE_DOCS:
+        entry = expected.setdefault(doc['source_file'], {'chunk_count': 0, 'content_length': 0})
+        entry['chunk_count'] += 1
+        entry['content_length'] += len(doc['content'])
+    expected = [dict(entry, source=source) for source, entry in expected.items()]
+    assert store.get_source_stats() == expected
+
+    reloaded = VectorStore(store.db_path)
+    reloaded.documents._read = reloaded.documents.__iter__ = None  # 统计不应读取文档块
+    assert reloaded.get_source_stats() == expected
+
+    # 早期版本的清单没有来源统计：加载时顺序读取一遍文档块重建
+    manifest = store.storage._read_manifest()
+    manifest.pop('sources')
+    for segment in manifest['segments']:
+        segment.pop('sources')
+    store.storage._commit_manifest(manifest)
+    assert VectorStore(store.db_path).get_source_stats() == expected
+    print("✅ 来源统计来自索引元数据")
+
+def test_reload_and_append():
+    """
+    测试从索引目录加载后继续增量添加
+    """
+    print("\n➕ 测试加载后追加文档...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS[:3])
+
+    reloaded = VectorStore(store.db_path)
+    reloaded.add_documents(SAMPLE_DOCS[3:])
+    results = reloaded.search('用户权限', top_k=1)
+    assert results and results[0]['source_file'] == 'users.md'
+
+    final = VectorStore(store.db_path)
+    assert final.get_stats()['document_count'] == len(SAMPLE_DOCS)
+    assert [r['doc_id'] for r in final.search('用户权限', top_k=1)] == [results[0]['doc_id']]
+    print("✅ 加载后追加文档正常")
+
+def test_segments_and_compaction():
+    """
+    测试追加段写入、合并与写入中途崩溃
+    """
+    print("\n🧱 测试追加段与合并...")
+
+    store = _new_store()
+    store.compaction_threshold = 3
+    for doc in SAMPLE_DOCS[:3]:
+        store.add_documents([doc])
+    # 首次保存写快照，之后每次只追加一个段
+    assert store.storage.segment_count == 2
+    assert len(VectorStore(store.db_path).documents) == 3
+
+    store.add_documents([SAMPLE_DOCS[3]])
+    assert store.storage.segment_count == 3
+    store.add_documents([SAMPLE_DOCS[4]])
+    assert store.storage.segment_count == 0
+    assert sorted(os.listdir(store.index_dir)) == ['base-000005', 'manifest.json']
+
+    # 模拟写段之后、替换清单之前进程被杀
+    def crash(manifest):
+        raise OSError("模拟崩溃")
+
+    store.storage._commit_manifest = crash
+    store.add_documents([{'content': '未提交的文档', 'source_file': 'lost.md', 'chunk_id': 0}])
+
+    recovered = VectorStore(store.db_path)
+    assert len(recovered.documents) == len(SAMPLE_DOCS)
+    assert recovered.search('用户权限', top_k=1)[0]['source_file'] == 'users.md'
+
+    # 下次提交时清理未被清单引用的段
+    recovered.add_documents([{'content': '新的文档', 'source_file': 'new.md', 'chunk_id': 0}])
+    assert len(os.listdir(recovered.index_dir)) == 3
+    print("✅ 追加段、合并与崩溃恢复正常")
+
+def test_legacy_migration():
+    """
+    测试旧版pickle存储迁移到索引目录
+    """
+    print("\n🔄 测试旧版存储迁移...")
+
+    db_dir = tempfile.mkdtemp(prefix='kylin_vs_')
+    db_path = os.path.join(db_dir, 'vectors.pkl')
+    with open(db_path, 'wb') as f:
+        pickle.dump({'documents': SAMPLE_DOCS, 'vectors': None, 'is_fitted': True}, f)
+
+    store = VectorStore(db_path)
+    assert store.get_stats()['document_count'] == len(SAMPLE_DOCS)
+    assert os.path.isdir(store.index_dir)
+    assert store.search('防火墙', top_k=1)[0]['source_file'] == 'network.md'
+    print("✅ 旧版存储已迁移")
+
+def test_search_ranking():
+    """
+    测试检索结果排序与阈值过滤
+    """
+    print("\n🔍 测试检索排序...")
+
+    store = _new_store()
+    docs = [dict(doc, keywords=['麒麟']) for doc in SAMPLE_DOCS]
+    store.add_documents(docs)
+
+    results = store.search('kdk_system_get_version 系统版本', top_k=3)
+    scores = [r['similarity'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert results[0]['source_file'] == 'sdk.txt'
+    # 结果只携带常用字段，完整文档按编号获取
+    assert 'keywords' not in results[0]
+    assert store.get_document(results[0]['doc_id'])['keywords'] == ['麒麟']
+    assert store.search('完全无关的查询词汇xyz', top_k=3) == []
+    print("✅ 检索结果按相似度降序排列")
+
+def test_concurrent_add_and_search():
+    """
+    测试导入文档时并发检索不会使文档与索引行错位
+    """
+    print("\n🔀 测试并发导入与检索...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS)
+    stop = threading.Event()
+    errors = []
+
+    # 放大文档已追加、词频块尚未追加之间的窗口
+    append_counts = store._append_counts
+
+    def slow_append_counts(counts):
+        time.sleep(0.01)
+        append_counts(counts)
+
+    store._append_counts = slow_append_counts
+
+    def searcher():
+        while not stop.is_set():
+            try:
+                for result in store.search('系统 接口 用户', top_k=5):
+                    assert store.get_document(result['doc_id'])['content'] == result['content']
+                with store._index_lock:
+                    store._ensure_index()
+                    assert store.vectors.shape[0] == len(store.documents)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=searcher) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    try:
+        for i in range(30):
+            store.add_documents([{'content': f'系统接口说明 第{i}节 用户配置', 'source_file': 'extra.md', 'chunk_id': i}])
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors, errors
+    store._ensure_index()
+    assert store.vectors.shape[0] == len(store.documents) == len(SAMPLE_DOCS) + 30
+    assert int(store.term_counts.sum()) == sum(len(store._analyze(store._tokenize_chinese(doc['content'])))
+                                               for doc in store.documents)
+    print("✅ 并发检索期间导入的文档全部进入索引")
+
+def test_search_batch():
+    """
+    测试批量检索与单条检索结果一致
+    """
+    print("\n📦 测试批量检索...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS)
+
+    queries = ['系统版本', '防火墙 网络', '用户权限', '完全无关的查询词汇xyz']
+    batch = store.search_batch(queries, top_k=2)
+    assert len(batch) == len(queries)
+    for query, results in zip(queries, batch):
+        single = store.search(query, top_k=2)
+        assert [r['doc_id'] for r in results] == [r['doc_id'] for r in single]
+    print("✅ 批量检索结果与逐条检索一致")
+
+def test_bm25_scoring():
+    """
+    测试BM25倒排表打分与逐文档计算一致，并可在打分方式间切换
+    """
+    print("\n📐 测试BM25打分...")
+
+    VECTOR_CONFIG['embedding_model'] = 'bm25'
+    try:
+        store = _new_store()
+        store.add_documents(SAMPLE_DOCS)
+        results = store.search('kdk_system 系统版本', top_k=3)
+        assert results[0]['source_file'] == 'sdk.txt'
+        assert all(0 < r['similarity'] < 1 for r in results)
+
+        # 倒排表累加结果与对全部文档逐一计算的BM25一致
+        query_counts = store._count_terms([store._tokenize_chinese('kdk_system 系统版本')], grow_vocabulary=False)
+        dense = store.vectors @ query_counts.toarray().ravel()
+        dense /= query_counts.data @ store.idf[query_counts.indices] * (store.bm25_k1 + 1)
+        for r in results:
+            assert np.isclose(r['similarity'], dense[r['doc_id']])
+
+        batch = store.search_batch(['kdk_system 系统版本', '防火墙'], top_k=3)
+        assert [r['doc_id'] for r in batch[0]] == [r['doc_id'] for r in results]
+
+        reloaded = VectorStore(store.db_path)
+        assert [r['doc_id'] for r in reloaded.search('kdk_system 系统版本', top_k=3)] == [r['doc_id'] for r in results]
+    finally:
+        VECTOR_CONFIG['embedding_model'] = 'tfidf'
+
+    # 切换回TF-IDF后按已保存的词频重算权重
+    switched = VectorStore(store.db_path)
+    fresh = _new_store()
+    fresh.add_documents(SAMPLE_DOCS)
+    assert switched.storage.load()['scorer'] == 'tfidf'
+    assert ([(r['doc_id'], round(r['similarity'], 6)) for r in switched.search('系统版本', top_k=3)] ==
+            [(r['doc_id'], round(r['similarity'], 6)) for r in fresh.search('系统版本', top_k=3)])
+    print("✅ BM25打分正确，切换打分方式后索引自动重算")
+
+def test_pruned_search_matches_exhaustive():
+    """
+    测试倒排表剪枝检索与全量打分结果一致
+    """
+    print("\n✂️ 测试倒排表剪枝...")
+
+    rng = np.random.default_rng(7)
+    words = [f"w{i}" for i in range(400)]
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    docs = [{'content': ' '.join(rng.choice(words, size=12, p=weights / weights.sum())),
+             'source_file': 'synthetic.txt', 'chunk_id': i} for i in range(1500)]
+    queries = [' '.join(rng.choice(words, size=3)) for _ in range(30)] + ['w0 w1', 'w399']
+
+    for scorer in ('tfidf', 'bm25'):
+        store = _new_store()
+        store.scorer = scorer
+        store.add_documents(docs)
+        store._ensure_index()
+        for query in queries:
+            query_counts = store._count_terms([store._tokenize_chinese(query)], grow_vocabulary=False)
+            term_ids, query_weights = store._query_weights(query_counts)
+            dense_query = np.zeros(store.vectors.shape[1])
+            dense_query[term_ids] = query_weights
+            scores = store.vectors @ dense_query
+            expected = store._select_top_k(scores, 5, 0.01)
+
+            results = store.search(query, top_k=5)
+            assert [r['doc_id'] for r in results] == expected.tolist(), (scorer, query)
+            assert np.allclose([r['similarity'] for r in results], scores[expected])
+    print("✅ 剪枝检索与全量打分一致")
+
+def test_token_cache():
+    """
+    测试分词缓存在重新加载后仍可复用
+    """
+    print("\n🗂️ 测试分词缓存...")
+
+    store = _new_store()
+    store.add_documents(SAMPLE_DOCS)
+
+    reloaded = VectorStore(store.db_path)
+    assert len(reloaded.token_cache) == len(SAMPLE_DOCS)
+
+    def fail_tokenize(text):
+        raise AssertionError(f"不应重新分词: {text}")
+
+    # 重建索引时所有文档块都应命中缓存
+    reloaded._tokenize_chinese = fail_tokenize
+    reloaded.rebuild()
+    assert reloaded.get_stats()['document_count'] == len(SAMPLE_DOCS)
+    print("✅ 重建索引复用了分词缓存")
+
+def test_token_cache_files():
+    """
+    测试分词缓存只追加新条目，清空后保留，合并或重建索引时清理不再引用的条目
+    """
+    print("\n🧹 测试分词缓存文件...")
+
+    original = VECTOR_CONFIG.get('segment_compaction_threshold', 8)
+    VECTOR_CONFIG['segment_compaction_threshold'] = 3
+    try:
+        store = _new_store()
+        cache_dir = store.token_cache_dir
+        store.add_documents(SAMPLE_DOCS[:2])
+        store.add_documents(SAMPLE_DOCS[2:3])
+        store.add_documents(SAMPLE_DOCS[3:4])
+        files = sorted(os.listdir(cache_dir))
+        assert len(files) == 3
+        with open(os.path.join(cache_dir, files[-1]), 'rb') as f:
+            assert len(pickle.load(f)) == 1  # 追加文件只包含新增条目
+
+        # 清空后分批重新导入：缓存保留，后续批次也不需要重新分词
+        store.clear()
+        tokenize = store._tokenize_chinese
+
+        def fail_tokenize(text):
+            raise AssertionError(f"不应重新分词: {text}")
+
+        store._tokenize_chinese = fail_tokenize
+        store.add_documents(SAMPLE_DOCS[:2])
+        store.add_documents(SAMPLE_DOCS[2:3])
+        store._tokenize_chinese = tokenize
+        assert len(store.token_cache) == 4 and len(os.listdir(cache_dir)) == 3
+
+        # 段数达到阈值时合并，丢弃未重新导入的条目（SAMPLE_DOCS[3]）
+        store.add_documents(SAMPLE_DOCS[4:])
+        store.add_documents([{'content': '打印机驱动安装', 'source_file': 'printer.md', 'chunk_id': 0}])
+        assert store.storage.segment_count == 3
+        store.add_documents([{'content': '蓝牙设备配对', 'source_file': 'bluetooth.md', 'chunk_id': 0}])
+        assert store.storage.segment_count == 0 and len(os.listdir(cache_dir)) == 1
+        referenced = {store._content_hash(doc['content']) for doc in store.documents}
+        assert set(store.token_cache) == referenced
+
+        reloaded = VectorStore(store.db_path)
+        assert set(reloaded.token_cache) == referenced
+
+        # 重建索引同样清理
+        reloaded.token_cache['stale'] = ['过期']
+        reloaded._new_tokens['stale'] = ['过期']
+        reloaded.rebuild()
+        assert set(reloaded.token_cache) == referenced and len(os.listdir(cache_dir)) == 1
+    finally:
+        VECTOR_CONFIG['segment_compaction_threshold'] = original
+    print("✅ 分词缓存增量写入并随合并清理")
+
+def main():
+    """
+    主测试函数
+    """
+    print("🧪 向量存储测试")
+    print("=" * 50)
+
+    test_incremental_matches_rebuild()
+    test_persistence()
+    test_lazy_documents()
+    test_source_stats()
+    test_reload_and_append()
+    test_segments_and_compaction()
+    test_legacy_migration()
+    test_search_ranking()
+    test_concurrent_add_and_search()
+    test_search_batch()
+    test_bm25_scoring()
+    test_pruned_search_matches_exhaustive()
+    test_token_cache()
+    test_token_cache_files()
+
+    print("\n🎉 向量存储测试通过")
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,18 @@ def verify_files():
         "src/gui.py",
         "src/rag_engine.py",
         "src/vector_store.py",
+        "src/index_storage.py",
+        "src/response_cache.py",
+        "src/retry_policy.py",
+        "src/api_trace.py",
+        "src/llm_router.py",
+        "src/context_packer.py",
+        "src/dense_index.py",
+        "src/hybrid_retriever.py",
+        "src/keyword_index.py",
+        "src/reranker.py",
         "src/document_processor.py",
+        "src/chunk_extractor.py",
         "src/ai_models.py",
         "src/voice_handler.py",
         "src/system_info_helper.py"